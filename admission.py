@@ -0,0 +1,213 @@
+"""Admission control in front of Gemini: a token bucket and a bounded priority queue.
+
+Gemini calls are admitted at most GEMINI_RATE_PER_SECOND a second, with
+bursts of up to GEMINI_RATE_BURST. A call that finds no token waits in a
+queue where cheap routing calls (intent and ship identification) go ahead
+of answer generation. A call is refused at once, with Overloaded, when the
+queue is full or its estimated wait is longer than GEMINI_MAX_QUEUE_WAIT_SECONDS;
+one that has already waited that long gives up the same way. The web layer
+turns Overloaded into 429 with a Retry-After header, so overload costs a
+client milliseconds instead of a slow upstream failure.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lowest value first
+ROUTING = 0
+GENERATION = 1
+PRIORITY_NAMES = {ROUTING: "routing", GENERATION: "generation"}
+# Window over which admission rates are reported
+RATE_WINDOW_SECONDS = 10.0
+
+class Overloaded(Exception):
+    """A Gemini call was refused to protect the quota; retry after retry_after seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class AdmissionController:
+    """Rate-limit and queue Gemini calls by priority, shedding load that would wait too long.
+
+    Tokens refill continuously at `rate` a second up to `burst`. A rate of 0
+    admits everything, as before admission control existed.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_queue: Optional[int] = None, max_wait_seconds: Optional[float] = None):
+        self.rate = float(os.environ.get("GEMINI_RATE_PER_SECOND", 20)) if rate is None else rate
+        if burst is None:
+            burst = float(os.environ.get("GEMINI_RATE_BURST", max(1.0, self.rate * 2)))
+        self.burst = burst
+        self.max_queue = int(os.environ.get("GEMINI_MAX_QUEUE", 100)) if max_queue is None else max_queue
+        if max_wait_seconds is None:
+            max_wait_seconds = float(os.environ.get("GEMINI_MAX_QUEUE_WAIT_SECONDS", 5))
+        self.max_wait_seconds = max_wait_seconds
+
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        # Heap of (priority, arrival) tickets; the head is admitted next
+        self._queue: List[Tuple[int, int]] = []
+        self._arrivals = itertools.count()
+        self._changed = threading.Condition()
+        self._admitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._rejected = {priority: 0 for priority in PRIORITY_NAMES}
+        self._recent_admitted: deque = deque()
+        self._recent_requests: deque = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _estimated_wait(self, priority: int) -> float:
+        """Seconds until a new call of this priority would be admitted, from the tokens and queue ahead of it."""
+        ahead = sum(1 for ticket_priority, _ in self._queue if ticket_priority <= priority)
+        return max(0.0, (ahead + 1 - self._tokens) / self.rate)
+
+    def _record(self, recent: deque, now: float) -> None:
+        recent.append(now)
+        while recent and recent[0] < now - RATE_WINDOW_SECONDS:
+            recent.popleft()
+
+    def _refuse(self, priority: int, reason: str, retry_after: float) -> Overloaded:
+        self._rejected[priority] += 1
+        logger.warning(f"Shedding {PRIORITY_NAMES[priority]} Gemini call: {reason}")
+        return Overloaded(f"The assistant is busy ({reason}); please retry shortly", retry_after)
+
+    def check(self, priority: int = GENERATION) -> None:
+        """Raise Overloaded if a call of this priority would be refused now, without queueing it."""
+        if not self.enabled:
+            return
+        with self._changed:
+            self._refill(time.monotonic())
+            wait = self._estimated_wait(priority)
+            if len(self._queue) >= self.max_queue:
+                raise self._refuse(priority, f"{len(self._queue)} calls queued", wait)
+            if wait > self.max_wait_seconds:
+                raise self._refuse(priority, f"estimated wait {wait:.1f}s", wait)
+
+    def _enter(self, priority: int) -> Optional[Tuple[int, int]]:
+        """Admit the call now (None), queue it (its ticket), or refuse it."""
+        now = time.monotonic()
+        self._refill(now)
+        self._record(self._recent_requests, now)
+        if self._tokens >= 1 and not any(ticket[0] <= priority for ticket in self._queue):
+            self._admit(priority, now)
+            return None
+        wait = self._estimated_wait(priority)
+        if len(self._queue) >= self.max_queue:
+            raise self._refuse(priority, f"{len(self._queue)} calls queued", wait)
+        if wait > self.max_wait_seconds:
+            raise self._refuse(priority, f"estimated wait {wait:.1f}s", wait)
+        ticket = (priority, next(self._arrivals))
+        heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _admit(self, priority: int, now: float) -> None:
+        self._tokens -= 1
+        self._admitted[priority] += 1
+        self._record(self._recent_admitted, now)
+
+    def _take(self, ticket: Tuple[int, int], deadline: float) -> Optional[float]:
+        """Admit a queued call if it is next and a token is free; otherwise the seconds to wait before trying again."""
+        now = time.monotonic()
+        self._refill(now)
+        if self._queue[0] == ticket and self._tokens >= 1:
+            heapq.heappop(self._queue)
+            self._admit(ticket[0], now)
+            self._changed.notify_all()
+            return None
+        if now >= deadline:
+            self._leave(ticket)
+            raise self._refuse(ticket[0], f"waited {self.max_wait_seconds:.1f}s", self._estimated_wait(ticket[0]))
+        ahead = sum(1 for queued in self._queue if queued < ticket)
+        shortfall = max(0.0, ahead + 1 - self._tokens) / self.rate
+        return min(max(shortfall, 0.001), deadline - now)
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._changed.notify_all()
+
+    def acquire(self, priority: int = GENERATION) -> None:
+        """Block until a call of this priority may go ahead, or raise Overloaded."""
+        if not self.enabled:
+            return
+        with self._changed:
+            ticket = self._enter(priority)
+            if ticket is None:
+                return
+            deadline = time.monotonic() + self.max_wait_seconds
+            while True:
+                delay = self._take(ticket, deadline)
+                if delay is None:
+                    return
+                self._changed.wait(delay)
+
+    async def aacquire(self, priority: int = GENERATION) -> None:
+        """Async counterpart of acquire(); polls rather than blocking the event loop."""
+        if not self.enabled:
+            return
+        with self._changed:
+            ticket = self._enter(priority)
+        if ticket is None:
+            return
+        deadline = time.monotonic() + self.max_wait_seconds
+        admitted = False
+        try:
+            while True:
+                with self._changed:
+                    delay = self._take(ticket, deadline)
+                if delay is None:
+                    admitted = True
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            if not admitted:
+                with self._changed:
+                    self._leave(ticket)
+
+    def pause(self, seconds: float) -> None:
+        """Stop admitting calls for about `seconds`, e.g. after Gemini reports the quota exhausted."""
+        if not self.enabled:
+            return
+        with self._changed:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+        logger.warning(f"Gemini quota exhausted; admitting no calls for {seconds:.1f}s")
+
+    def stats(self) -> Dict[str, float]:
+        """Admission rates over the last RATE_WINDOW_SECONDS, queue depth and totals by priority."""
+        with self._changed:
+            now = time.monotonic()
+            self._refill(now)
+            for recent in (self._recent_admitted, self._recent_requests):
+                while recent and recent[0] < now - RATE_WINDOW_SECONDS:
+                    recent.popleft()
+            stats = {
+                "rate_limit_per_second": self.rate,
+                "tokens": round(self._tokens, 2),
+                "queue_depth": len(self._queue),
+                "requests_per_second": len(self._recent_requests) / RATE_WINDOW_SECONDS,
+                "admitted_per_second": len(self._recent_admitted) / RATE_WINDOW_SECONDS,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                stats[f"queue_depth_{name}"] = sum(1 for ticket in self._queue if ticket[0] == priority)
+                stats[f"admitted_{name}"] = self._admitted[priority]
+                stats[f"rejected_{name}"] = self._rejected[priority]
+        return stats
@@ -1,23 +1,106 @@
 import os
 import logging
 import json
-from flask import Flask, render_template, jsonify, request
-from ship_data import ShipDataManager
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Optional
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+from admission import GENERATION, Overloaded
+from ship_data import ShipDataChange, ShipDataManager
+from page_parser import PageParser
+from page_store import PageStore
 from scraper import WebScraper
+from scrape_cache import ScrapeCache
 from price_data_manager import PriceDataManager
-from gemini_client import query_ship_data
+from query_resolver import QueryResolver
+from query_pipeline import QueryPipeline, QueryError
+from response_cache import ResponseCache
+from ship_search import ShipSearchEngine, NUMERIC_FIELDS, TEXT_FIELDS
+from ship_listing import CACHE_MAX_AGE, ShipListing
+from context_builder import ContextBuilder
+from gemini_client import error_message, get_client as get_gemini_client, query_ship_data, stream_ship_data
+from metrics import CONTENT_TYPE, REGISTRY, end_trace, finish_request, stage, start_trace
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging here, once, for every server entry point; at DEBUG every prompt and answer is logged
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev_key_123")
 
+# Most questions one batch request may carry, and how many of its answers are generated at once
+BATCH_MAX_QUERIES = int(os.environ.get("QUERY_BATCH_MAX", 50))
+BATCH_CONCURRENCY = int(os.environ.get("QUERY_BATCH_CONCURRENCY", 8))
+
 # Initialize managers
-ship_manager = ShipDataManager()
-web_scraper = WebScraper()
-price_manager = PriceDataManager()
+ship_manager = ShipDataManager(watch_files=True)
+page_parser = PageParser()
+web_scraper = WebScraper(cache=ScrapeCache(), parser=page_parser, store=PageStore())
+# The refresher starts once the price listener below is registered, so no refresh goes unseen
+price_manager = PriceDataManager(parser=page_parser, ship_names=ship_manager.names, start_refresher=False)
+query_resolver = QueryResolver(ship_manager.get_all_ships())
+ship_search = ShipSearchEngine(ship_manager.ships, price_manager.get_prices_by_ship())
+context_builder = ContextBuilder()
+response_cache = ResponseCache()
+query_pipeline = QueryPipeline(
+    ship_manager, web_scraper, price_manager, query_resolver, ship_search, context_builder, response_cache
+)
+# Versioned by ships and prices, so a price refresh changes the body and its ETag
+ship_listing = ShipListing(ship_search, query_pipeline.data_version())
+
+def rebuild_ship_search() -> None:
+    """Rebuild the search engine and the /api/ships listing from the current ships and prices."""
+    global ship_search, ship_listing
+    ship_search = ShipSearchEngine(ship_manager.ships, price_manager.get_prices_by_ship())
+    query_pipeline.ship_search = ship_search
+    ship_listing = ShipListing(ship_search, query_pipeline.data_version())
+
+def refresh_ship_indexes(change: ShipDataChange) -> None:
+    """Point the resolver and the search engine at hot-reloaded ship data."""
+    global query_resolver
+    # The resolver only indexes names, so record changes alone leave it valid
+    if change.added or change.removed:
+        query_resolver = QueryResolver(ship_manager.get_all_ships())
+        query_pipeline.query_resolver = query_resolver
+    price_manager.set_ship_names(ship_manager.names)
+    rebuild_ship_search()
+
+def refresh_price_indexes(version: str) -> None:
+    """Point the search engine and the listing at a refreshed price list."""
+    rebuild_ship_search()
+
+ship_manager.add_listener(refresh_ship_indexes)
+price_manager.add_listener(refresh_price_indexes)
+price_manager.start_refresher()
+
+# Read when /metrics is scraped
+REGISTRY.add_source("scguide_gemini", lambda: get_gemini_client().metrics())
+REGISTRY.add_source("scguide_http", web_scraper.http.stats)
+REGISTRY.add_source("scguide_admission", lambda: get_gemini_client().admission.stats())
+
+@app.before_request
+def trace_request():
+    g.trace, g.trace_token = start_trace(request.headers.get("X-Request-ID"))
+
+@app.after_request
+def report_request(response):
+    trace, method = g.trace, request.method
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    response.headers["X-Request-ID"] = trace.request_id
+    if response.is_streamed:
+        # The body is still being generated; time the request when it finishes
+        response.call_on_close(lambda: finish_request(trace, method, route, response.status_code))
+    else:
+        if trace.spans:
+            response.headers["Server-Timing"] = trace.server_timing()
+        finish_request(trace, method, route, response.status_code)
+    return response
+
+@app.teardown_request
+def end_request_trace(error):
+    token = g.pop("trace_token", None)
+    if token is not None:
+        end_trace(token)
 
 @app.route('/')
 def index():
@@ -25,13 +108,130 @@ def index():
 
 @app.route('/api/ships', methods=['GET'])
 def list_ships():
+    """Ship names, or with ?fields=name,price,cargo the chosen fields; ?limit= and ?offset= page through them."""
     try:
-        ships = ship_manager.get_all_ships()
-        return jsonify({"success": True, "ships": ships})
+        fields = ShipListing.parse_fields(request.args.get("fields"))
+        limit = request.args.get("limit", type=int)
+        if limit is not None:
+            limit = min(max(limit, 0), 500)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+        listing = ship_listing.body(fields, limit, offset)
+
+        headers = {"Cache-Control": f"public, max-age={CACHE_MAX_AGE}", "Vary": "Accept-Encoding"}
+        encoding = listing.choose_encoding(request.headers.get("Accept-Encoding"))
+        headers["ETag"] = listing.etag(encoding)
+        if listing.matches(request.headers.get("If-None-Match")):
+            return Response(status=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(listing.encoded(encoding), content_type="application/json", headers=headers)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing ships: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/ships/reload', methods=['POST'])
+def reload_ships():
+    """Re-read the ship data files now rather than at the watcher's next poll; ?force=1 reloads unchanged files."""
+    try:
+        change = ship_manager.reload(force=request.args.get('force') == '1')
+        if change is None:
+            return jsonify({"success": True, "reloaded": False, "version": ship_manager.data_version})
+        return jsonify({
+            "success": True,
+            "reloaded": True,
+            "version": change.version,
+            "added": change.added,
+            "removed": change.removed,
+            "changed": change.changed
+        })
+    except Exception as e:
+        logger.error(f"Error reloading ship data: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/ships/names', methods=['GET'])
+def ship_name_report():
+    """How the data sources' ship names were joined, and the names that matched no ship."""
+    report = ship_manager.names.report()
+    return jsonify({
+        "success": True,
+        "ships": report["canonical"],
+        "aliases": report["aliases"],
+        "unmatched": {"combined": report["unmatched"], "prices": price_manager.unmatched_names}
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "success": True,
+        "scrape": web_scraper.cache.stats(),
+        "page_store": web_scraper.store.stats(),
+        "scrape_coalescing": web_scraper.flights.stats(),
+        "passage_indexes": web_scraper.passages.stats(),
+        "responses": response_cache.stats(),
+        "ship_listing": ship_listing.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, stage and cache metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    client = get_gemini_client()
+    return jsonify({"success": True, "gemini": client.metrics(), "admission": client.admission.stats()})
+
+@app.route('/api/http/stats', methods=['GET'])
+def http_stats():
+    return jsonify({"success": True, "http": web_scraper.http.stats()})
+
+@app.route('/api/ships/search', methods=['GET'])
+def search_ships():
+    """Filter and sort ships, e.g. /api/ships/search?max_price=2000000&min_cargo=50&sort=-cargo"""
+    try:
+        filters = {}
+        for field in NUMERIC_FIELDS:
+            for bound in ("min", "max"):
+                value = request.args.get(f"{bound}_{field}")
+                if value is not None:
+                    number = float(value)
+                    # NaN would fail every comparison, silently emptying or ignoring the filter
+                    if not math.isfinite(number):
+                        raise ValueError(f"{bound}_{field} must be a finite number")
+                    filters[f"{bound}_{field}"] = number
+        for field in TEXT_FIELDS:
+            value = request.args.get(field)
+            if value:
+                filters[field] = value.split(",")
+
+        limit = min(max(request.args.get("limit", 50, type=int), 0), 500)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+        results = ship_search.search(
+            filters,
+            sort=request.args.get("sort"),
+            limit=limit,
+            offset=offset,
+            include_incomplete=request.args.get("include_incomplete") == "true"
+        )
+        return jsonify({"success": True, "total": results["total"], "ships": results["ships"]})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching ships: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _overloaded(e: Overloaded):
+    """429 telling the client when to retry, for a query shed by admission control."""
+    response = jsonify({"success": False, "error": str(e), "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/api/query', methods=['POST'])
 def query_ship():
     try:
@@ -39,251 +239,175 @@ def query_ship():
         if not query:
             return jsonify({"success": False, "error": "No query provided"}), 400
 
-        # Get list of all available ships for context
-        all_ships = ship_manager.get_all_ships()
-        
-        # First, determine if this is a general question or about a specific ship
-        query_type_prompt = f"""Given this query about Star Citizen ships: "{query}"
-        Determine if this is a general question about ships or about a specific ship.
-        Return ONLY one of these exact words:
-        - "GENERAL" for general questions about ships, comparisons, or recommendations
-        - "SPECIFIC" for questions about a specific ship
-        
-        Type:"""
-        
-        query_type = query_ship_data(query_type_prompt).strip()
-        
-        if query_type == "GENERAL":
-            # Get the raw data from both sources
-            context = {
-                "query": query,
-                "ship_data": ship_manager.ship_data,  # Original data
-                "combined_data": ship_manager.combined_data,  # New combined data with prices
-                "all_ships": all_ships
-            }
-            
-            prompt = f"""Based on this Star Citizen ship data: {context}
-            Please provide a detailed answer to this general question about ships: {query}
-            
-            Always start your message with "I am so happy to be answering this for you!!!!"
-            
-            You have access to two data sources in the context:
-            1. ship_data: Contains detailed ship information including roles, manufacturers, and specifications
-            2. combined_data: Contains additional information including in-game prices and cargo capacities
-            
-            For this query about ships:
-            1. Analyze both data sources to find relevant ships
-            2. Look for ships that match the query criteria (price, cargo capacity, etc.)
-            3. Compare and combine information from both sources
-            4. Provide specific examples with actual prices and specifications
-            5. Sort recommendations by value/relevance
-            
-            When discussing prices:
-            - For ships under 1M aUEC, show as "**XXX,XXX** aUEC"
-            - For ships over 1M aUEC, show as "**X.XX** million aUEC"
-            - Always include the cargo capacity if available
-            - Always mention the role/purpose of each ship
-            
-            Format your response using proper markdown:
-            - Use ## for section headings (in title case)
-            - Use bullet points for lists
-            - Use **bold** for numbers and key stats
-            - Use *italics* for missing information or additional context
-            - Format cargo capacity as "**X** SCU"
-            
-            Structure your response with these sections:
-            ## Overview
-            Brief summary of available options
-            
-            ## Top Recommendations
-            List of best options with full details
-            
-            ## Additional Options
-            Other choices worth considering
-            
-            ## Summary
-            Quick recap of best value options"""
-            
-            response_text = query_ship_data(prompt)
-            
-            # Include both data sources
-            sources = [
-                "https://starcitizen.tools/Purchasing_ships",
-                "https://starcitizen.tools/Ships"
-            ]
-            
-            return jsonify({
-                "success": True,
-                "response": response_text,
-                "sources": sources
-            })
-            
+        plan = query_pipeline.build_plan(query)
+        if plan.get("cached"):
+            response_text = plan["response"]
         else:
-            # Get the specific ship name for SPECIFIC queries
-            ship_identification_prompt = f"""Given this query about Star Citizen ships: "{query}"
-            And this list of available ships: {all_ships}
-            
-            What specific ship is being asked about? Return ONLY the exact ship name from the list.
-            If multiple ships are mentioned, return the main one being asked about.
-            If no specific ship is mentioned or the ship isn't in the list, return "NONE".
-            
-            Ship name:"""
-            
-            ship_name = query_ship_data(ship_identification_prompt).strip()
-            
-            if ship_name == "NONE" or ship_name not in all_ships:
-                return jsonify({
-                    "success": False,
-                    "error": "Could not identify which ship you're asking about. Please include the full ship name in your query."
-                }), 400
-
-            # Handle price/location queries
-            if "cost" in query.lower() or "price" in query.lower() or "buy" in query.lower():
-                ship_url = ship_manager.get_specific_ship_url(ship_name)
-                
-                if ship_url:
-                    # Get base price from cache
-                    base_price = price_manager.get_ship_price(ship_name)
-                    
-                    # Scrape the specific ship's data
-                    logger.info(f"Scraping data for ship URL: {ship_url}")
-                    scraped_data = web_scraper.scrape_multiple_urls([ship_url])
-                    
-                    # Get the base ship data for context
-                    ship_data = ship_manager.find_relevant_ships(ship_name)
-                    
-                    # Prepare context with both structured and scraped data
-                    context = {
-                        "query": query,
-                        "ship_data": ship_data,
-                        "scraped_data": scraped_data,
-                        "base_price": base_price
-                    }
-                    
-                    # Generate response focusing on price and location
-                    prompt = f"""Based on this Star Citizen ship data and scraped information: {context}
-                        Please provide a detailed answer about the in-game price and purchase location for the {ship_name}.
-                        The base_price field contains the standard in-game price from the official price list.
-                        
-                        Format your response in markdown with the following sections:
-                        
-                        ## 1. Pledge Store Price
-                        Include the standalone pledge price if available. Format prices in bold.
-                        
-                        ## 2. In-Game Price
-                        Include both the base price and any variant prices if available. Format prices in bold.
-                        If the base price differs from other sources, mention both and explain the difference.
-                        
-                        ## 3. Purchase Locations
-                        List available purchase locations if known. Use bullet points for multiple locations.
-                        
-                        ## Additional Context
-                        Include any relevant context about the ship that helps explain its pricing or availability.
-                        
-                        For any information that is not available in the data, clearly state that it is not available in *italics*.
-                        Use proper markdown formatting for emphasis, lists, and sections."""
-                    
-                    response_text = query_ship_data(prompt)
-                    
-                    # Add the price list source if we used base price data
-                    sources = [ship_url]
-                    if base_price is not None:
-                        sources.append("https://starcitizen.tools/Purchasing_ships")
-                    
-                    return jsonify({
-                        "success": True,
-                        "response": response_text,
-                        "sources": sources
-                    })
-            
-            # For other types of queries about specific ships
-            ship_data = ship_manager.find_relevant_ships(ship_name)
-            
-            if not ship_data:
-                return jsonify({
-                    "success": False,
-                    "error": f"No data found for {ship_name}"
-                }), 404
-
-            # Get the specific ship's info
-            ship_info = ship_data.get(ship_name)
-            if not ship_info:
-                return jsonify({
-                    "success": False,
-                    "error": f"Could not find data for {ship_name}"
-                }), 404
-
-            # Get the ship's URL and scrape additional data
-            ship_url = ship_manager.get_specific_ship_url(ship_name)
-            scraped_data = {}
-            if ship_url:
-                logger.info(f"Scraping data for ship URL: {ship_url}")
-                scraped_results = web_scraper.scrape_multiple_urls([ship_url])
-                logger.info(f"Scraped results: {json.dumps(scraped_results, indent=2)}")
-                if scraped_results and scraped_results[0].get('content'):
-                    scraped_data = scraped_results[0]['content']
-                    logger.info(f"Extracted content: {json.dumps(scraped_data, indent=2)}")
-
-            context = {
-                "query": query,
-                "ship_data": {ship_name: ship_info},  # Base ship data
-                "scraped_data": scraped_data,  # Additional scraped information
-                "ship_url": ship_url
-            }
-            
-            logger.info(f"Full context being sent to LLM: {json.dumps(context, indent=2)}")
-
-            prompt = f"""Based on this Star Citizen ship data: {context}
-                Please provide a detailed answer to: {query}
-                
-                Important notes:
-                1. Use both the base ship data and the scraped web data to provide the most complete answer
-                2. The scraped_data contains several important sections:
-                   - 'description': General ship description
-                   - 'features': Detailed features including weapons information
-                   - 'specifications': Detailed specifications including weapon hardpoints
-                   - 'weapons': Specific weapon information including sizes and configurations
-                3. If information is found in the scraped data but not in the base data, use the scraped data
-                4. For weapon-related queries, check both the 'weapons' section and 'specifications' section
-                5. Provide specific details and numbers when available
-                
-                When discussing weapons:
-                - Include both fixed and gimbaled weapon options
-                - Specify the size and number of hardpoints
-                - Mention default weapon loadout if available
-                - Include weapon mounting locations (e.g., nose, wings)
-                
-                Format your response using proper markdown:
-                - Use ## for section headings (in title case)
-                - Use bullet points for lists
-                - Use **bold** for emphasis on important information and numbers
-                - Use *italics* for supplementary information
-                - Format all measurements consistently (e.g., "**Size 2**" for weapon sizes)
-                - Use proper spacing between sections
-                
-                Important formatting rules:
-                1. Keep all text in the same color (don't use special formatting for units)
-                2. Use consistent formatting for all measurements
-                3. Don't use any custom HTML or color codes
-                4. Keep all text either in the default color or specifically bold/italic as specified above"""
-
-            response_text = query_ship_data(prompt)
-
-            # Include the ship's URL in sources
-            sources = []
-            if ship_url:
-                sources.append(ship_url)
-
-            return jsonify({
-                "success": True,
-                "response": response_text,
-                "sources": sources
-            })
+            response_text = _generate_answer(plan)
+
+        return jsonify({
+            "success": True,
+            "response": response_text,
+            "sources": plan["sources"]
+        })
 
+    except QueryError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Overloaded as e:
+        return _overloaded(e)
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _batch_queries(payload: Any) -> List[str]:
+    """The questions in a batch request body, or a QueryError explaining why it is unusable."""
+    queries = payload.get('queries') if isinstance(payload, dict) else None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        raise QueryError('Provide "queries" as a non-empty list of questions', 400)
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise QueryError(f"A batch can hold at most {BATCH_MAX_QUERIES} queries", 400)
+    return queries
+
+def _batch_generations(plans: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """Plans that still need an answer, one per cache key so a repeated question is generated once."""
+    return {plan["cache_key"]: plan for plan in plans if isinstance(plan, dict) and not plan.get("cached")}
+
+def _batch_item(index: int, plan: Any, response_text: Optional[str] = None) -> Dict[str, Any]:
+    if isinstance(plan, QueryError):
+        return {"index": index, "success": False, "error": str(plan), "status": plan.status_code}
+    if plan.get("cached"):
+        response_text = plan["response"]
+    return {"index": index, "success": True, "response": response_text, "sources": plan["sources"]}
+
+def _overloaded_item(index: int, e: Overloaded) -> Dict[str, Any]:
+    return {"index": index, "success": False, "error": str(e), "status": 429, "retry_after": e.retry_after}
+
+def _generate_answer(plan: Dict[str, Any]) -> str:
+    """Generate and cache a plan's answer.
+
+    A failed generation is not cached and raises a 502 QueryError, so it is
+    reported as a failure rather than passed off as an answer.
+    """
+    with stage("generation"):
+        try:
+            response_text = query_ship_data(plan["prompt"], raise_errors=True)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise QueryError(error_message(e), 502) from e
+    query_pipeline.remember(plan, response_text)
+    return response_text
+
+def _answer_batch(plans: List[Any]) -> Iterator[Dict[str, Any]]:
+    """Yield each item's result as soon as it is ready: errors and cached answers first, then generated ones."""
+    waiting: Dict[str, List[int]] = {}
+    for index, plan in enumerate(plans):
+        if isinstance(plan, QueryError) or plan.get("cached"):
+            yield _batch_item(index, plan)
+        else:
+            waiting.setdefault(plan["cache_key"], []).append(index)
+
+    generations = _batch_generations(plans)
+    if not generations:
+        return
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(generations))) as pool:
+        futures = {pool.submit(_generate_answer, plan): key for key, plan in generations.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                response_text = future.result()
+            except Overloaded as e:
+                for index in waiting[key]:
+                    yield _overloaded_item(index, e)
+                continue
+            except QueryError as e:
+                # Every question sharing the failed generation is reported as failed, so it can be retried
+                for index in waiting[key]:
+                    yield _batch_item(index, e)
+                continue
+            for index in waiting[key]:
+                yield _batch_item(index, plans[index], response_text)
+
+@app.route('/api/query/batch', methods=['POST'])
+def query_batch():
+    """Answer many questions in one request; ?stream=1 sends each result as a JSON line once it is ready."""
+    try:
+        queries = _batch_queries(request.get_json(silent=True))
+        plans = query_pipeline.build_batch_plans(queries)
+    except QueryError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Overloaded as e:
+        return _overloaded(e)
+    except Exception as e:
+        logger.error(f"Error processing query batch: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    if request.args.get('stream') == '1':
+        def generate():
+            try:
+                for item in _answer_batch(plans):
+                    yield json.dumps(item) + "\n"
+            except Exception as e:
+                logger.error(f"Error streaming query batch: {str(e)}")
+                yield json.dumps({"success": False, "error": str(e), "status": 500}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    try:
+        results = sorted(_answer_batch(plans), key=lambda item: item["index"])
+        return jsonify({"success": True, "results": results})
+    except Exception as e:
+        logger.error(f"Error processing query batch: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/query/stream', methods=['POST'])
+def query_ship_stream():
+    """Answer a query as server-sent events: token chunks, then the sources list."""
+    payload = request.get_json(silent=True) or {}
+    query = payload.get('query')
+    if not query:
+        return jsonify({"success": False, "error": "No query provided"}), 400
+    # Shed load before the 200 and its headers are sent; later refusals arrive as an error event
+    try:
+        get_gemini_client().admission.check(GENERATION)
+    except Overloaded as e:
+        return _overloaded(e)
+
+    def generate():
+        # Flush an event straight away so the client sees the first byte before routing finishes
+        yield _sse_event("status", {"stage": "routing"})
+        try:
+            plan = query_pipeline.build_plan(query)
+            if plan.get("cached"):
+                yield _sse_event("token", {"text": plan["response"]})
+            else:
+                yield _sse_event("status", {"stage": "generating"})
+                chunks = []
+                with stage("generation"):
+                    for chunk in stream_ship_data(plan["prompt"]):
+                        chunks.append(chunk)
+                        yield _sse_event("token", {"text": chunk})
+                query_pipeline.remember(plan, "".join(chunks))
+            yield _sse_event("sources", {"sources": plan["sources"]})
+            yield _sse_event("done", {"success": True})
+        except QueryError as e:
+            yield _sse_event("error", {"error": str(e), "status": e.status_code})
+        except Overloaded as e:
+            yield _sse_event("error", {"error": str(e), "status": 429, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield _sse_event("error", {"error": str(e), "status": 500})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({"success": False, "error": "Resource not found"}), 404
@@ -0,0 +1,270 @@
+"""ASGI entry point that answers queries on a single event loop.
+
+/api/query, /api/query/stream and /api/query/batch are served by coroutines
+built on the async query pipeline, so one worker keeps hundreds of questions in flight while they
+wait on Gemini and the wiki. Every other route is handed to the Flask app.
+
+Run with: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from asgiref.wsgi import WsgiToAsgi
+from admission import GENERATION, Overloaded
+from app import (app, query_pipeline, web_scraper, BATCH_CONCURRENCY, _batch_generations, _batch_item,
+                 _batch_queries, _overloaded_item, _sse_event)
+from gemini_client import aquery_ship_data, astream_ship_data, error_message, get_client as get_gemini_client
+from metrics import end_trace, finish_request, stage, start_trace
+from query_pipeline import QueryError
+
+logger = logging.getLogger(__name__)
+
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+flask_application = WsgiToAsgi(app)
+
+async def _read_json(receive: Receive) -> Dict[str, Any]:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+async def _send_json(send: Send, payload: Dict[str, Any], status: int = 200,
+                     headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_overloaded(send: Send, e: Overloaded) -> None:
+    """Async counterpart of app._overloaded()."""
+    await _send_json(send, {"success": False, "error": str(e), "retry_after": e.retry_after}, 429,
+                     [(b"retry-after", str(e.retry_after).encode())])
+
+async def query_ship(receive: Receive, send: Send) -> None:
+    try:
+        query = (await _read_json(receive)).get('query')
+        if not query:
+            return await _send_json(send, {"success": False, "error": "No query provided"}, 400)
+
+        plan = await query_pipeline.abuild_plan(query)
+        if plan.get("cached"):
+            response_text = plan["response"]
+        else:
+            response_text = await _agenerate_answer(plan)
+
+        await _send_json(send, {"success": True, "response": response_text, "sources": plan["sources"]})
+
+    except QueryError as e:
+        await _send_json(send, {"success": False, "error": str(e)}, e.status_code)
+    except Overloaded as e:
+        await _send_overloaded(send, e)
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        await _send_json(send, {"success": False, "error": str(e)}, 500)
+
+async def query_ship_stream(receive: Receive, send: Send) -> None:
+    """Answer a query as server-sent events: token chunks, then the sources list."""
+    query = (await _read_json(receive)).get('query')
+    if not query:
+        return await _send_json(send, {"success": False, "error": "No query provided"}, 400)
+    try:
+        get_gemini_client().admission.check(GENERATION)
+    except Overloaded as e:
+        return await _send_overloaded(send, e)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await send({"type": "http.response.body", "body": _sse_event(event, data).encode("utf-8"), "more_body": True})
+
+    # Flush an event straight away so the client sees the first byte before routing finishes
+    await emit("status", {"stage": "routing"})
+    try:
+        plan = await query_pipeline.abuild_plan(query)
+        if plan.get("cached"):
+            await emit("token", {"text": plan["response"]})
+        else:
+            await emit("status", {"stage": "generating"})
+            chunks = []
+            with stage("generation"):
+                async for chunk in astream_ship_data(plan["prompt"]):
+                    chunks.append(chunk)
+                    await emit("token", {"text": chunk})
+            query_pipeline.remember(plan, "".join(chunks))
+        await emit("sources", {"sources": plan["sources"]})
+        await emit("done", {"success": True})
+    except QueryError as e:
+        await emit("error", {"error": str(e), "status": e.status_code})
+    except Overloaded as e:
+        await emit("error", {"error": str(e), "status": 429, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error(f"Error streaming query: {str(e)}")
+        await emit("error", {"error": str(e), "status": 500})
+    await send({"type": "http.response.body", "body": b""})
+
+async def _agenerate_answer(plan: Dict[str, Any]) -> str:
+    """Async counterpart of app._generate_answer()."""
+    with stage("generation"):
+        try:
+            response_text = await aquery_ship_data(plan["prompt"], raise_errors=True)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise QueryError(error_message(e), 502) from e
+    query_pipeline.remember(plan, response_text)
+    return response_text
+
+async def _generate_answer(plan: Dict[str, Any], slots: asyncio.Semaphore) -> str:
+    async with slots:
+        return await _agenerate_answer(plan)
+
+async def _answer_batch(plans: List[Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Async counterpart of app._answer_batch(): results in the order they become ready."""
+    waiting: Dict[str, List[int]] = {}
+    for index, plan in enumerate(plans):
+        if isinstance(plan, QueryError) or plan.get("cached"):
+            yield _batch_item(index, plan)
+        else:
+            waiting.setdefault(plan["cache_key"], []).append(index)
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def generate(key: str, plan: Dict[str, Any]):
+        try:
+            return key, await _generate_answer(plan, slots)
+        except (Overloaded, QueryError) as e:
+            return key, e
+
+    for finished in asyncio.as_completed([generate(key, plan) for key, plan in _batch_generations(plans).items()]):
+        key, response_text = await finished
+        if isinstance(response_text, Overloaded):
+            for index in waiting[key]:
+                yield _overloaded_item(index, response_text)
+            continue
+        if isinstance(response_text, QueryError):
+            for index in waiting[key]:
+                yield _batch_item(index, response_text)
+            continue
+        for index in waiting[key]:
+            yield _batch_item(index, plans[index], response_text)
+
+async def query_batch(receive: Receive, send: Send, stream: bool = False) -> None:
+    """Answer many questions in one request; ?stream=1 sends each result as a JSON line once it is ready."""
+    try:
+        queries = _batch_queries(await _read_json(receive))
+        plans = await query_pipeline.abuild_batch_plans(queries)
+    except QueryError as e:
+        return await _send_json(send, {"success": False, "error": str(e)}, e.status_code)
+    except Overloaded as e:
+        return await _send_overloaded(send, e)
+    except Exception as e:
+        logger.error(f"Error processing query batch: {str(e)}")
+        return await _send_json(send, {"success": False, "error": str(e)}, 500)
+
+    if not stream:
+        try:
+            results = sorted([item async for item in _answer_batch(plans)], key=lambda item: item["index"])
+            return await _send_json(send, {"success": True, "results": results})
+        except Exception as e:
+            logger.error(f"Error processing query batch: {str(e)}")
+            return await _send_json(send, {"success": False, "error": str(e)}, 500)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"application/x-ndjson"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+
+    async def emit(item: Dict[str, Any]) -> None:
+        await send({"type": "http.response.body", "body": (json.dumps(item) + "\n").encode("utf-8"), "more_body": True})
+
+    try:
+        async for item in _answer_batch(plans):
+            await emit(item)
+    except Exception as e:
+        logger.error(f"Error streaming query batch: {str(e)}")
+        await emit({"success": False, "error": str(e), "status": 500})
+    await send({"type": "http.response.body", "body": b""})
+
+async def query_batch_stream(receive: Receive, send: Send) -> None:
+    await query_batch(receive, send, stream=True)
+
+ASYNC_ROUTES = {
+    "/api/query": query_ship,
+    "/api/query/stream": query_ship_stream,
+    "/api/query/batch": query_batch,
+}
+
+async def _traced(handler: Callable[[Receive, Send], Awaitable[None]], scope: Dict[str, Any],
+                  receive: Receive, send: Send) -> None:
+    """Run a native route with a request trace, adding X-Request-ID and Server-Timing to its response."""
+    incoming_id = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+    trace, token = start_trace(incoming_id)
+    status = 500
+
+    async def traced_send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = list(message.get("headers", [])) + [(b"x-request-id", trace.request_id.encode())]
+            if trace.spans:
+                headers.append((b"server-timing", trace.server_timing().encode()))
+            message = dict(message, headers=headers)
+        await send(message)
+
+    try:
+        await handler(receive, traced_send)
+    finally:
+        finish_request(trace, scope["method"], scope["path"], status)
+        end_trace(token)
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await web_scraper.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def application(scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    handler = ASYNC_ROUTES.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+    if handler is query_batch and b"stream=1" in scope.get("query_string", b"").split(b"&"):
+        handler = query_batch_stream
+    if handler:
+        await _traced(handler, scope, receive, send)
+    else:
+        # uvicorn starts the next request on a keep-alive connection from inside the previous response's
+        # send(), which asgiref runs in a context holding that request's finished thread executor. A fresh
+        # context stops WsgiToAsgi from picking that executor up and failing with "already quit".
+        await asyncio.create_task(flask_application(scope, receive, send), context=contextvars.Context())
@@ -0,0 +1,187 @@
+"""Drive a realistic query mix through the app and report latency, throughput and cost per request.
+
+Run from anywhere:
+
+    python benchmarks/load_benchmark.py [--requests 500] [--concurrency 16] [--server flask|asgi]
+                                        [--gemini-latency 0.3] [--wiki-latency 0.05] [--gemini-rate 0]
+
+The app is started in a separate process by benchmarks/stubs.py, against the
+stand-in Gemini and the local wiki, so nothing leaves the machine and the
+load generator's own CPU is never charged to the server. The mix is general
+questions, questions about one ship, price questions, and ship listing and
+search calls, over ships picked at random (with a fixed seed) from
+/api/ships. Latency is measured by the client, per kind of request and
+overall. CPU and memory come from the server process: CPU milliseconds per
+request, and resident memory growth per request plus the peak.
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GENERAL_QUERIES = [
+    "what are the best cargo ships under 2 million aUEC",
+    "which ships are the fastest fighters",
+    "which ships are good for mining",
+    "recommend ships with more than 100 SCU of cargo",
+    "what are the cheapest exploration ships",
+]
+SPECIFIC_TEMPLATES = [
+    "tell me about the {ship}",
+    "what weapons does the {ship} have",
+    "how fast is the {ship}",
+    "how much cargo can the {ship} carry",
+]
+PRICE_TEMPLATES = [
+    "how much does the {ship} cost",
+    "where can I buy the {ship}",
+]
+SEARCHES = [
+    "/api/ships/search?min_cargo=50&sort=-cargo",
+    "/api/ships/search?max_price=2000000&sort=price&limit=20",
+    "/api/ships/search?role=fighter",
+]
+# Share of each kind of request in the mix
+MIX = {"general": 0.2, "specific": 0.3, "price": 0.2, "ships": 0.15, "search": 0.15}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(client: httpx.Client, process: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            if client.get("/_bench/usage").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("Server did not start in time")
+
+def build_mix(count: int, ships: List[str], rng: random.Random) -> List[Tuple[str, str, str, dict]]:
+    """(kind, method, path, json body) for each request, in a shuffled order."""
+    kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=count)
+    requests = []
+    for kind in kinds:
+        if kind == "general":
+            requests.append((kind, "POST", "/api/query", {"query": rng.choice(GENERAL_QUERIES)}))
+        elif kind == "specific":
+            query = rng.choice(SPECIFIC_TEMPLATES).format(ship=rng.choice(ships))
+            requests.append((kind, "POST", "/api/query", {"query": query}))
+        elif kind == "price":
+            query = rng.choice(PRICE_TEMPLATES).format(ship=rng.choice(ships))
+            requests.append((kind, "POST", "/api/query", {"query": query}))
+        elif kind == "ships":
+            requests.append((kind, "GET", "/api/ships", None))
+        else:
+            requests.append((kind, "GET", rng.choice(SEARCHES), None))
+    return requests
+
+def run_load(client: httpx.Client, requests: List[Tuple[str, str, str, dict]],
+             concurrency: int) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    """Send every request with `concurrency` in flight; returns latencies and error counts by kind, and wall time."""
+    def send(request):
+        kind, method, path, body = request
+        start = time.perf_counter()
+        try:
+            response = client.request(method, path, json=body)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        return kind, time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, requests))
+    wall = time.perf_counter() - started
+
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for kind, seconds, ok in results:
+        latencies.setdefault(kind, []).append(seconds)
+        errors[kind] = errors.get(kind, 0) + (not ok)
+    return latencies, errors, wall
+
+def report_line(name: str, values: List[float], errors: int) -> str:
+    ms = [value * 1000 for value in values]
+    return (f"{name:>9}: {len(ms):5d} req, p50 {percentile(ms, 50):8.1f} ms, p95 {percentile(ms, 95):8.1f} ms, "
+            f"p99 {percentile(ms, 99):8.1f} ms, mean {statistics.mean(ms):8.1f} ms, errors {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per stand-in Gemini call")
+    parser.add_argument("--wiki-latency", type=float, default=0.05, help="seconds per local wiki response")
+    parser.add_argument("--cached-pages", action="store_true", help="let the scrape cache serve pages")
+    parser.add_argument("--response-cache", action="store_true", help="let the response cache serve answers")
+    parser.add_argument("--gemini-rate", type=float, default=0.0,
+                        help="Gemini calls admitted per second; 0 turns admission control off")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the query mix")
+    args = parser.parse_args()
+
+    port = free_port()
+    command = [sys.executable, "-W", "ignore", os.path.join(ROOT, "benchmarks", "stubs.py"), "--port", str(port),
+               "--server", args.server, "--gemini-latency", str(args.gemini_latency),
+               "--wiki-latency", str(args.wiki_latency), "--gemini-rate", str(args.gemini_rate)]
+    command += ["--cached-pages"] * args.cached_pages + ["--response-cache"] * args.response_cache
+
+    # The app logs every request; keep that out of the report but available if the server fails
+    with tempfile.NamedTemporaryFile(prefix="scguide-bench-", suffix=".log", delete=False) as log:
+        server = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            wait_until_ready(client, server)
+            ships = client.get("/api/ships").json()["ships"]
+            rng = random.Random(args.seed)
+            run_load(client, build_mix(args.warmup, ships, rng), args.concurrency)
+
+            before = client.get("/_bench/usage").json()
+            latencies, errors, wall = run_load(client, build_mix(args.requests, ships, rng), args.concurrency)
+            after = client.get("/_bench/usage").json()
+    except SystemExit:
+        print(f"Server log: {log.name}", file=sys.stderr)
+        raise
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.server} server, {total} requests, concurrency {args.concurrency}, "
+          f"Gemini {args.gemini_latency * 1000:.0f} ms, wiki {args.wiki_latency * 1000:.0f} ms")
+    for kind in MIX:
+        if kind in latencies:
+            print(report_line(kind, latencies[kind], errors[kind]))
+    print(report_line("all", [value for values in latencies.values() for value in values], sum(errors.values())))
+    print(f"throughput: {total / wall:.1f} req/s over {wall:.1f} s")
+    print(f"server CPU: {(after['cpu_seconds'] - before['cpu_seconds']) * 1000 / total:.2f} ms/request")
+    print(f"server memory: {(after['rss_kb'] - before['rss_kb']) / total:+.1f} KB/request resident growth, "
+          f"peak {after['max_rss_kb'] / 1024:.0f} MB")
+    os.remove(log.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Time the hot library calls on their own: ship lookup, page scraping and ship data loading.
+
+Run from anywhere:
+
+    python benchmarks/micro_benchmark.py [--runs 20]
+
+find_relevant_ships runs over the labelled queries in resolver_queries.json.
+scrape_url fetches the saved ship page from a local server (see stubs.py)
+with the page store and scrape cache turned off, so each call does a real
+GET and parse; parse_page times the parse alone. ShipDataManager is loaded
+cold (parsing the data files) and warm (from its snapshot, as every worker
+start after the first does). Use these to spot a regression in one
+component; load_benchmark.py shows what it costs end to end.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from scraper import WebScraper  # noqa: E402
+from ship_data import ShipDataManager  # noqa: E402
+from stubs import FIXTURES, LocalWikiClient, start_wiki  # noqa: E402
+
+def timed(function, runs):
+    """Milliseconds per call of function over `runs` calls, after one warm-up call."""
+    function()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(name, timings, per=""):
+    print(f"{name:>26}: median {statistics.median(timings):8.3f} ms{per}, min {min(timings):8.3f} ms, "
+          f"max {max(timings):8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="timed calls per benchmark")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    os.chdir(ROOT)
+
+    # Ship data: cold parse of the data files, then a warm load from a snapshot
+    with tempfile.TemporaryDirectory() as scratch:
+        snapshot = os.path.join(scratch, "ship_data.pickle")
+        report("ShipDataManager cold", timed(lambda: ShipDataManager(snapshot_file=None), args.runs))
+        ShipDataManager(snapshot_file=snapshot)
+        report("ShipDataManager warm", timed(lambda: ShipDataManager(snapshot_file=snapshot), args.runs))
+
+    ship_manager = ShipDataManager()
+    with open(os.path.join(ROOT, "benchmarks", "resolver_queries.json")) as f:
+        queries = [item["query"] for item in json.load(f)]
+    lookups = timed(lambda: [ship_manager.find_relevant_ships(query) for query in queries], args.runs)
+    report("find_relevant_ships", [total / len(queries) for total in lookups], " per query")
+
+    wiki = start_wiki(latency=0.0)
+    scraper = WebScraper(http=LocalWikiClient(f"http://127.0.0.1:{wiki.server_port}"))
+    url = next(iter(ship_manager.get_relevant_urls(ship_manager.ships)))
+    report("scrape_url (local GET)", timed(lambda: scraper.scrape_url(url), args.runs))
+    with open(os.path.join(FIXTURES, "ship_page.html"), encoding="utf-8") as f:
+        html = f.read()
+    report(f"parse_page ({scraper.parser.backend})", timed(lambda: scraper.parse_page(html), args.runs))
+    wiki.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare HTML parser backends on saved wiki pages: parse time and peak memory.
+
+Run from anywhere:
+
+    python benchmarks/parser_benchmark.py [--runs 20] [--fixtures DIR]
+
+The fixtures are saved copies of a ship page and the price list (see
+benchmarks/fixtures). Each backend is measured in a fresh interpreter, so one
+backend's memory is never charged to another. "baseline" is the previous
+behaviour: BeautifulSoup with html.parser over the whole page. Peak memory
+is the tracemalloc peak of one parse after a warm-up parse. It counts
+everything allocated through Python's allocator, lexbor's tree included, but
+not the buffers libxml2 allocates for lxml. The benchmark first checks that
+every backend extracts the same content.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from page_parser import available_backends  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+PAGES = {"ship page": "ship_page.html", "price list": "price_page.html"}
+
+# Executed in a fresh interpreter per backend and page; prints one JSON line
+PROBE = """
+import json, logging, statistics, sys, time, tracemalloc
+logging.disable(logging.CRITICAL)
+from bs4 import BeautifulSoup
+from page_parser import PageParser
+backend, kind, path, runs = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+html = open(path, encoding="utf-8").read()
+if backend == "baseline":
+    parse = lambda: BeautifulSoup(html, "html.parser")
+else:
+    parser = PageParser(backend)
+    parse = (lambda: parser.parse_page(html)) if kind == "page" else (lambda: parser.price_rows(html))
+
+parse()
+tracemalloc.start()
+result = parse()
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+del result
+
+timings = []
+for _ in range(runs):
+    start = time.perf_counter()
+    parse()
+    timings.append((time.perf_counter() - start) * 1000)
+print(json.dumps({"median_ms": statistics.median(timings), "min_ms": min(timings),
+                  "peak_kb": peak / 1024}))
+"""
+
+def run_probe(backend: str, kind: str, path: str, runs: int):
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE, backend, kind, path, str(runs)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check_agreement(backends, paths):
+    """Every backend must extract exactly what html.parser does."""
+    import logging
+    logging.disable(logging.CRITICAL)
+    from page_parser import PageParser
+    reference = PageParser("html.parser")
+    for backend in backends:
+        parser = PageParser(backend)
+        for name, path in paths.items():
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            if name == "price list":
+                same = parser.price_rows(html) == reference.price_rows(html)
+            else:
+                same = parser.parse_page(html) == reference.parse_page(html)
+            if not same:
+                raise SystemExit(f"{backend} disagrees with html.parser on the {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="timed parses per backend and page")
+    parser.add_argument("--fixtures", default=FIXTURES, help="directory holding the saved pages")
+    args = parser.parse_args()
+
+    paths = {name: os.path.join(args.fixtures, filename) for name, filename in PAGES.items()}
+    backends = available_backends()
+    check_agreement(backends, paths)
+
+    for name, path in paths.items():
+        kind = "price" if name == "price list" else "page"
+        print(f"{name} ({os.path.getsize(path) / 1024:.0f} KB, {args.runs} runs)")
+        for backend in ["baseline"] + backends:
+            result = run_probe(backend, kind, path, args.runs)
+            print(f"  {backend:>11}: median {result['median_ms']:7.2f} ms, min {result['min_ms']:7.2f} ms, "
+                  f"peak memory {result['peak_kb']:6.0f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Measure QueryResolver accuracy and per-query latency on a labelled query set.
+
+Run from anywhere:
+
+    python benchmarks/resolver_benchmark.py [--queries benchmarks/resolver_queries.json] [--repeat 20]
+
+Each labelled query has the expected intent and, for SPECIFIC queries, the
+expected ship (``null`` when the ship is ambiguous and the resolver should
+defer to the LLM). A local answer below the confidence threshold counts as a
+fallback rather than an error, because production then asks Gemini instead.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ship_data import ShipDataManager  # noqa: E402
+from query_resolver import QueryResolver  # noqa: E402
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", default=os.path.join(ROOT, "benchmarks", "resolver_queries.json"))
+    parser.add_argument("--repeat", type=int, default=20, help="timed passes over the query set")
+    parser.add_argument("--verbose", action="store_true", help="print every misclassified query")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.chdir(ROOT)
+
+    with open(args.queries, "r") as f:
+        labelled = json.load(f)
+
+    ship_manager = ShipDataManager()
+    start = time.perf_counter()
+    resolver = QueryResolver(ship_manager.get_all_ships())
+    # The index is built lazily on first use; build it here so the first timed resolve does not pay for it
+    resolver._ensure_index()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    counts = {
+        "intent_correct": 0, "intent_fallback": 0, "intent_wrong": 0,
+        "ship_correct": 0, "ship_fallback": 0, "ship_wrong": 0,
+    }
+    ship_cases = 0
+    llm_free = 0
+    for case in labelled:
+        result = resolver.resolve(case["query"])
+        intent_confident = resolver.is_confident(result.intent_confidence)
+        if not intent_confident:
+            counts["intent_fallback"] += 1
+        elif result.intent == case["intent"]:
+            counts["intent_correct"] += 1
+        else:
+            counts["intent_wrong"] += 1
+            if args.verbose:
+                print(f"intent  {case['query']!r}: got {result.intent}, expected {case['intent']}")
+
+        ship_confident = resolver.is_confident(result.ship_confidence)
+        if case["intent"] == "SPECIFIC":
+            ship_cases += 1
+            if case["ship"] is None:
+                # Ambiguous on purpose: deferring to the LLM is the right answer
+                key = "ship_wrong" if ship_confident else "ship_correct"
+            elif not ship_confident:
+                key = "ship_fallback"
+            elif result.ship_name == case["ship"]:
+                key = "ship_correct"
+            else:
+                key = "ship_wrong"
+            counts[key] += 1
+            if key == "ship_wrong" and args.verbose:
+                print(f"ship    {case['query']!r}: got {result.ship_name} ({result.ship_confidence}), expected {case['ship']}")
+            if intent_confident and ship_confident:
+                llm_free += 1
+        elif intent_confident:
+            llm_free += 1
+
+    latencies = []
+    for _ in range(args.repeat):
+        for case in labelled:
+            start = time.perf_counter()
+            resolver.resolve(case["query"])
+            latencies.append((time.perf_counter() - start) * 1_000_000)
+
+    total = len(labelled)
+    print(f"queries: {total} ({ship_cases} SPECIFIC), index build: {build_ms:.1f} ms")
+    print(f"intent: {counts['intent_correct']} correct, {counts['intent_fallback']} fallback, "
+          f"{counts['intent_wrong']} wrong ({counts['intent_correct'] / total:.0%} resolved locally)")
+    print(f"ship:   {counts['ship_correct']} correct, {counts['ship_fallback']} fallback, "
+          f"{counts['ship_wrong']} wrong")
+    print(f"queries needing no routing LLM call: {llm_free}/{total} ({llm_free / total:.0%})")
+    print(f"latency per query: p50 {percentile(latencies, 50):.0f} us, "
+          f"p95 {percentile(latencies, 95):.0f} us, "
+          f"mean {statistics.mean(latencies):.0f} us")
+
+if __name__ == "__main__":
+    main()
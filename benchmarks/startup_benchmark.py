@@ -0,0 +1,70 @@
+"""Measure how long a fresh worker takes to import the app and answer its first lookups.
+
+Run from anywhere:
+
+    python benchmarks/startup_benchmark.py [--runs 5] [--cold]
+
+Every run starts a new interpreter, so import caches and module state are
+never shared between runs. ``--cold`` deletes the ship data snapshot before
+each run to measure a first deployment; by default the snapshot written by
+the first run is reused, as on every later worker start. The first resolve
+and search are timed separately because their indexes are built lazily.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ship_data import SNAPSHOT_FILE  # noqa: E402
+
+# Executed in a fresh interpreter for every run; prints one JSON line of timings in milliseconds
+PROBE = """
+import json, logging, time
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.query_resolver.resolve("how much does the Cutlass Black cost")
+resolved = time.perf_counter()
+app.ship_search.search({"min_cargo": 50}, sort="price", limit=10)
+searched = time.perf_counter()
+print(json.dumps({
+    "import_app": (imported - start) * 1000,
+    "first_resolve": (resolved - imported) * 1000,
+    "first_search": (searched - resolved) * 1000,
+}))
+"""
+
+def run_probe():
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--cold", action="store_true", help="delete the ship data snapshot before every run")
+    args = parser.parse_args()
+
+    snapshot = os.path.join(ROOT, SNAPSHOT_FILE)
+    timings = {}
+    for _ in range(args.runs):
+        if args.cold and os.path.exists(snapshot):
+            os.remove(snapshot)
+        for stage, value in run_probe().items():
+            timings.setdefault(stage, []).append(value)
+
+    print(f"runs: {args.runs} ({'cold, no snapshot' if args.cold else 'warm snapshot'})")
+    for stage, values in timings.items():
+        print(f"{stage:>14}: median {statistics.median(values):7.1f} ms, "
+              f"min {min(values):7.1f} ms, max {max(values):7.1f} ms")
+
+if __name__ == "__main__":
+    main()
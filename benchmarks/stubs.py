@@ -0,0 +1,221 @@
+"""Run the app offline against a stand-in Gemini and a local copy of the wiki.
+
+Run from anywhere:
+
+    python benchmarks/stubs.py [--port 5050] [--server flask|asgi] [--gemini-latency 0.3] [--wiki-latency 0.05]
+                               [--gemini-rate 0]
+
+The stand-in Gemini is the real GeminiClient with its model swapped for one
+that sleeps for the configured latency and returns a canned answer, so the
+concurrency limit, retries and metrics still run. Admission control is
+off unless --gemini-rate gives it a rate to enforce. Wiki requests still go
+through the shared HttpClient, but they are sent to a local server that
+serves the saved pages in benchmarks/fixtures: the price list for
+/Purchasing_ships and the ship page for everything else.
+
+The app runs in a scratch directory (ship data files linked, caches empty),
+so benchmark pages never reach the real scrape cache or page store. By
+default scraped pages expire at once and answers are not cached, so every
+query runs the full pipeline, downloading and parsing its ship page. Pass --cached-pages or --response-cache to
+measure the warm paths instead. GET /_bench/usage reports the server's CPU
+time and memory for load_benchmark.py.
+"""
+import argparse
+import asyncio
+import os
+import re
+import resource
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gemini_client  # noqa: E402
+import http_client  # noqa: E402
+from gemini_client import GeminiClient  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+PRICE_LIST_PATH = "/Purchasing_ships"
+# Canned answer, about the length of a real one
+ANSWER = "## Overview\n" + "The ship is well suited to the task described in the question. " * 30
+
+class StubUsage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+
+class StubResponse:
+    def __init__(self, prompt: str, text: str):
+        self.text = text
+        self.usage_metadata = StubUsage(prompt, text)
+
+class StubModel:
+    """Answers like Gemini after `latency` seconds, without the network."""
+
+    def __init__(self, latency: float, ship_names: Any):
+        self.latency = latency
+        self.ship_names = ship_names
+
+    def _answer(self, prompt: str) -> str:
+        if "Return ONLY one of these exact words" in prompt:
+            return "SPECIFIC" if self._ship_in(prompt) != "NONE" else "GENERAL"
+        if prompt.rstrip().endswith("Ship name:"):
+            return self._ship_in(prompt)
+        return ANSWER
+
+    def _ship_in(self, prompt: str) -> str:
+        match = re.search(r'"([^"]*)"', prompt)
+        question = match.group(1).lower() if match else ""
+        found = [name for name in self.ship_names() if name.lower() in question]
+        return max(found, key=len) if found else "NONE"
+
+    def generate_content(self, contents: str, generation_config: Any = None, stream: bool = False) -> StubResponse:
+        time.sleep(self.latency)
+        return StubResponse(contents, self._answer(contents))
+
+    async def generate_content_async(self, contents: str, generation_config: Any = None,
+                                     stream: bool = False) -> StubResponse:
+        await asyncio.sleep(self.latency)
+        return StubResponse(contents, self._answer(contents))
+
+class StubGeminiClient(GeminiClient):
+    """GeminiClient whose model is a StubModel."""
+
+    def __init__(self, latency: float, ship_names: Any):
+        super().__init__()
+        self._model = StubModel(latency, ship_names)
+
+    def _generation_config(self, temperature: Optional[float], max_output_tokens: Optional[int]) -> Dict[str, Any]:
+        return {"temperature": temperature, "max_output_tokens": max_output_tokens}
+
+class LocalWikiClient(HttpClient):
+    """HttpClient that sends every wiki request to the local fixture server instead."""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+
+    def _local(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{self.base_url}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None):
+        return super().get(self._local(url), headers)
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None):
+        return await super().aget(self._local(url), headers)
+
+def start_wiki(latency: float) -> ThreadingHTTPServer:
+    """Serve the saved wiki pages on a free local port.
+
+    Conditional requests always get the full page, never a 304, so every
+    scrape of an expired page is downloaded and parsed again.
+    """
+    pages = {}
+    for path, filename in ((PRICE_LIST_PATH, "price_page.html"), ("*", "ship_page.html")):
+        with open(os.path.join(FIXTURES, filename), "rb") as f:
+            pages[path] = f.read()
+
+    class WikiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = pages.get(urlsplit(self.path).path, pages["*"])
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WikiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def scratch_directory() -> str:
+    """A working directory with the ship data files and empty caches."""
+    workdir = tempfile.mkdtemp(prefix="scguide-bench-")
+    os.symlink(os.path.join(ROOT, "attached_assets"), os.path.join(workdir, "attached_assets"))
+    os.makedirs(os.path.join(workdir, "cache"))
+    snapshot = os.path.join(ROOT, "cache", "ship_data.pickle")
+    if os.path.exists(snapshot):
+        shutil.copy(snapshot, os.path.join(workdir, "cache"))
+    return workdir
+
+def usage() -> Dict[str, float]:
+    """CPU seconds used by this process so far, and its current and peak memory in KB."""
+    rusage = resource.getrusage(resource.RUSAGE_SELF)
+    rss_kb = 0.0
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            rss_kb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    return {"cpu_seconds": rusage.ru_utime + rusage.ru_stime, "rss_kb": rss_kb, "max_rss_kb": rusage.ru_maxrss}
+
+def install_stubs(gemini_latency: float, wiki_latency: float, cached_pages: bool, response_cache: bool,
+                  gemini_rate: float = 0.0) -> str:
+    """Start the local wiki and swap in the stand-ins; call before importing app. Returns the scratch directory."""
+    wiki = start_wiki(wiki_latency)
+    http_client._client = LocalWikiClient(f"http://127.0.0.1:{wiki.server_port}")
+    if not cached_pages:
+        os.environ["SCRAPE_CACHE_TTL_HOURS"] = "0"
+        os.environ["PAGE_STORE_MAX_AGE_HOURS"] = "0"
+    if not response_cache:
+        os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+    os.environ["GEMINI_RATE_PER_SECOND"] = str(gemini_rate)
+    workdir = scratch_directory()
+    os.chdir(workdir)
+
+    # The model looks ship names up lazily, once app has loaded them
+    def ship_names():
+        import app
+        return app.ship_manager.get_all_ships()
+
+    gemini_client._client = StubGeminiClient(gemini_latency, ship_names)
+    return workdir
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask",
+                        help="threaded Flask server, or the ASGI app under uvicorn")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per stand-in Gemini call")
+    parser.add_argument("--wiki-latency", type=float, default=0.05, help="seconds per local wiki response")
+    parser.add_argument("--cached-pages", action="store_true", help="let the scrape cache serve pages")
+    parser.add_argument("--response-cache", action="store_true", help="let the response cache serve answers")
+    parser.add_argument("--gemini-rate", type=float, default=0.0,
+                        help="Gemini calls admitted per second; 0 turns admission control off")
+    args = parser.parse_args()
+
+    workdir = install_stubs(args.gemini_latency, args.wiki_latency, args.cached_pages, args.response_cache,
+                            args.gemini_rate)
+    # Exit through the finally block on SIGTERM too, so the scratch directory is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        from flask import jsonify
+        import app
+        app.app.add_url_rule("/_bench/usage", "bench_usage", lambda: jsonify(usage()))
+        if args.server == "asgi":
+            import uvicorn
+            uvicorn.run("asgi:application", host="127.0.0.1", port=args.port, log_level="warning")
+        else:
+            from werkzeug.serving import make_server
+            print(f"Serving on http://127.0.0.1:{args.port}", flush=True)
+            make_server("127.0.0.1", args.port, app.app, threaded=True).serve_forever()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
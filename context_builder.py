@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Gemini tokenizes English and numbers at roughly four characters per token
+CHARS_PER_TOKEN = 4
+
+# Question keywords mapped to the ship fields needed to answer them
+FIELD_KEYWORDS = {
+    "price": ["price", "pledge_price"],
+    "cost": ["price", "pledge_price"],
+    "cheap": ["price"],
+    "expensive": ["price"],
+    "auec": ["price"],
+    "value": ["price"],
+    "budget": ["price"],
+    "cargo": ["cargo"],
+    "scu": ["cargo"],
+    "haul": ["cargo"],
+    "freight": ["cargo"],
+    "speed": ["scm_speed", "afterburner_speed"],
+    "fast": ["scm_speed", "afterburner_speed"],
+    "quantum": ["quantum_speed", "quantum_fuel"],
+    "fuel": ["hydrogen_fuel", "quantum_fuel"],
+    "range": ["hydrogen_fuel", "quantum_fuel"],
+    "crew": ["max_crew", "min_crew"],
+    "solo": ["min_crew"],
+    "size": ["size"],
+    "type": ["type"],
+}
+
+# Always sent so that every row can be named and described
+BASE_FIELDS = ["name", "manufacturer", "role"]
+# Sent when the question does not point at any particular statistic
+DEFAULT_FIELDS = ["size", "price", "cargo", "scm_speed", "max_crew"]
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of tokens Gemini will count for text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class ContextBuilder:
+    """Build compact, token-budgeted prompt context from ship rows.
+
+    Only the fields a question needs are kept, rows are written as a
+    pipe-separated table (one header, no repeated keys) and rows are added
+    in order until the token budget is spent.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or int(os.environ.get("PROMPT_TOKEN_BUDGET", 4000))
+
+    @staticmethod
+    def select_fields(query: str, filters: Optional[Dict[str, Any]] = None, sort: Optional[str] = None) -> List[str]:
+        """Pick the fields relevant to the question, its filters and its sort order."""
+        text = query.lower()
+        fields = list(BASE_FIELDS)
+        for keyword, keyword_fields in FIELD_KEYWORDS.items():
+            if keyword in text:
+                fields.extend(field for field in keyword_fields if field not in fields)
+
+        # A filtered or sorted field is always worth showing
+        for key in (filters or {}):
+            field = key.split("_", 1)[1] if key.startswith(("min_", "max_")) else key
+            if field not in fields:
+                fields.append(field)
+        if sort and sort.lstrip("-") not in fields:
+            fields.append(sort.lstrip("-"))
+
+        if len(fields) == len(BASE_FIELDS):
+            fields.extend(field for field in DEFAULT_FIELDS if field not in fields)
+        return fields
+
+    @staticmethod
+    def _cell(value: Any) -> str:
+        if value is None or value == "":
+            return "-"
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).replace("|", "/").replace("\n", " ")
+
+    def build_table(self, rows: List[Dict[str, Any]], fields: List[str], token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """Serialize rows as a table, stopping before the token budget is exceeded."""
+        budget = token_budget or self.token_budget
+        lines = [" | ".join(fields)]
+        used = estimate_tokens(lines[0]) + 1
+
+        included = 0
+        for row in rows:
+            line = " | ".join(self._cell(row.get(field)) for field in fields)
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+            included += 1
+
+        return {
+            "text": "\n".join(lines),
+            "tokens": used,
+            "rows": included,
+            "omitted": len(rows) - included,
+            "fields": fields,
+        }
+
+    def build_ship_table(self, query: str, rows: List[Dict[str, Any]], filters: Optional[Dict[str, Any]] = None,
+                         sort: Optional[str] = None) -> Dict[str, Any]:
+        """Project rows to the fields the question needs and serialize them within budget."""
+        fields = self.select_fields(query, filters, sort)
+        table = self.build_table(rows, fields)
+        logger.info(f"Built ship context: {table['rows']} rows, {len(fields)} fields, "
+                    f"~{table['tokens']} tokens ({table['omitted']} rows over budget)")
+        return table
+
+    @staticmethod
+    def to_json(context: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize a context dict as minified JSON and count its tokens."""
+        text = json.dumps(context, separators=(",", ":"), ensure_ascii=False, default=str)
+        return {"text": text, "tokens": estimate_tokens(text)}
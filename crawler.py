@@ -0,0 +1,118 @@
+"""Bulk crawl every ship page on the wiki into the local page store.
+
+    python crawler.py [--concurrency 4] [--rate 2] [--restart] [--limit N]
+
+Walks the wiki URL of every ship and vehicle known to ShipDataManager
+(the suits, helmets and locations in the wiki export are left to on-demand
+scraping) and fetches the pages concurrently. Request starts are spaced to stay under --rate per second.
+Parsed sections and tables go to the page store (cache/page_store.sqlite),
+which the scraper reads before it touches the network. An interrupted crawl
+resumes where it stopped unless --restart is given. Pages already in the
+store are re-fetched with conditional GETs, so an unchanged page costs only
+a 304. Run it on a new node before it takes traffic to warm the store.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from http_client import HttpClient, conditional_headers, get_http_client
+from page_parser import PageParser
+from page_store import PageStore
+from ship_data import ShipDataManager
+
+logger = logging.getLogger(__name__)
+
+class ShipCrawler:
+    """Fetches a list of wiki pages into a PageStore, politely and resumably."""
+
+    def __init__(self, store: PageStore, http: Optional[HttpClient] = None, parser: Optional[PageParser] = None,
+                 concurrency: int = 4, rate_per_second: float = 2.0):
+        self.store = store
+        self.http = http or get_http_client()
+        self.parser = parser or PageParser()
+        self.concurrency = concurrency
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_start = 0.0
+
+    async def crawl(self, urls: List[str], resume: bool = True) -> Dict[str, int]:
+        """Crawl urls into the store and return how many were changed, unchanged, not modified or failed."""
+        run = self.store.start_run(len(urls), resume)
+        pending = [url for url in urls if not self.store.checked_in_run(url, run["id"])]
+        if len(pending) < len(urls):
+            logger.info(f"Skipping {len(urls) - len(pending)} URLs already crawled in run {run['id']}")
+
+        counts = {"changed": 0, "unchanged": 0, "not_modified": 0, "failed": 0}
+        slots = asyncio.Semaphore(self.concurrency)
+        turn = asyncio.Lock()
+
+        async def crawl_one(url: str) -> None:
+            async with slots:
+                async with turn:
+                    await self._wait_turn()
+                counts[await self._fetch(url, run["id"])] += 1
+                done = sum(counts.values())
+                if done % 50 == 0:
+                    logger.info(f"Crawled {done}/{len(pending)} pages")
+
+        await asyncio.gather(*(crawl_one(url) for url in pending))
+        self.store.finish_run(run, counts)
+        logger.info(f"Crawl run {run['id']} finished: {counts}")
+        return counts
+
+    async def _wait_turn(self) -> None:
+        """Space request starts at least `interval` apart across all workers."""
+        now = time.monotonic()
+        if self._next_start > now:
+            await asyncio.sleep(self._next_start - now)
+        self._next_start = max(now, self._next_start) + self.interval
+
+    async def _fetch(self, url: str, run_id: int) -> str:
+        entry = self.store.get(url)
+        try:
+            response = await self.http.aget(url, headers=conditional_headers(entry))
+        except Exception as e:
+            logger.error(f"Error crawling {url}: {str(e)}")
+            return "failed"
+
+        if response.status_code == 304 and entry:
+            self.store.mark_checked(url, run_id)
+            return "not_modified"
+        if response.status_code != 200:
+            logger.error(f"Failed to download {url}: {response.status_code}")
+            return "failed"
+
+        content = await asyncio.to_thread(self.parser.parse_page, response.text)
+        if not isinstance(content, dict):
+            logger.error(f"No content found on {url}")
+            return "failed"
+        changed = self.store.put(url, content, response.headers.get("ETag"),
+                                 response.headers.get("Last-Modified"), run_id)
+        return "changed" if changed else "unchanged"
+
+async def _run(args: Any) -> Dict[str, int]:
+    ship_manager = ShipDataManager()
+    urls = sorted(ship_manager.get_vehicle_urls())
+    if args.limit:
+        urls = urls[:args.limit]
+    crawler = ShipCrawler(PageStore(args.store), concurrency=args.concurrency, rate_per_second=args.rate)
+    try:
+        return await crawler.crawl(urls, resume=not args.restart)
+    finally:
+        await crawler.http.aclose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=4, help="pages fetched at the same time")
+    parser.add_argument("--rate", type=float, default=2.0, help="maximum request starts per second")
+    parser.add_argument("--restart", action="store_true", help="start a new run instead of resuming an unfinished one")
+    parser.add_argument("--limit", type=int, default=0, help="crawl only the first N URLs")
+    parser.add_argument("--store", default="cache/page_store.sqlite", help="page store database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = asyncio.run(_run(args))
+    print(", ".join(f"{key}: {value}" for key, value in counts.items()))
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,38 @@
-import google.generativeai as genai
+import asyncio
 import os
 import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from admission import GENERATION, AdmissionController, Overloaded
+from single_flight import SingleFlight
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+def retryable_errors() -> Tuple[type, ...]:
+    """Upstream errors worth retrying: quota, overload and transient server failures."""
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+
+def quota_errors() -> Tuple[type, ...]:
+    """Upstream errors meaning the quota is spent, which admission control backs off from."""
+    from google.api_core import exceptions as google_exceptions
+    return (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
 def initialize_gemini():
     """Initialize the Gemini client with API key from environment."""
     try:
+        # Imported here because the SDK takes about a second to import, which would slow every cold start
+        import google.generativeai as genai
+
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             logger.error("GEMINI_API_KEY environment variable not found")
@@ -19,24 +44,339 @@ def initialize_gemini():
         logger.error(f"Error initializing Gemini client: {e}")
         return None
 
-def query_ship_data(query: str) -> str:
-    """Query the Gemini model about Star Citizen ships."""
-    try:
-        client = initialize_gemini()
-        if not client:
-            return "Error: Unable to initialize Gemini client"
-
-        # Configure the model for consistent, factual responses
-        model = client.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content(
-            contents=query,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,  # Lower temperature for more factual responses
-                max_output_tokens=500,
-            ),
+class GeminiClient:
+    """Long-lived Gemini client shared by every request.
+
+    The SDK is configured and the model built once, so the underlying
+    transport and its connections are reused across calls. Calls are bounded
+    by a concurrency limit, retried with jittered exponential backoff on
+    transient upstream errors, and measured for latency and token usage.
+    Identical prompts asked while one is already in flight share its answer.
+    Every call first passes admission control (see admission.py), which
+    raises Overloaded rather than let calls pile up past the quota.
+    """
+
+    def __init__(self, model_name: str = 'gemini-2.0-flash', temperature: float = 0.1,
+                 max_output_tokens: int = 500, max_concurrency: Optional[int] = None,
+                 max_retries: int = 2, backoff_seconds: float = 0.5):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 16))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._model = None
+        self._genai = None
+        self._retryable: Tuple[type, ...] = ()
+        self._quota_errors: Tuple[type, ...] = ()
+        self._model_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "latency_seconds_total": 0.0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+        self._flights = SingleFlight("gemini")
+        self.admission = AdmissionController()
+
+    def _get_model(self):
+        """Configure the SDK and build the model on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    client = initialize_gemini()
+                    if not client:
+                        raise RuntimeError("Unable to initialize Gemini client")
+                    self._genai = client
+                    self._retryable = retryable_errors()
+                    self._quota_errors = quota_errors()
+                    self._model = client.GenerativeModel(self.model_name)
+        return self._model
+
+    def _generation_config(self, temperature: Optional[float], max_output_tokens: Optional[int]):
+        return self._genai.types.GenerationConfig(
+            temperature=self.temperature if temperature is None else temperature,
+            max_output_tokens=self.max_output_tokens if max_output_tokens is None else max_output_tokens,
         )
 
-        return response.text
+    def _record(self, started: float, response: Any = None, error: bool = False) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        with self._metrics_lock:
+            self._metrics["calls"] += 1
+            self._metrics["latency_seconds_total"] += time.perf_counter() - started
+            if error:
+                self._metrics["errors"] += 1
+            if usage is not None:
+                self._metrics["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+                self._metrics["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+    def _adjust(self, key: str, delta: int) -> None:
+        with self._metrics_lock:
+            self._metrics[key] += delta
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+        logger.warning(f"Gemini call failed ({error}); retrying in {delay:.2f}s")
+        self._adjust("retries", 1)
+        return delay
+
+    def _backoff(self, attempt: int, error: Exception) -> None:
+        time.sleep(self._backoff_delay(attempt, error))
+
+    def _give_up(self, error: Exception) -> Exception:
+        """The error to raise once retries are exhausted: Overloaded if the quota is spent."""
+        if isinstance(error, self._quota_errors):
+            retry_after = self.backoff_seconds * (2 ** (self.max_retries + 1))
+            # Hold back everyone else too, rather than let them hit the same wall
+            self.admission.pause(retry_after)
+            return Overloaded("The Gemini quota is exhausted; please retry shortly", retry_after)
+        return error
+
+    async def _acquire_slot(self) -> None:
+        # The limit is shared with threaded callers, so poll it rather than block the event loop
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+
+    def _flight_key(self, prompt: str, temperature: Optional[float], max_output_tokens: Optional[int],
+                    priority: int) -> Tuple[str, Optional[float], Optional[int], int]:
+        # Prompts differing only in whitespace get the same answer. Calls are only
+        # shared within a priority class, so a request never waits on a lower
+        # priority caller's place in the admission queue.
+        return " ".join(prompt.split()), temperature, max_output_tokens, priority
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> str:
+        """Generate a complete answer, raising once retries are exhausted."""
+        return self._flights.do(self._flight_key(prompt, temperature, max_output_tokens, priority),
+                                self._generate, prompt, temperature, max_output_tokens, priority)
+
+    def _generate(self, prompt: str, temperature: Optional[float], max_output_tokens: Optional[int],
+                  priority: int) -> str:
+        model = self._get_model()
+        config = self._generation_config(temperature, max_output_tokens)
+        attempt = 0
+        while True:
+            self.admission.acquire(priority)
+            started = time.perf_counter()
+            with self._slots:
+                self._adjust("in_flight", 1)
+                try:
+                    response = model.generate_content(contents=prompt, generation_config=config)
+                    self._record(started, response)
+                    return response.text
+                except self._retryable as e:
+                    self._record(started, error=True)
+                    if attempt >= self.max_retries:
+                        raise self._give_up(e)
+                    error = e
+                except Exception:
+                    self._record(started, error=True)
+                    raise
+                finally:
+                    self._adjust("in_flight", -1)
+            # Back off outside the concurrency slot so waiting does not block other callers
+            self._backoff(attempt, error)
+            attempt += 1
+
+    def stream(self, prompt: str, temperature: Optional[float] = None,
+               max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> Iterator[str]:
+        """Yield answer text chunks as they arrive; retried only before the first chunk."""
+        model = self._get_model()
+        config = self._generation_config(temperature, max_output_tokens)
+        attempt = 0
+        while True:
+            self.admission.acquire(priority)
+            started = time.perf_counter()
+            yielded = False
+            response = None
+            with self._slots:
+                self._adjust("in_flight", 1)
+                try:
+                    response = model.generate_content(contents=prompt, generation_config=config, stream=True)
+                    for chunk in response:
+                        # Chunks without text parts (e.g. the final safety/finish chunk) raise on .text
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            continue
+                        if text:
+                            yielded = True
+                            yield text
+                    self._record(started, response)
+                    return
+                except self._retryable as e:
+                    self._record(started, error=True)
+                    if yielded or attempt >= self.max_retries:
+                        raise self._give_up(e)
+                    error = e
+                except Exception:
+                    self._record(started, error=True)
+                    raise
+                finally:
+                    self._adjust("in_flight", -1)
+            self._backoff(attempt, error)
+            attempt += 1
+
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None,
+                        max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> str:
+        """Async counterpart of generate() for callers running on an event loop."""
+        return await self._flights.ado(self._flight_key(prompt, temperature, max_output_tokens, priority),
+                                       self._agenerate, prompt, temperature, max_output_tokens, priority)
+
+    async def _agenerate(self, prompt: str, temperature: Optional[float], max_output_tokens: Optional[int],
+                         priority: int) -> str:
+        model = self._get_model()
+        config = self._generation_config(temperature, max_output_tokens)
+        attempt = 0
+        while True:
+            await self.admission.aacquire(priority)
+            started = time.perf_counter()
+            await self._acquire_slot()
+            self._adjust("in_flight", 1)
+            try:
+                response = await model.generate_content_async(contents=prompt, generation_config=config)
+                self._record(started, response)
+                return response.text
+            except self._retryable as e:
+                self._record(started, error=True)
+                if attempt >= self.max_retries:
+                    raise self._give_up(e)
+                error = e
+            except Exception:
+                self._record(started, error=True)
+                raise
+            finally:
+                self._adjust("in_flight", -1)
+                self._slots.release()
+            await asyncio.sleep(self._backoff_delay(attempt, error))
+            attempt += 1
+
+    async def astream(self, prompt: str, temperature: Optional[float] = None,
+                      max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> AsyncIterator[str]:
+        """Async counterpart of stream(); retried only before the first chunk."""
+        model = self._get_model()
+        config = self._generation_config(temperature, max_output_tokens)
+        attempt = 0
+        while True:
+            await self.admission.aacquire(priority)
+            started = time.perf_counter()
+            yielded = False
+            await self._acquire_slot()
+            self._adjust("in_flight", 1)
+            try:
+                response = await model.generate_content_async(contents=prompt, generation_config=config, stream=True)
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        yielded = True
+                        yield text
+                self._record(started, response)
+                return
+            except self._retryable as e:
+                self._record(started, error=True)
+                if yielded or attempt >= self.max_retries:
+                    raise self._give_up(e)
+                error = e
+            except Exception:
+                self._record(started, error=True)
+                raise
+            finally:
+                self._adjust("in_flight", -1)
+                self._slots.release()
+            await asyncio.sleep(self._backoff_delay(attempt, error))
+            attempt += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of call counts, latency and token usage."""
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        completed = snapshot["calls"]
+        snapshot["latency_seconds_avg"] = snapshot["latency_seconds_total"] / completed if completed else 0.0
+        snapshot["coalesced"] = self._flights.stats()["shared"]
+        return snapshot
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> GeminiClient:
+    """Return the process-wide Gemini client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient()
+    return _client
+
+def error_message(error: Exception) -> str:
+    """What a user is shown in place of an answer Gemini failed to produce."""
+    return f"Error processing query: {str(error)}"
+
+def query_ship_data(query: str, temperature: Optional[float] = None, max_output_tokens: Optional[int] = None,
+                    priority: int = GENERATION, raise_errors: bool = False) -> str:
+    """Query the Gemini model about Star Citizen ships; Overloaded propagates so callers can answer 429.
+
+    Other failures are returned as an error message, or raised with
+    raise_errors so the caller can tell them from an answer.
+    """
+    try:
+        return get_client().generate(query, temperature=temperature, max_output_tokens=max_output_tokens,
+                                     priority=priority)
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Error querying Gemini: {e}")
-        return f"Error processing query: {str(e)}"
\ No newline at end of file
+        if raise_errors:
+            raise
+        return error_message(e)
+
+def stream_ship_data(query: str, temperature: Optional[float] = None,
+                     max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> Iterator[str]:
+    """Stream the Gemini model's answer about Star Citizen ships as text chunks.
+
+    A failure is raised rather than yielded, so callers can tell it from the
+    answer (and a cut-off answer from a complete one).
+    """
+    try:
+        yield from get_client().stream(query, temperature=temperature, max_output_tokens=max_output_tokens,
+                                       priority=priority)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming from Gemini: {e}")
+        raise
+
+async def aquery_ship_data(query: str, temperature: Optional[float] = None, max_output_tokens: Optional[int] = None,
+                           priority: int = GENERATION, raise_errors: bool = False) -> str:
+    """Async counterpart of query_ship_data()."""
+    try:
+        return await get_client().agenerate(query, temperature=temperature, max_output_tokens=max_output_tokens,
+                                            priority=priority)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"Error querying Gemini: {e}")
+        if raise_errors:
+            raise
+        return error_message(e)
+
+async def astream_ship_data(query: str, temperature: Optional[float] = None,
+                            max_output_tokens: Optional[int] = None, priority: int = GENERATION) -> AsyncIterator[str]:
+    """Async counterpart of stream_ship_data()."""
+    try:
+        async for chunk in get_client().astream(query, temperature=temperature, max_output_tokens=max_output_tokens,
+                                                priority=priority):
+            yield chunk
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming from Gemini: {e}")
+        raise
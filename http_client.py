@@ -0,0 +1,298 @@
+"""Shared outbound HTTP for every wiki fetch.
+
+One pooled requests.Session (threads) and one httpx.AsyncClient (event
+loop) keep connections alive and accept gzip. Every call has connect and
+read timeouts and is retried with jittered exponential backoff on
+connection errors, timeouts, 429 and 5xx. Each host has a concurrency
+limit and a circuit breaker. The sync and async paths share both, so a
+slow wiki cannot tie up every worker.
+
+Settings come from the environment (or constructor arguments):
+HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES,
+HTTP_BACKOFF_SECONDS, HTTP_PER_HOST_LIMIT, HTTP_ACQUIRE_TIMEOUT,
+HTTP_BREAKER_THRESHOLD and HTTP_BREAKER_COOLDOWN.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "StarCitizenGuide/1.0 (+https://starcitizen.tools)"
+# Statuses that mean "try again later" rather than "this request is wrong"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Upper bound on any single backoff, including a server's Retry-After
+MAX_BACKOFF_SECONDS = 10.0
+
+def _setting(value: Optional[float], name: str, default: float) -> float:
+    """An explicit argument wins, then the environment variable, then the default."""
+    if value is not None:
+        return value
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={os.environ[name]!r}; using {default}")
+        return default
+
+def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers from a stored entry's validators."""
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+class HostBusyError(Exception):
+    """Raised when a host's concurrency limit stays full for longer than the acquire timeout."""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host.
+
+    After `threshold` failures in a row the circuit opens and calls fail fast
+    for `cooldown_seconds`. Then a single trial call is let through: success
+    closes the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: int, cooldown_seconds: float):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.cooldown_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give back a trial call that ended in an error unrelated to the host's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if was_trial or (self._opened_at is None and self.failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+class HttpClient:
+    """Pooled, bounded and self-protecting GETs, shared by the scraper and the price manager."""
+
+    def __init__(self, connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff_seconds: Optional[float] = None,
+                 per_host_limit: Optional[int] = None, acquire_timeout: Optional[float] = None,
+                 breaker_threshold: Optional[int] = None, breaker_cooldown_seconds: Optional[float] = None):
+        self.connect_timeout = _setting(connect_timeout, "HTTP_CONNECT_TIMEOUT", 5.0)
+        self.read_timeout = _setting(read_timeout, "HTTP_READ_TIMEOUT", 20.0)
+        self.max_retries = int(_setting(max_retries, "HTTP_MAX_RETRIES", 2))
+        self.backoff_seconds = _setting(backoff_seconds, "HTTP_BACKOFF_SECONDS", 0.5)
+        self.per_host_limit = int(_setting(per_host_limit, "HTTP_PER_HOST_LIMIT", 8))
+        self.acquire_timeout = _setting(acquire_timeout, "HTTP_ACQUIRE_TIMEOUT", 10.0)
+        self.breaker_threshold = int(_setting(breaker_threshold, "HTTP_BREAKER_THRESHOLD", 5))
+        self.breaker_cooldown_seconds = _setting(breaker_cooldown_seconds, "HTTP_BREAKER_COOLDOWN", 30.0)
+        self._session: Optional[requests.Session] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, Tuple[threading.BoundedSemaphore, CircuitBreaker]] = {}
+        self._lock = threading.Lock()
+        self._metrics = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    def _get_session(self) -> requests.Session:
+        """Keep-alive session whose pool holds one connection per concurrent request to a host."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.per_host_limit)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+                    self._session = session
+        return self._session
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Pooled async client, created on first use by the event loop."""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.per_host_limit),
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+            )
+        return self._async_client
+
+    def _host(self, url: str) -> Tuple[str, threading.BoundedSemaphore, CircuitBreaker]:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            with self._lock:
+                if host not in self._hosts:
+                    self._hosts[host] = (threading.BoundedSemaphore(self.per_host_limit),
+                                         CircuitBreaker(self.breaker_threshold, self.breaker_cooldown_seconds))
+        return (host, *self._hosts[host])
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._metrics[key] += 1
+
+    def _check_breaker(self, host: str, slots: threading.BoundedSemaphore, breaker: CircuitBreaker) -> None:
+        # Checked while holding a host slot, so a granted half-open trial always gets to run
+        if not breaker.allow():
+            slots.release()
+            self._count("rejected")
+            raise CircuitOpenError(f"Circuit breaker open for {host}; not calling it for now")
+
+    def _record(self, host: str, breaker: CircuitBreaker, error: Optional[Any]) -> None:
+        if error is None:
+            breaker.record_success()
+            return
+        self._count("failures")
+        if breaker.record_failure():
+            logger.warning(f"Circuit breaker opened for {host} after {breaker.failures} failures ({error})")
+
+    def _backoff_delay(self, attempt: int, error: Any, response: Any = None) -> float:
+        delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        delay = min(delay, MAX_BACKOFF_SECONDS)
+        logger.warning(f"HTTP request failed ({error}); retrying in {delay:.2f}s")
+        self._count("retries")
+        return delay
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET url, retrying transient failures.
+
+        A 429/5xx response that outlasts the retries is returned for the caller
+        to handle; connection errors and timeouts are raised.
+        """
+        host, slots, breaker = self._host(url)
+        attempt = 0
+        while True:
+            if not slots.acquire(timeout=self.acquire_timeout):
+                self._count("rejected")
+                raise HostBusyError(f"Too many requests in flight to {host}")
+            self._check_breaker(host, slots, breaker)
+            response = None
+            self._count("requests")
+            try:
+                response = self._get_session().get(url, headers=headers,
+                                                   timeout=(self.connect_timeout, self.read_timeout))
+                error = f"HTTP {response.status_code}" if response.status_code in RETRY_STATUSES else None
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                error = e
+            except BaseException:
+                breaker.release_trial()
+                raise
+            finally:
+                slots.release()
+
+            self._record(host, breaker, error)
+            if error is None:
+                return response
+            if attempt >= self.max_retries:
+                if response is not None:
+                    return response
+                raise error
+            # Back off outside the host slot so waiting does not block other callers
+            time.sleep(self._backoff_delay(attempt, error, response))
+            attempt += 1
+
+    async def _acquire_slot(self, host: str, slots: threading.BoundedSemaphore) -> None:
+        # The limit is shared with threaded callers, so poll it rather than block the event loop
+        deadline = time.monotonic() + self.acquire_timeout
+        while not slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._count("rejected")
+                raise HostBusyError(f"Too many requests in flight to {host}")
+            await asyncio.sleep(0.01)
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Async counterpart of get()."""
+        host, slots, breaker = self._host(url)
+        attempt = 0
+        while True:
+            await self._acquire_slot(host, slots)
+            self._check_breaker(host, slots, breaker)
+            response = None
+            self._count("requests")
+            try:
+                response = await self._get_async_client().get(url, headers=headers)
+                error = f"HTTP {response.status_code}" if response.status_code in RETRY_STATUSES else None
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                breaker.release_trial()
+                raise
+            finally:
+                slots.release()
+
+            self._record(host, breaker, error)
+            if error is None:
+                return response
+            if attempt >= self.max_retries:
+                if response is not None:
+                    return response
+                raise error
+            await asyncio.sleep(self._backoff_delay(attempt, error, response))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Request, retry and failure counts, plus each host's breaker state."""
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._metrics)
+            hosts = dict(self._hosts)
+        snapshot["hosts"] = {host: {"breaker": breaker.state, "consecutive_failures": breaker.failures}
+                             for host, (_, breaker) in hosts.items()}
+        return snapshot
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
@@ -0,0 +1,237 @@
+"""Request metrics in the Prometheus text format, and per-request stage timings.
+
+Each stage of answering a query runs inside `with stage("scrape"):`. This
+records the time in a histogram labelled by stage and, when the current
+request is traced, adds a span to its trace. The web layer starts a trace
+per request and returns the spans in a Server-Timing header, along with an
+X-Request-ID to match the response to log lines. Counters and statistics
+kept elsewhere (caches, Gemini, HTTP) are added as sources that are read
+only when /metrics is scraped, so the request path does no extra work.
+
+No Prometheus client library is needed. Metrics are kept per process, like
+every other statistic in the app.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Request IDs from clients are echoed back in a header, so only accept plain tokens
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """A monotonically increasing total, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+class Histogram:
+    """Observations counted into fixed cumulative buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket plus +Inf], sum of observations
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Owns the app's metrics and renders them, plus any registered stats sources, for /metrics."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._sources: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_source(self, prefix: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Export every numeric value of stats() as a gauge named prefix_key when /metrics is scraped."""
+        self._sources.append((prefix, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for prefix, stats in self._sources:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Error collecting {prefix} metrics: {str(e)}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "scguide_request_duration_seconds", "Time to produce a response, by route and status.", ("route", "status")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "scguide_stage_duration_seconds", "Time spent in each stage of answering a query.", ("stage",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "scguide_cache_lookups_total", "Cache lookups made while answering queries, by cache and result.",
+    ("cache", "result")
+)
+COALESCED_CALLS = REGISTRY.counter(
+    "scguide_coalesced_calls_total",
+    "Scrapes, price list fetches and Gemini calls; shared ones waited on an identical call already in flight.",
+    ("call", "result")
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "scguide_prompt_tokens_total", "Estimated tokens in the prompts built for Gemini, by query type.", ("query_type",)
+)
+PROMPT_SIZE = REGISTRY.histogram(
+    "scguide_prompt_tokens", "Estimated tokens per prompt built for Gemini, by query type.", ("query_type",),
+    buckets=TOKEN_BUCKETS
+)
+
+class Trace:
+    """Request ID and stage timings of one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """The spans as a Server-Timing header value, e.g. "intent;dur=412.3, scrape;dur=95.0"."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans)
+
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+def request_id(incoming: Optional[str] = None) -> str:
+    """The client's X-Request-ID if it is a plain token, otherwise a new one."""
+    if incoming and REQUEST_ID_PATTERN.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+def start_trace(incoming_id: Optional[str] = None) -> Tuple[Trace, contextvars.Token]:
+    """Trace the current request; pass the token to end_trace() when it is done."""
+    trace = Trace(request_id(incoming_id))
+    return trace, _trace.set(trace)
+
+def end_trace(token: contextvars.Token) -> None:
+    _trace.reset(token)
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+def finish_request(trace: Trace, method: str, route: str, status: int) -> None:
+    """Record a finished request's latency and log it with its request ID and stage timings."""
+    elapsed = trace.elapsed()
+    REQUEST_SECONDS.observe(elapsed, route=route, status=status)
+    logger.info(f"{method} {route} {status} in {elapsed * 1000:.0f} ms "
+                f"[request {trace.request_id}] {trace.server_timing()}")
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.spans.append((name, elapsed))
+
+class LazyJson:
+    """Serializes a value only if the log record holding it is emitted.
+
+    logger.debug("Context: %s", LazyJson(context)) costs nothing while DEBUG
+    is off, unlike an f-string around json.dumps.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, indent=2, default=str)
@@ -0,0 +1,201 @@
+"""HTML extraction for wiki pages and the price list, with a choice of parser backend.
+
+Backends, fastest first: selectolax (lexbor), lxml, and BeautifulSoup's
+built-in html.parser. The HTML_PARSER environment variable picks one; by
+default the fastest installed backend is used, and html.parser is always
+available as the fallback. Every backend returns the same sections and
+tables. Each one also parses only the article body (div.mw-parser-output),
+so the skin, navigation and script blocks around it are never built into a
+tree.
+"""
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Comment, NavigableString, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional, fastest backend
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+PARSER_BACKENDS = ("selectolax", "lxml", "html.parser")
+HEADER_TAGS = ("h2", "h3", "h4")
+# Template CSS and inline scripts are not page text
+NON_TEXT_TAGS = ("style", "script")
+# Opening tag of the article body; everything before it is skin chrome
+CONTENT_START = re.compile(r"""<div\b[^>]*\bclass=["']?[^"'>]*\bmw-parser-output\b""", re.IGNORECASE)
+# SoupStrainer sees the raw class attribute, which holds several classes on MediaWiki pages
+CONTENT_CLASS = re.compile(r"\bmw-parser-output\b")
+
+# (is_header, text) for each direct child of the article body, and each table as rows of cell texts
+Blocks = List[Tuple[bool, str]]
+Tables = List[List[List[str]]]
+
+def join_strings(strings: Iterable[str], separator: str = "") -> str:
+    """Join text nodes the way BeautifulSoup's get_text(separator, strip=True) does."""
+    return separator.join(text for text in (string.strip() for string in strings) if text)
+
+def _content_slice(html: str) -> str:
+    match = CONTENT_START.search(html)
+    return html[match.start():] if match else html
+
+# Never occurs in page text, so lexbor can join the text nodes in C and Python splits them once
+_TEXT_NODE_BREAK = "\x1f"
+
+def _selectolax_text(node, separator: str = "") -> str:
+    return join_strings(node.text(deep=True, separator=_TEXT_NODE_BREAK).split(_TEXT_NODE_BREAK), separator)
+
+def _selectolax_page(html: str) -> Optional[Tuple[Blocks, Tables]]:
+    main = LexborHTMLParser(_content_slice(html)).css_first("div.mw-parser-output")
+    if main is None:
+        return None
+    main.strip_tags(list(NON_TEXT_TAGS))
+
+    blocks = []
+    for node in main.iter(include_text=True):
+        if node.tag == "-text":
+            blocks.append((False, node.text(deep=False).strip()))
+        elif node.tag in HEADER_TAGS:
+            blocks.append((True, _selectolax_text(node)))
+        elif node.tag != "-comment":
+            blocks.append((False, _selectolax_text(node, " ")))
+
+    tables = [[[_selectolax_text(cell, " ") for cell in row.css("th, td")] for row in table.css("tr")]
+              for table in main.css("table")]
+    return blocks, tables
+
+def _selectolax_price_rows(html: str) -> Optional[List[List[str]]]:
+    table = LexborHTMLParser(html).css_first("table")
+    if table is None:
+        return None
+    table.strip_tags(list(NON_TEXT_TAGS))
+    return [[_selectolax_text(cell) for cell in row.css("td")] for row in table.css("tr")[1:]]
+
+def _lxml_page(html: str) -> Optional[Tuple[Blocks, Tables]]:
+    main = next(iter(lxml.html.document_fromstring(_content_slice(html)).find_class("mw-parser-output")), None)
+    if main is None:
+        return None
+    etree.strip_elements(main, etree.Comment, *NON_TEXT_TAGS, with_tail=False)
+
+    blocks = [(False, (main.text or "").strip())]
+    for child in main:
+        if child.tag in HEADER_TAGS:
+            blocks.append((True, join_strings(child.itertext())))
+        else:
+            blocks.append((False, join_strings(child.itertext(), " ")))
+        blocks.append((False, (child.tail or "").strip()))
+
+    tables = [[[join_strings(cell.itertext(), " ") for cell in row.iter("th", "td")] for row in table.iter("tr")]
+              for table in main.iter("table")]
+    return blocks, tables
+
+def _lxml_price_rows(html: str) -> Optional[List[List[str]]]:
+    table = next(lxml.html.document_fromstring(html).iter("table"), None)
+    if table is None:
+        return None
+    etree.strip_elements(table, *NON_TEXT_TAGS, with_tail=False)
+    return [[join_strings(cell.itertext()) for cell in row.iter("td")] for row in list(table.iter("tr"))[1:]]
+
+def _soup_page(html: str) -> Optional[Tuple[Blocks, Tables]]:
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("div", class_=CONTENT_CLASS))
+    main = soup.find("div", class_="mw-parser-output")
+    if not main:
+        return None
+    for tag in main.find_all(NON_TEXT_TAGS):
+        tag.decompose()
+
+    blocks = []
+    for element in main.contents:
+        if isinstance(element, Comment):
+            continue
+        if isinstance(element, NavigableString):
+            blocks.append((False, element.strip()))
+        elif element.name in HEADER_TAGS:
+            blocks.append((True, element.get_text(strip=True)))
+        else:
+            blocks.append((False, element.get_text(separator=" ", strip=True)))
+
+    tables = [[[cell.get_text(separator=" ", strip=True) for cell in row.find_all(["th", "td"])]
+               for row in table.find_all("tr")]
+              for table in main.find_all("table")]
+    return blocks, tables
+
+def _soup_price_rows(html: str) -> Optional[List[List[str]]]:
+    table = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("table")).find("table")
+    if not table:
+        return None
+    for tag in table.find_all(NON_TEXT_TAGS):
+        tag.decompose()
+    return [[cell.get_text(strip=True) for cell in row.find_all("td")] for row in table.find_all("tr")[1:]]
+
+_BACKENDS: Dict[str, Tuple[Callable[[str], Optional[Tuple[Blocks, Tables]]],
+                           Callable[[str], Optional[List[List[str]]]]]] = {
+    "selectolax": (_selectolax_page, _selectolax_price_rows),
+    "lxml": (_lxml_page, _lxml_price_rows),
+    "html.parser": (_soup_page, _soup_price_rows),
+}
+
+def available_backends() -> List[str]:
+    """Installed backends, fastest first."""
+    installed = {"selectolax": LexborHTMLParser is not None, "lxml": lxml is not None, "html.parser": True}
+    return [backend for backend in PARSER_BACKENDS if installed[backend]]
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """Pick the requested backend (or HTML_PARSER), falling back to the fastest installed one."""
+    name = (name or os.environ.get("HTML_PARSER", "auto")).strip().lower()
+    available = available_backends()
+    if name != "auto" and name not in available:
+        logger.warning(f"HTML parser backend '{name}' is not available; using {available[0]}")
+    return name if name in available else available[0]
+
+class PageParser:
+    """Turns wiki pages into sections and tables, and the price list into rows."""
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = resolve_backend(backend)
+        self._parse_content, self._parse_price_rows = _BACKENDS[self.backend]
+        logger.info(f"Parsing HTML with the {self.backend} backend")
+
+    def parse_page(self, html: str) -> Any:
+        """Parse a wiki page into its sections and tables, or an error message."""
+        parsed = self._parse_content(html)
+        if parsed is None:
+            logger.error("Main content div not found")
+            return "No content found"
+        blocks, tables = parsed
+
+        # Content before the first header goes into the "intro" section
+        sections = {"intro": []}
+        current_section = "intro"
+        for is_header, text in blocks:
+            if is_header:
+                current_section = text
+                sections.setdefault(current_section, [])
+                logger.debug(f"New section: {current_section}")
+            elif text:
+                sections[current_section].append(text)
+
+        for section in sections:
+            sections[section] = "\n".join(sections[section])
+            logger.info(f"Section '{section}' captured with {len(sections[section])} characters.")
+
+        tables = [[row for row in table if row] for table in tables]
+        tables = [table for table in tables if table]
+        if tables:
+            logger.info(f"Extracted {len(tables)} tables from the page.")
+
+        return {"sections": sections, "tables": tables}
+
+    def price_rows(self, html: str) -> Optional[List[List[str]]]:
+        """Cell texts of each body row of the page's first table, or None when it has no table."""
+        return self._parse_price_rows(html)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+from cache_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Bump when parsed page content changes shape, so entries written by older crawls are ignored
+STORE_FORMAT = 1
+
+def content_hash(content: Any) -> str:
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+class PageStore:
+    """Versioned local store of parsed wiki pages, filled by the bulk crawler (crawler.py).
+
+    Each page keeps its response validators for conditional re-crawls, a
+    content hash and a revision number that only increases when the content
+    changes, and the crawl run that last checked it. Runs are recorded so
+    that an interrupted crawl resumes where it stopped. When a page is not in
+    the scrape cache, the scraper seeds the cache from here (if the page was
+    checked within max_age_hours), validators included, so the page is served
+    from memory afterwards and revalidated like any other cached page.
+    """
+
+    def __init__(self, db_path: str = "cache/page_store.sqlite", max_age_hours: Optional[float] = None):
+        if max_age_hours is None:
+            max_age_hours = float(os.environ.get("PAGE_STORE_MAX_AGE_HOURS", 168))
+        self.max_age_seconds = max_age_hours * 3600
+        self.pages = SQLiteStore(db_path, table="pages")
+        self.runs = SQLiteStore(db_path, table="crawl_runs")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """The stored entry for url, or None if it is missing or from an older format."""
+        stored = self.pages.get(url)
+        if stored is None or stored[0].get("format") != STORE_FORMAT:
+            return None
+        return stored[0]
+
+    def get_recent(self, url: str) -> Optional[Dict[str, Any]]:
+        """The stored entry for url if it was checked within max_age_hours, else None."""
+        entry = self.get(url)
+        if entry is None or time.time() - entry["checked_at"] > self.max_age_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, url: str, content: Any, etag: Optional[str], last_modified: Optional[str],
+            run_id: int) -> bool:
+        """Store a freshly fetched page; returns True when its content changed."""
+        previous = self.get(url)
+        digest = content_hash(content)
+        changed = previous is None or previous["hash"] != digest
+        revision = 1 if previous is None else previous["revision"] + int(changed)
+        now = time.time()
+        self.pages.set(url, {
+            "format": STORE_FORMAT,
+            "content": content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "hash": digest,
+            "revision": revision,
+            "changed_at": now if changed else previous["changed_at"],
+            "checked_at": now,
+            "run": run_id,
+        })
+        return changed
+
+    def mark_checked(self, url: str, run_id: int) -> None:
+        """Record a 304 Not Modified: the stored content is current as of now."""
+        entry = self.get(url)
+        if entry is not None:
+            self.pages.set(url, dict(entry, checked_at=time.time(), run=run_id))
+
+    def checked_in_run(self, url: str, run_id: int) -> bool:
+        entry = self.get(url)
+        return entry is not None and entry.get("run") == run_id
+
+    def start_run(self, total_urls: int, resume: bool = True) -> Dict[str, Any]:
+        """Resume the latest run if it never finished, otherwise start a new one."""
+        latest = self.latest_run()
+        if resume and latest and latest["finished_at"] is None and latest["format"] == STORE_FORMAT:
+            logger.info(f"Resuming crawl run {latest['id']}")
+            return latest
+        run = {
+            "id": latest["id"] + 1 if latest else 1,
+            "format": STORE_FORMAT,
+            "started_at": time.time(),
+            "finished_at": None,
+            "urls": total_urls,
+        }
+        self.runs.set("latest", run)
+        logger.info(f"Starting crawl run {run['id']} over {total_urls} URLs")
+        return run
+
+    def finish_run(self, run: Dict[str, Any], counts: Dict[str, int]) -> None:
+        finished = dict(run, finished_at=time.time(), **counts)
+        self.runs.set("latest", finished)
+        self.runs.set(f"run-{run['id']}", finished)
+
+    def latest_run(self) -> Optional[Dict[str, Any]]:
+        stored = self.runs.get("latest")
+        return stored[0] if stored else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "latest_run": self.latest_run()}
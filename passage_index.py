@@ -0,0 +1,179 @@
+"""Pick the parts of a scraped wiki page that answer a question.
+
+A parsed page is split into passages: runs of paragraphs within one section,
+and groups of rows of one table (each repeating the table's header row).
+Each page gets a BM25 index over its passages, built once when the page is
+parsed and kept beside it, so a question about weapons sends Gemini the
+hardpoint table and the armament section rather than the whole page. The
+selection is returned in the parsed page's own shape ({"sections": ...,
+"tables": ...}) and in page order, so prompts read the same as before.
+"""
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from cache_store import LRUCache
+from context_builder import estimate_tokens
+from query_resolver import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Target passage length; a single paragraph or row longer than this stays whole
+PASSAGE_CHARS = int(os.environ.get("PASSAGE_CHARS", 600))
+# Scraped tokens a prompt may carry, and at most how many passages; a budget of 0 sends whole pages
+PASSAGE_TOKEN_BUDGET = int(os.environ.get("PASSAGE_TOKEN_BUDGET", 2000))
+PASSAGE_TOP_K = int(os.environ.get("PASSAGE_TOP_K", 16))
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class Passage(NamedTuple):
+    """A run of one section's paragraphs, or a group of one table's rows under its header."""
+    section: Optional[str]
+    table: Optional[int]
+    text: str
+    rows: Tuple[Tuple[str, ...], ...]
+    tokens: int
+
+def _pack(pieces: List[str]) -> List[List[str]]:
+    """Group pieces in order into runs of about PASSAGE_CHARS."""
+    groups: List[List[str]] = []
+    size = 0
+    for piece in pieces:
+        if groups and size + len(piece) <= PASSAGE_CHARS:
+            groups[-1].append(piece)
+            size += len(piece) + 1
+        else:
+            groups.append([piece])
+            size = len(piece)
+    return groups
+
+def split_passages(content: Dict[str, Any]) -> List[Passage]:
+    """Split a parsed page into passages, in page order."""
+    passages = []
+    for section, text in (content.get("sections") or {}).items():
+        paragraphs = [paragraph for paragraph in text.split("\n") if paragraph.strip()]
+        for group in _pack(paragraphs):
+            joined = "\n".join(group)
+            passages.append(Passage(section, None, joined, (), estimate_tokens(joined)))
+
+    for number, table in enumerate(content.get("tables") or []):
+        rows = [tuple(str(cell) for cell in row) for row in table]
+        header, body = rows[0], rows[1:]
+        lines = {row: " | ".join(row) for row in rows}
+        for group in _pack([lines[row] for row in body]) if body else [[]]:
+            group_rows = (header,) + tuple(body[:len(group)])
+            body = body[len(group):]
+            joined = "\n".join(lines[row] for row in group_rows)
+            passages.append(Passage(None, number, joined, group_rows, estimate_tokens(joined)))
+    return passages
+
+class PassageIndex:
+    """BM25 over one page's passages."""
+
+    def __init__(self, passages: List[Passage]):
+        self.passages = passages
+        self.tokens = sum(passage.tokens for passage in passages)
+        # term -> [(passage number, term frequency)]
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        for number, passage in enumerate(passages):
+            # A section's title counts as part of each of its passages
+            terms = tokenize(f"{passage.section or ''} {passage.text}")
+            self._lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self._postings.setdefault(term, []).append((number, count))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every passage for the query."""
+        scores = [0.0] * len(self.passages)
+        count = len(self.passages)
+        for term in set(tokenize(query)) - STOPWORDS:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[number] / self._average_length)
+                scores[number] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def select(self, query: str, token_budget: int = PASSAGE_TOKEN_BUDGET,
+               top_k: int = PASSAGE_TOP_K) -> List[Passage]:
+        """The best passages for the query that fit the budget, in page order.
+
+        The page's first passage, which introduces the ship, is always
+        offered first. A question matching nothing gets the page from the top.
+        """
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.passages)), key=lambda number: (-scores[number], number))
+        if ranked:
+            ranked.remove(0)
+            ranked.insert(0, 0)
+
+        chosen, used = [], 0
+        for number in ranked:
+            if len(chosen) >= top_k:
+                break
+            passage = self.passages[number]
+            if used + passage.tokens <= token_budget:
+                chosen.append(number)
+                used += passage.tokens
+        return [self.passages[number] for number in sorted(chosen)]
+
+def assemble(passages: List[Passage]) -> Dict[str, Any]:
+    """Put selected passages back into the parsed page's shape."""
+    sections: Dict[str, List[str]] = {}
+    tables: Dict[int, List[List[str]]] = {}
+    for passage in passages:
+        if passage.table is None:
+            sections.setdefault(passage.section, []).append(passage.text)
+        else:
+            rows = tables.setdefault(passage.table, [list(passage.rows[0])])
+            rows.extend(list(row) for row in passage.rows[1:])
+    return {"sections": {section: "\n".join(texts) for section, texts in sections.items()},
+            "tables": [tables[number] for number in sorted(tables)]}
+
+class PassageRetriever:
+    """Per-page passage indexes, kept for as long as their page is."""
+
+    def __init__(self, max_pages: int = 256, token_budget: Optional[int] = None, top_k: Optional[int] = None):
+        self.token_budget = PASSAGE_TOKEN_BUDGET if token_budget is None else token_budget
+        self.top_k = top_k or PASSAGE_TOP_K
+        self._indexes = LRUCache(max_entries=max_pages)
+
+    def index(self, url: str, content: Any) -> Optional[PassageIndex]:
+        """The index for a page's content, built unless the same content was indexed already."""
+        if not isinstance(content, dict):
+            return None
+        cached = self._indexes.get(url)
+        # The scrape cache hands back the same object; the page store an equal copy
+        if cached is not None and (cached[0] is content or cached[0] == content):
+            return cached[1]
+        index = PassageIndex(split_passages(content))
+        self._indexes.set(url, (content, index))
+        return index
+
+    def select(self, url: str, content: Any, query: str) -> Any:
+        """The parts of a scraped page relevant to query, or the content unchanged if it is not a parsed page."""
+        if self.token_budget <= 0:
+            return content
+        index = self.index(url, content)
+        if index is None:
+            return content
+        passages = index.select(query, self.token_budget, self.top_k)
+        logger.info(f"Selected {len(passages)} of {len(index.passages)} passages from {url}: "
+                    f"~{sum(passage.tokens for passage in passages)} of ~{index.tokens} tokens")
+        return assemble(passages)
+
+    def stats(self) -> Dict[str, int]:
+        return self._indexes.stats()
@@ -1,19 +1,71 @@
 import json
 import logging
 import os
+import random
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-import requests
-from bs4 import BeautifulSoup
+from typing import Callable, Dict, List, NamedTuple, Optional
+from http_client import HttpClient, get_http_client
+from page_parser import PageParser
+from ship_names import ShipNames
+from single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+PRICE_LIST_URL = "https://starcitizen.tools/Purchasing_ships"
+
+class PriceSnapshot(NamedTuple):
+    """One immutable generation of the price list, swapped in as a whole"""
+    prices: Dict[str, int]
+    # Prices keyed by canonical ship name, and the price list names that match no ship
+    by_ship: Dict[str, int]
+    unmatched: List[str]
+    names: ShipNames
+    last_update: Optional[datetime]
+
+def _snapshot(prices: Dict[str, int], last_update: Optional[datetime],
+              names: Optional[ShipNames] = None) -> PriceSnapshot:
+    """Join the price list's names onto the ships' canonical names, once per price list or ship data load"""
+    names = names or ShipNames(prices)
+    matched, unmatched = names.join(prices)
+    by_ship: Dict[str, int] = {}
+    # The price listed under a ship's exact name wins over one listed under an alias
+    for price_name, ship_name in sorted(matched.items(), key=lambda item: item[0] != item[1]):
+        by_ship.setdefault(ship_name, prices[price_name])
+    return PriceSnapshot(prices, by_ship, unmatched, names, last_update)
+
 class PriceDataManager:
-    def __init__(self, cache_file: str = "cache/price_data.json", cache_duration_hours: int = 24):
+    """Serve ship prices from an in-memory snapshot that is refreshed in the background.
+
+    Reads never wait on the network: they return the current snapshot, even
+    a stale one, and a single refresher thread replaces it once it expires
+    (stale-while-revalidate). Refreshes are scheduled with random jitter,
+    deduplicated, and retried with backoff while the wiki is unreachable.
+    Listeners are told about every new price list so indexes built from the
+    prices can follow.
+    """
+
+    def __init__(self, cache_file: str = "cache/price_data.json", cache_duration_hours: int = 24,
+                 refresh_jitter_seconds: float = 600.0, retry_seconds: float = 300.0,
+                 start_refresher: bool = True, parser: Optional[PageParser] = None,
+                 http: Optional[HttpClient] = None, ship_names: Optional[ShipNames] = None):
         self.cache_file = cache_file
+        self.parser = parser or PageParser()
+        self.http = http or get_http_client()
         self.cache_duration = timedelta(hours=cache_duration_hours)
-        self.price_data = {}
-        self.last_update = None
+        self.refresh_jitter_seconds = refresh_jitter_seconds
+        self.retry_seconds = retry_seconds
+        # Canonical ship names the price list is joined onto
+        self._ship_names = ship_names
+        self._snapshot = _snapshot({}, None)
+        self._refresh_lock = threading.Lock()
+        self._flights = SingleFlight("prices")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._retry_at = 0.0
+        self._refresher: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[str], None]] = []
         
         # Ensure cache directory exists
         os.makedirs(os.path.dirname(cache_file), exist_ok=True)
@@ -21,9 +73,17 @@ class PriceDataManager:
         # Load cached data if available
         self._load_cache()
         
-        # Update cache if needed
-        if self._needs_update():
-            self.update_price_data()
+        # Refresh in the background rather than holding up startup
+        if start_refresher:
+            self.start_refresher()
+
+    @property
+    def price_data(self) -> Dict[str, int]:
+        return self._snapshot.prices
+
+    @property
+    def last_update(self) -> Optional[datetime]:
+        return self._snapshot.last_update
 
     def _load_cache(self) -> None:
         """Load price data from cache file if it exists"""
@@ -31,22 +91,27 @@ class PriceDataManager:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r') as f:
                     data = json.load(f)
-                    self.price_data = data.get('prices', {})
-                    self.last_update = datetime.fromisoformat(data.get('last_update', '2000-01-01'))
+                    self._snapshot = _snapshot(
+                        data.get('prices', {}),
+                        datetime.fromisoformat(data.get('last_update', '2000-01-01')),
+                        self._ship_names
+                    )
                     logger.info("Price data loaded from cache")
         except Exception as e:
             logger.error(f"Error loading price cache: {str(e)}")
-            self.price_data = {}
-            self.last_update = None
+            self._snapshot = _snapshot({}, None)
 
     def _save_cache(self) -> None:
         """Save current price data to cache file"""
         try:
-            with open(self.cache_file, 'w') as f:
+            # Write beside the cache and rename so readers never see a partial file
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump({
                     'prices': self.price_data,
                     'last_update': self.last_update.isoformat()
                 }, f)
+            os.replace(tmp_file, self.cache_file)
             logger.info("Price data saved to cache")
         except Exception as e:
             logger.error(f"Error saving price cache: {str(e)}")
@@ -57,68 +122,139 @@ class PriceDataManager:
             return True
         return datetime.now() - self.last_update > self.cache_duration
 
-    def update_price_data(self) -> None:
-        """Fetch and update price data from starcitizen.tools"""
+    def start_refresher(self) -> None:
+        """Start the background refresher thread, once"""
+        if self._refresher is None or not self._refresher.is_alive():
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="price-refresher", daemon=True)
+            self._refresher.start()
+
+    def stop_refresher(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self) -> None:
+        """Ask the refresher to check the snapshot now, without waiting for it"""
+        self._wake.set()
+
+    def _seconds_until_refresh(self) -> float:
+        if self._needs_update():
+            return max(0.0, self._retry_at - time.time())
+        remaining = self.cache_duration - (datetime.now() - self.last_update)
+        # Jitter spreads refreshes from several workers sharing the same cache file
+        return remaining.total_seconds() + random.uniform(0, self.refresh_jitter_seconds)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            if self._wake.wait(timeout=self._seconds_until_refresh()):
+                self._wake.clear()
+            if self._stop.is_set():
+                return
+            if self._needs_update() and time.time() >= self._retry_at and not self.refresh():
+                self._retry_at = time.time() + self.retry_seconds * (0.5 + random.random())
+
+    def refresh(self) -> bool:
+        """Refresh the snapshot unless a refresh is already running; True if prices were updated"""
+        if not self._refresh_lock.acquire(blocking=False):
+            logger.debug("Price refresh already in progress")
+            return False
+        try:
+            return self.update_price_data()
+        finally:
+            self._refresh_lock.release()
+
+    def update_price_data(self) -> bool:
+        """Fetch and update price data from starcitizen.tools, sharing a fetch already in progress"""
+        return self._flights.do(PRICE_LIST_URL, self._fetch_prices)
+
+    def _fetch_prices(self) -> bool:
         try:
-            url = "https://starcitizen.tools/Purchasing_ships"
-            response = requests.get(url)
+            response = self.http.get(PRICE_LIST_URL)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find the price table
-                price_table = soup.find('table')
-                if not price_table:
-                    logger.error("Price table not found on the page")
-                    return
-
-                # Parse table rows
-                new_prices = {}
-                for row in price_table.find_all('tr')[1:]:  # Skip header row
-                    cols = row.find_all('td')
-                    if len(cols) >= 3:  # Manufacturer, Ship, Base Price columns
-                        ship_name = cols[1].get_text(strip=True)
-                        price_text = cols[2].get_text(strip=True)
-                        try:
-                            # Convert price to integer, removing commas
-                            price = int(price_text.replace(',', ''))
-                            new_prices[ship_name] = price
-                        except (ValueError, TypeError):
-                            logger.warning(f"Could not parse price for {ship_name}: {price_text}")
-
-                if new_prices:
-                    self.price_data = new_prices
-                    self.last_update = datetime.now()
-                    self._save_cache()
-                    logger.info(f"Updated prices for {len(new_prices)} ships")
-                else:
-                    logger.warning("No price data was parsed")
-
-            else:
-                logger.error(f"Failed to fetch price data: {response.status_code}")
+                return self._apply_prices(self._parse_price_table(response.text))
+            logger.error(f"Failed to fetch price data: {response.status_code}")
         except Exception as e:
             logger.error(f"Error updating price data: {str(e)}")
+        return False
+
+    def _parse_price_table(self, html: str) -> Dict[str, int]:
+        """Extract ship name -> base price from the price list page"""
+        rows = self.parser.price_rows(html)
+        if rows is None:
+            logger.error("Price table not found on the page")
+            return {}
+
+        new_prices = {}
+        for cols in rows:
+            if len(cols) >= 3:  # Manufacturer, Ship, Base Price columns
+                ship_name = cols[1]
+                price_text = cols[2]
+                try:
+                    # Convert price to integer, removing commas
+                    price = int(price_text.replace(',', ''))
+                    new_prices[ship_name] = price
+                except (ValueError, TypeError):
+                    logger.warning(f"Could not parse price for {ship_name}: {price_text}")
+        return new_prices
+
+    def _apply_prices(self, new_prices: Dict[str, int]) -> bool:
+        if not new_prices:
+            logger.warning("No price data was parsed")
+            return False
+        # A single reference assignment, so readers see either the old snapshot or the new one
+        self._snapshot = _snapshot(new_prices, datetime.now(), self._ship_names)
+        self._save_cache()
+        logger.info(f"Updated prices for {len(new_prices)} ships")
+        if self._snapshot.unmatched:
+            logger.info(f"{len(self._snapshot.unmatched)} priced ships match no known ship: "
+                        f"{', '.join(self._snapshot.unmatched)}")
+        for listener in self._listeners:
+            try:
+                listener(self.version)
+            except Exception as e:
+                logger.error(f"Error in price refresh listener: {str(e)}")
+        return True
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """Call callback with the new version after every price list applied by a refresh"""
+        self._listeners.append(callback)
+
+    def set_ship_names(self, ship_names: ShipNames) -> None:
+        """Re-join the current price list onto reloaded ship names"""
+        self._ship_names = ship_names
+        snapshot = self._snapshot
+        self._snapshot = _snapshot(snapshot.prices, snapshot.last_update, ship_names)
+
+    @property
+    def version(self) -> str:
+        """Identify the current price snapshot, for invalidating dependent caches"""
+        return self.last_update.isoformat() if self.last_update else "none"
 
     def get_ship_price(self, ship_name: str) -> Optional[int]:
         """Get the base price for a specific ship"""
-        # Check if cache needs update
+        snapshot = self._snapshot
         if self._needs_update():
-            self.update_price_data()
-            
-        # Try to find the exact match first
-        if ship_name in self.price_data:
-            return self.price_data[ship_name]
-            
-        # Try case-insensitive match
-        ship_name_lower = ship_name.lower()
-        for name, price in self.price_data.items():
-            if name.lower() == ship_name_lower:
-                return price
-                
-        return None
+            self.request_refresh()
+        # Try the price list's own spelling first, then the ship it was joined onto
+        price = snapshot.prices.get(ship_name)
+        if price is None:
+            canonical = snapshot.names.canonical(ship_name)
+            price = snapshot.by_ship.get(canonical) if canonical else None
+        return price
 
     def get_all_prices(self) -> Dict[str, int]:
         """Get all cached ship prices"""
-        # Check if cache needs update
         if self._needs_update():
-            self.update_price_data()
-        return self.price_data.copy() 
\ No newline at end of file
+            self.request_refresh()
+        return self._snapshot.prices.copy()
+
+    def get_prices_by_ship(self) -> Dict[str, int]:
+        """Get all cached prices keyed by canonical ship name"""
+        if self._needs_update():
+            self.request_refresh()
+        return self._snapshot.by_ship.copy()
+
+    @property
+    def unmatched_names(self) -> List[str]:
+        """Names in the price list that match no known ship"""
+        return self._snapshot.unmatched
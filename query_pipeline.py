@@ -0,0 +1,570 @@
+import asyncio
+import logging
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple
+from admission import ROUTING
+from context_builder import ContextBuilder, estimate_tokens
+from gemini_client import aquery_ship_data, query_ship_data
+from metrics import CACHE_LOOKUPS, PROMPT_SIZE, PROMPT_TOKENS, LazyJson, stage
+from price_data_manager import PriceDataManager
+from query_resolver import QueryResolver, Resolution, is_price_question, tokenize
+from response_cache import ResponseCache
+from scraper import WebScraper
+from ship_data import ShipDataManager
+from ship_record import Ship
+from ship_search import ShipSearchEngine
+
+logger = logging.getLogger(__name__)
+
+# Most matching ships considered for a general question; the token budget usually cuts this further
+GENERAL_QUERY_MAX_SHIPS = 100
+
+GENERAL_SOURCES = [
+    "https://starcitizen.tools/Purchasing_ships",
+    "https://starcitizen.tools/Ships"
+]
+
+class QueryError(Exception):
+    """A query that cannot be answered, carrying the HTTP status to report."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class QueryPipeline:
+    """Turn a question into the final Gemini prompt plus the sources it draws on.
+
+    build_plan() runs on a worker thread; abuild_plan() runs on an event loop.
+    Both start scraping a locally matched ship's page before Gemini routes
+    the question, so the scrape overlaps the routing calls and the price
+    lookup instead of following them. The batch variants do the same for
+    many questions, sharing one routing call and one scrape per page. Every CPU-only step (resolution,
+    filtering, context and prompt building) is shared. A plan either carries
+    a prompt to send to Gemini or, when "cached" is set, a previously
+    generated response.
+    """
+
+    def __init__(self, ship_manager: ShipDataManager, web_scraper: WebScraper, price_manager: PriceDataManager,
+                 query_resolver: QueryResolver, ship_search: ShipSearchEngine, context_builder: ContextBuilder,
+                 response_cache: ResponseCache):
+        self.ship_manager = ship_manager
+        self.web_scraper = web_scraper
+        self.price_manager = price_manager
+        self.query_resolver = query_resolver
+        self.ship_search = ship_search
+        self.context_builder = context_builder
+        self.response_cache = response_cache
+        # Strong references to prefetches nobody awaited, so they can finish warming the cache
+        self._background: Set[asyncio.Task] = set()
+
+    def data_version(self) -> str:
+        """Version of every dataset an answer can depend on."""
+        return f"{self.ship_manager.data_version}|{self.price_manager.version}"
+
+    def ship_data_version(self, ship_name: str) -> str:
+        """Version of the data an answer about one ship depends on.
+
+        Only the records that go into its context count, so reloading ship data
+        leaves answers about unchanged ships cached.
+        """
+        ships = self.ship_manager.find_relevant_ships(ship_name)
+        return f"{self.ship_manager.records_version(ships)}|{self.price_manager.version}"
+
+    def remember(self, plan: Dict[str, Any], response_text: str) -> None:
+        """Cache a freshly generated answer; only pass answers whose generation finished without an error."""
+        if response_text:
+            self.response_cache.put(plan["cache_key"], response_text, plan["sources"])
+
+    def build_plan(self, query: str) -> Dict[str, Any]:
+        """Route a query and build its plan, blocking on Gemini and the wiki."""
+        resolution = self._resolve(query)
+
+        # When the ship is already known, scrape its page while Gemini routes the question
+        pages: Dict[str, Future] = {}
+        prefetch_url = self._prefetch_url(resolution)
+        if prefetch_url:
+            self._prefetch(pages, prefetch_url)
+
+        query_type, ship_name = self._route(query, resolution)
+        return self._finish_plan(query, query_type, ship_name, pages)
+
+    async def abuild_plan(self, query: str) -> Dict[str, Any]:
+        """Route a query and build its plan without blocking the event loop."""
+        resolution = self._resolve(query)
+
+        # When the ship is already known, fetch its page while Gemini classifies the question
+        pages: Dict[str, asyncio.Task] = {}
+        prefetch_url = self._prefetch_url(resolution)
+        if prefetch_url:
+            self._aprefetch(pages, prefetch_url)
+
+        query_type, ship_name = await self._aroute(query, resolution)
+        return await self._afinish_plan(query, query_type, ship_name, pages)
+
+    def build_batch_plans(self, queries: List[str]) -> List[Any]:
+        """Plans for many queries at once; each item is a plan or the QueryError it raised.
+
+        Questions the resolver is unsure of are routed together in one Gemini
+        call instead of one or two calls each, and a ship page wanted by
+        several questions is scraped once.
+        """
+        resolutions = [self._resolve(query) for query in queries]
+        pages: Dict[str, Future] = {}
+        for resolution in resolutions:
+            prefetch_url = self._prefetch_url(resolution)
+            if prefetch_url:
+                self._prefetch(pages, prefetch_url)
+
+        routes = {}
+        prompt = self._batch_route_prompt(queries, resolutions)
+        if prompt:
+            with stage("batch_routing"):
+                answer = query_ship_data(prompt, max_output_tokens=20 * len(queries), priority=ROUTING)
+                routes = self._parse_batch_routes(answer)
+
+        routed = [self._route(query, resolution, routes.get(index))
+                  for index, (query, resolution) in enumerate(zip(queries, resolutions))]
+        # Start every page the batch needs before waiting on any of them
+        for query_type, ship_name in routed:
+            if query_type != "GENERAL" and ship_name in self.ship_manager.ships:
+                ship_url = self.ship_manager.get_specific_ship_url(ship_name)
+                if ship_url:
+                    self._prefetch(pages, ship_url)
+
+        plans = []
+        for query, (query_type, ship_name) in zip(queries, routed):
+            try:
+                plans.append(self._finish_plan(query, query_type, ship_name, pages))
+            except QueryError as e:
+                plans.append(e)
+        return plans
+
+    async def abuild_batch_plans(self, queries: List[str]) -> List[Any]:
+        """Async counterpart of build_batch_plans(); the plans are finished concurrently."""
+        resolutions = [self._resolve(query) for query in queries]
+        pages: Dict[str, asyncio.Task] = {}
+        for resolution in resolutions:
+            prefetch_url = self._prefetch_url(resolution)
+            if prefetch_url:
+                self._aprefetch(pages, prefetch_url)
+
+        routes = {}
+        prompt = self._batch_route_prompt(queries, resolutions)
+        if prompt:
+            with stage("batch_routing"):
+                answer = await aquery_ship_data(prompt, max_output_tokens=20 * len(queries), priority=ROUTING)
+            routes = self._parse_batch_routes(answer)
+
+        async def plan(index: int, query: str, resolution: Resolution) -> Any:
+            try:
+                query_type, ship_name = await self._aroute(query, resolution, routes.get(index))
+                return await self._afinish_plan(query, query_type, ship_name, pages)
+            except QueryError as e:
+                return e
+
+        return list(await asyncio.gather(*(plan(index, query, resolution)
+                                           for index, (query, resolution) in enumerate(zip(queries, resolutions)))))
+
+    def _route(self, query: str, resolution: Resolution,
+               routed: Optional[Tuple[str, str]] = None) -> Tuple[str, Optional[str]]:
+        """The query type and, for SPECIFIC queries, the ship: from the resolver, a batch answer, or Gemini."""
+        # First, determine if this is a general question or about a specific ship
+        with stage("intent"):
+            if self.query_resolver.is_confident(resolution.intent_confidence):
+                query_type = resolution.intent
+            elif routed:
+                query_type = routed[0]
+            else:
+                query_type = query_ship_data(self._intent_prompt(query), max_output_tokens=10, priority=ROUTING).strip()
+        if query_type == "GENERAL":
+            return query_type, None
+
+        # Get the specific ship name for SPECIFIC queries
+        with stage("ship_identification"):
+            if self.query_resolver.is_confident(resolution.ship_confidence):
+                ship_name = resolution.ship_name
+            elif routed:
+                ship_name = routed[1]
+            else:
+                ship_name = query_ship_data(self._ship_prompt(query), max_output_tokens=50, priority=ROUTING).strip()
+        # Gemini may answer with another source's spelling, e.g. "Pirate Gladius"
+        return query_type, self.ship_manager.canonical_name(ship_name) or ship_name
+
+    async def _aroute(self, query: str, resolution: Resolution,
+                      routed: Optional[Tuple[str, str]] = None) -> Tuple[str, Optional[str]]:
+        with stage("intent"):
+            if self.query_resolver.is_confident(resolution.intent_confidence):
+                query_type = resolution.intent
+            elif routed:
+                query_type = routed[0]
+            else:
+                query_type = (await aquery_ship_data(self._intent_prompt(query), max_output_tokens=10,
+                                                     priority=ROUTING)).strip()
+        if query_type == "GENERAL":
+            return query_type, None
+
+        with stage("ship_identification"):
+            if self.query_resolver.is_confident(resolution.ship_confidence):
+                ship_name = resolution.ship_name
+            elif routed:
+                ship_name = routed[1]
+            else:
+                ship_name = (await aquery_ship_data(self._ship_prompt(query), max_output_tokens=50,
+                                                    priority=ROUTING)).strip()
+        return query_type, self.ship_manager.canonical_name(ship_name) or ship_name
+
+    def _finish_plan(self, query: str, query_type: str, ship_name: Optional[str],
+                     pages: Dict[str, Future]) -> Dict[str, Any]:
+        """Build the plan for a routed query, scraping its ship's page unless it is already in pages."""
+        if query_type == "GENERAL":
+            with stage("prompt_build"):
+                return self._general_plan(query)
+
+        cache_key, cached_plan = self._specific_cache(query, ship_name)
+        if cached_plan:
+            return cached_plan
+
+        ship_url = self.ship_manager.get_specific_ship_url(ship_name)
+        if ship_url:
+            self._prefetch(pages, ship_url)
+
+        if is_price_question(query) and ship_url:
+            with stage("price_lookup"):
+                base_price = self.price_manager.get_ship_price(ship_name)
+            with stage("scrape"):
+                scraped_results = [pages[ship_url].result()]
+            with stage("prompt_build"):
+                return self._price_plan(query, ship_name, ship_url, base_price, scraped_results, cache_key)
+
+        ship_info = self._ship_info(ship_name)
+        with stage("scrape"):
+            scraped_results = [pages[ship_url].result()] if ship_url else []
+        with stage("prompt_build"):
+            return self._ship_plan(query, ship_name, ship_info, ship_url, scraped_results, cache_key)
+
+    async def _afinish_plan(self, query: str, query_type: str, ship_name: Optional[str],
+                            pages: Dict[str, asyncio.Task]) -> Dict[str, Any]:
+        if query_type == "GENERAL":
+            with stage("prompt_build"):
+                return self._general_plan(query)
+
+        cache_key, cached_plan = self._specific_cache(query, ship_name)
+        if cached_plan:
+            return cached_plan
+
+        ship_url = self.ship_manager.get_specific_ship_url(ship_name)
+        if ship_url:
+            self._aprefetch(pages, ship_url)
+
+        if is_price_question(query) and ship_url:
+            with stage("price_lookup"):
+                base_price = self.price_manager.get_ship_price(ship_name)
+            with stage("scrape"):
+                scraped_results = [await pages[ship_url]]
+            with stage("prompt_build"):
+                return self._price_plan(query, ship_name, ship_url, base_price, scraped_results, cache_key)
+
+        ship_info = self._ship_info(ship_name)
+        with stage("scrape"):
+            scraped_results = [await pages[ship_url]] if ship_url else []
+        with stage("prompt_build"):
+            return self._ship_plan(query, ship_name, ship_info, ship_url, scraped_results, cache_key)
+
+    def _prefetch(self, pages: Dict[str, Future], url: str) -> None:
+        """Start scraping url on the scraper's pool unless this request already has."""
+        if url not in pages:
+            logger.info(f"Scraping data for ship URL: {url}")
+            pages[url] = self.web_scraper.prefetch(url)
+
+    def _aprefetch(self, pages: Dict[str, asyncio.Task], url: str) -> None:
+        if url not in pages:
+            logger.info(f"Scraping data for ship URL: {url}")
+            pages[url] = self._spawn(self.web_scraper.ascrape_url(url))
+
+    def _prefetch_url(self, resolution: Resolution) -> Optional[str]:
+        """URL worth scraping before routing finishes: a confidently matched ship, unless the question is general."""
+        if not self.query_resolver.is_confident(resolution.ship_confidence):
+            return None
+        if self.query_resolver.is_confident(resolution.intent_confidence) and resolution.intent == "GENERAL":
+            return None
+        return self.ship_manager.get_specific_ship_url(resolution.ship_name)
+
+    def _spawn(self, coroutine: Awaitable[Dict[str, Any]]) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def _resolve(self, query: str) -> Resolution:
+        # Resolve the intent and ship locally; Gemini is only asked when the resolver is unsure
+        with stage("resolve"):
+            resolution = self.query_resolver.resolve(query)
+        logger.info(f"Local resolution for query: {resolution}")
+        return resolution
+
+    @staticmethod
+    def _intent_prompt(query: str) -> str:
+        return f"""Given this query about Star Citizen ships: "{query}"
+        Determine if this is a general question about ships or about a specific ship.
+        Return ONLY one of these exact words:
+        - "GENERAL" for general questions about ships, comparisons, or recommendations
+        - "SPECIFIC" for questions about a specific ship
+
+        Type:"""
+
+    def _ship_prompt(self, query: str) -> str:
+        return f"""Given this query about Star Citizen ships: "{query}"
+        And this list of available ships: {self.ship_manager.get_all_ships()}
+
+        What specific ship is being asked about? Return ONLY the exact ship name from the list.
+        If multiple ships are mentioned, return the main one being asked about.
+        If no specific ship is mentioned or the ship isn't in the list, return "NONE".
+
+        Ship name:"""
+
+    def _batch_route_prompt(self, queries: List[str], resolutions: List[Resolution]) -> Optional[str]:
+        """One routing prompt for every query the resolver is unsure of, or None when it is sure of all."""
+        unsure = [
+            f'{index + 1}. "{query}"' for index, (query, resolution) in enumerate(zip(queries, resolutions))
+            if not (self.query_resolver.is_confident(resolution.intent_confidence)
+                    and (resolution.intent == "GENERAL"
+                         or self.query_resolver.is_confident(resolution.ship_confidence)))
+        ]
+        if not unsure:
+            return None
+        logger.info(f"Routing {len(unsure)} of {len(queries)} batched queries with Gemini")
+        questions = "\n".join(unsure)
+        return f"""Given these numbered queries about Star Citizen ships:
+        {questions}
+        And this list of available ships: {self.ship_manager.get_all_ships()}
+
+        For each query, determine if it is a general question about ships (comparisons or
+        recommendations) or about a specific ship, and which ship from the list it is about.
+        Answer with one line per query and nothing else, in this exact format:
+        <number>|<GENERAL or SPECIFIC>|<exact ship name from the list, or NONE>
+
+        Answers:"""
+
+    @staticmethod
+    def _parse_batch_routes(answer: str) -> Dict[int, Tuple[str, str]]:
+        """Map query index to (query type, ship name) from a batch routing answer, skipping malformed lines."""
+        routes = {}
+        for line in answer.splitlines():
+            parts = [part.strip().strip('"') for part in line.split("|")]
+            if len(parts) == 3 and parts[0].isdigit() and parts[1] in ("GENERAL", "SPECIFIC"):
+                routes[int(parts[0]) - 1] = (parts[1], parts[2] or "NONE")
+        return routes
+
+    @staticmethod
+    def _plan(prompt: str, sources: List[str], cache_key: str, query_type: str) -> Dict[str, Any]:
+        """Bundle a finished prompt with its sources and report its size."""
+        prompt_tokens = estimate_tokens(prompt)
+        logger.info(f"Prompt built with ~{prompt_tokens} tokens")
+        PROMPT_TOKENS.inc(prompt_tokens, query_type=query_type)
+        PROMPT_SIZE.observe(prompt_tokens, query_type=query_type)
+        return {"prompt": prompt, "sources": sources, "prompt_tokens": prompt_tokens, "cache_key": cache_key}
+
+    def _cached_plan(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a plan carrying a previously generated answer, if one is cached."""
+        cached = self.response_cache.get(cache_key)
+        CACHE_LOOKUPS.inc(cache="response", result="miss" if cached is None else "hit")
+        if cached is None:
+            return None
+        logger.info("Serving answer from the response cache")
+        return {"response": cached["response"], "sources": cached["sources"], "cache_key": cache_key, "cached": True}
+
+    def _specific_cache(self, query: str, ship_name: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Validate the identified ship and look up a cached answer about it."""
+        if ship_name == "NONE" or ship_name not in self.ship_manager.ships:
+            raise QueryError(
+                "Could not identify which ship you're asking about. Please include the full ship name in your query.",
+                400
+            )
+        cache_key = ResponseCache.make_key(ship_name, "SPECIFIC", query, self.ship_data_version(ship_name),
+                                           tokenize(ship_name))
+        return cache_key, self._cached_plan(cache_key)
+
+    def _ship_info(self, ship_name: str) -> Ship:
+        ship_data = self.ship_manager.find_relevant_ships(ship_name)
+        if not ship_data:
+            raise QueryError(f"No data found for {ship_name}", 404)
+
+        # Get the specific ship's info
+        ship_info = ship_data.get(ship_name)
+        if not ship_info:
+            raise QueryError(f"Could not find data for {ship_name}", 404)
+        return ship_info
+
+    def _general_plan(self, query: str) -> Dict[str, Any]:
+        # Filter and sort locally so Gemini only sees the ships that answer the question
+        criteria = ShipSearchEngine.filters_from_query(query)
+        cache_key = ResponseCache.make_key(criteria, "GENERAL", query, self.data_version())
+        cached_plan = self._cached_plan(cache_key)
+        if cached_plan:
+            return cached_plan
+        results = self.ship_search.search(criteria["filters"], sort=criteria["sort"], limit=GENERAL_QUERY_MAX_SHIPS)
+        if not criteria["filters"] or not results["ships"]:
+            # Nothing structured to filter on - fall back to ships named or described in the query
+            relevant_ships = self.ship_manager.find_relevant_ships(query)
+            results = self.ship_search.search(
+                sort=criteria["sort"],
+                names=relevant_ships or None,
+                limit=GENERAL_QUERY_MAX_SHIPS
+            )
+
+        # Keep only the fields the question needs and serialize within the token budget
+        table = self.context_builder.build_ship_table(query, results["ships"], criteria["filters"], criteria["sort"])
+
+        prompt = f"""Based on this Star Citizen ship data ({table['rows']} of {results['total']} matching ships):
+        {table['text']}
+
+        Please provide a detailed answer to this general question about ships: {query}
+
+        Always start your message with "I am so happy to be answering this for you!!!!"
+
+        The data above is a table of the ships that match the filters derived from the question:
+        - Rows are already filtered and sorted for the question
+        - price is the in-game price in aUEC and pledge_price the store price in USD
+        - cargo is in SCU, scm_speed in m/s, fuel capacities in litres; "-" means unknown
+
+        For this query about ships:
+        1. Use the listed ships, which already match the query criteria (price, cargo capacity, etc.)
+        2. Keep the given order unless the question asks for a different ranking
+        3. Provide specific examples with actual prices and specifications
+        4. Sort recommendations by value/relevance
+
+        When discussing prices:
+        - For ships under 1M aUEC, show as "**XXX,XXX** aUEC"
+        - For ships over 1M aUEC, show as "**X.XX** million aUEC"
+        - Always include the cargo capacity if available
+        - Always mention the role/purpose of each ship
+
+        Format your response using proper markdown:
+        - Use ## for section headings (in title case)
+        - Use bullet points for lists
+        - Use **bold** for numbers and key stats
+        - Use *italics* for missing information or additional context
+        - Format cargo capacity as "**X** SCU"
+
+        Structure your response with these sections:
+        ## Overview
+        Brief summary of available options
+
+        ## Top Recommendations
+        List of best options with full details
+
+        ## Additional Options
+        Other choices worth considering
+
+        ## Summary
+        Quick recap of best value options"""
+
+        # Include both data sources
+        return self._plan(prompt, list(GENERAL_SOURCES), cache_key, "GENERAL")
+
+    def _price_plan(self, query: str, ship_name: str, ship_url: str, base_price: Optional[int],
+                    scraped_data: List[Dict[str, Any]], cache_key: str) -> Dict[str, Any]:
+        # Get the base ship data for context
+        ship_data = {name: ship.to_dict() for name, ship in self.ship_manager.find_relevant_ships(ship_name).items()}
+        scraped_data = [dict(result, content=self._relevant_content(query, result)) for result in scraped_data]
+
+        # Prepare context with both structured and scraped data
+        context = {
+            "query": query,
+            "ship_data": ship_data,
+            "scraped_data": scraped_data,
+            "base_price": base_price
+        }
+
+        # Generate response focusing on price and location
+        prompt = f"""Based on this Star Citizen ship data and scraped information: {self.context_builder.to_json(context)['text']}
+            Please provide a detailed answer about the in-game price and purchase location for the {ship_name}.
+            The base_price field contains the standard in-game price from the official price list.
+
+            Format your response in markdown with the following sections:
+
+            ## 1. Pledge Store Price
+            Include the standalone pledge price if available. Format prices in bold.
+
+            ## 2. In-Game Price
+            Include both the base price and any variant prices if available. Format prices in bold.
+            If the base price differs from other sources, mention both and explain the difference.
+
+            ## 3. Purchase Locations
+            List available purchase locations if known. Use bullet points for multiple locations.
+
+            ## Additional Context
+            Include any relevant context about the ship that helps explain its pricing or availability.
+
+            For any information that is not available in the data, clearly state that it is not available in *italics*.
+            Use proper markdown formatting for emphasis, lists, and sections."""
+
+        # Add the price list source if we used base price data
+        sources = [ship_url]
+        if base_price is not None:
+            sources.append("https://starcitizen.tools/Purchasing_ships")
+
+        return self._plan(prompt, sources, cache_key, "PRICE")
+
+    def _relevant_content(self, query: str, result: Dict[str, Any]) -> Any:
+        """The sections and table rows of a scraped page that bear on the question."""
+        return self.web_scraper.passages.select(result.get("url", ""), result.get("content"), query)
+
+    def _ship_plan(self, query: str, ship_name: str, ship_info: Ship, ship_url: Optional[str],
+                   scraped_results: List[Dict[str, Any]], cache_key: str) -> Dict[str, Any]:
+        scraped_data = {}
+        if scraped_results:
+            logger.debug("Scraped results: %s", LazyJson(scraped_results))
+            if scraped_results[0].get('content'):
+                scraped_data = self._relevant_content(query, scraped_results[0])
+                logger.debug("Extracted content: %s", LazyJson(scraped_data))
+
+        context = {
+            "query": query,
+            "ship_data": {ship_name: ship_info.to_dict()},  # Base ship data
+            "scraped_data": scraped_data,  # Additional scraped information
+            "ship_url": ship_url
+        }
+
+        logger.debug("Full context being sent to LLM: %s", LazyJson(context))
+
+        prompt = f"""Based on this Star Citizen ship data: {self.context_builder.to_json(context)['text']}
+            Please provide a detailed answer to: {query}
+
+            Important notes:
+            1. Use both the base ship data and the scraped web data to provide the most complete answer
+            2. The scraped_data contains several important sections:
+               - 'description': General ship description
+               - 'features': Detailed features including weapons information
+               - 'specifications': Detailed specifications including weapon hardpoints
+               - 'weapons': Specific weapon information including sizes and configurations
+            3. If information is found in the scraped data but not in the base data, use the scraped data
+            4. For weapon-related queries, check both the 'weapons' section and 'specifications' section
+            5. Provide specific details and numbers when available
+
+            When discussing weapons:
+            - Include both fixed and gimbaled weapon options
+            - Specify the size and number of hardpoints
+            - Mention default weapon loadout if available
+            - Include weapon mounting locations (e.g., nose, wings)
+
+            Format your response using proper markdown:
+            - Use ## for section headings (in title case)
+            - Use bullet points for lists
+            - Use **bold** for emphasis on important information and numbers
+            - Use *italics* for supplementary information
+            - Format all measurements consistently (e.g., "**Size 2**" for weapon sizes)
+            - Use proper spacing between sections
+
+            Important formatting rules:
+            1. Keep all text in the same color (don't use special formatting for units)
+            2. Use consistent formatting for all measurements
+            3. Don't use any custom HTML or color codes
+            4. Keep all text either in the default color or specifically bold/italic as specified above"""
+
+        # Include the ship's URL in sources
+        sources = []
+        if ship_url:
+            sources.append(ship_url)
+
+        return self._plan(prompt, sources, cache_key, "SPECIFIC")
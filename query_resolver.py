@@ -0,0 +1,230 @@
+import logging
+import math
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from difflib import get_close_matches
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Words that carry no information about which ship is meant
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "can", "cost", "costs", "do", "does",
+    "for", "from", "get", "good", "has", "have", "how", "in", "info", "is", "it", "its",
+    "me", "much", "my", "of", "on", "or", "price", "ship", "should", "tell", "than", "that",
+    "the", "there", "this", "to", "what", "whats", "where", "which", "who", "why", "with", "you",
+}
+
+# Community nicknames expanded to the tokens used in the wiki ship names
+TOKEN_ALIASES = {
+    "cat": ["caterpillar"],
+    "connie": ["constellation"],
+    "conny": ["constellation"],
+    "herc": ["hercules"],
+    "merc": ["mercury"],
+    "msr": ["mercury"],
+}
+
+# Multi-word name parts also indexed under their community abbreviation, so the
+# abbreviation matches without expanding into "best", which is a GENERAL cue
+NAME_ABBREVIATIONS = {
+    "best in show": "bis",
+}
+
+# Phrasing that signals a comparison, ranking or recommendation across many ships
+GENERAL_PATTERNS = [
+    re.compile(r"\b(best|cheapest|priciest|fastest|slowest|largest|biggest|smallest|strongest)\b"),
+    re.compile(r"\b(most|least|top)\b"),
+    re.compile(r"\b(compare|comparison|versus|vs)\b"),
+    re.compile(r"\brecommend\w*\b"),
+    re.compile(r"\b(ships|fighters|haulers|miners|starters|options|alternatives)\b"),
+    re.compile(r"\b(under|over|below|above|between|at least|at most)\s+[\d$]"),
+    re.compile(r"\b(list|rank|ranking)\b"),
+    re.compile(r"\b(what|which) ship\b"),
+]
+
+# Questions about what a ship costs or where to buy it
+PRICE_PATTERN = re.compile(
+    r"\b(cost|costs|price|prices|priced|buy|purchase|auec)\b"
+    r"|\bhow much\b(?! (cargo|scu|fuel|hydrogen|quantum|crew|space|room|damage|shield|armor))"
+)
+
+@dataclass
+class Resolution:
+    """Outcome of resolving a query locally, with confidences in [0, 1]."""
+    intent: str
+    intent_confidence: float
+    ship_name: Optional[str] = None
+    ship_confidence: float = 0.0
+    mentioned_ships: Tuple[str, ...] = ()
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and collapse everything but letters and digits to spaces."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.lower().replace("'", "").replace("’", "")
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized tokens."""
+    return normalize_text(text).split()
+
+def is_price_question(query: str) -> bool:
+    """Whether a query asks about price or purchase."""
+    return bool(PRICE_PATTERN.search(normalize_text(query)))
+
+class QueryResolver:
+    """Classify query intent and resolve ship names without calling the LLM.
+
+    Ship names are matched through a token index weighted by inverse document
+    frequency, so distinctive tokens ("carrack") count for more than variant
+    suffixes ("mk", "edition"). Misspelled tokens are matched fuzzily against
+    the index vocabulary. Callers should fall back to the LLM whenever the
+    reported confidence is below ``confidence_threshold``.
+    """
+
+    def __init__(self, ship_names: List[str], confidence_threshold: float = 0.75, fuzzy_cutoff: float = 0.8):
+        self.confidence_threshold = confidence_threshold
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._name_tokens: Dict[str, Tuple[str, ...]] = {}
+        self._token_index: Dict[str, Set[str]] = {}
+        # The index is built by the first query rather than at startup
+        self._ship_names: Optional[List[str]] = list(ship_names)
+        self._index_lock = threading.Lock()
+
+    def _ensure_index(self) -> None:
+        if self._ship_names is not None:
+            with self._index_lock:
+                if self._ship_names is not None:
+                    self._build_index(self._ship_names)
+                    self._ship_names = None
+
+    def _build_index(self, ship_names: List[str]) -> None:
+        """Index every ship by the tokens of its name."""
+        for ship_name in ship_names:
+            tokens = tokenize(ship_name)
+            normalized = " ".join(tokens)
+            tokens += [abbreviation for phrase, abbreviation in NAME_ABBREVIATIONS.items()
+                       if f" {phrase} " in f" {normalized} "]
+            tokens = tuple(dict.fromkeys(tokens))
+            if not tokens:
+                continue
+            self._name_tokens[ship_name] = tokens
+            for token in tokens:
+                self._token_index.setdefault(token, set()).add(ship_name)
+
+        total = max(len(self._name_tokens), 1)
+        self._idf = {
+            token: math.log(1 + total / len(ships))
+            for token, ships in self._token_index.items()
+        }
+        # Fuzzy candidates share the first letter, which keeps difflib off most of the vocabulary
+        self._vocabulary_by_initial: Dict[str, List[str]] = {}
+        for token in sorted(self._token_index):
+            self._vocabulary_by_initial.setdefault(token[0], []).append(token)
+        logger.info(f"Query resolver indexed {len(self._name_tokens)} ships and {len(self._token_index)} tokens")
+
+    def _query_tokens(self, query: str) -> Dict[str, float]:
+        """Map query tokens onto index tokens, with a weight for how exact the match was."""
+        matched: Dict[str, float] = {}
+        for token in tokenize(query):
+            if token in STOPWORDS:
+                continue
+            for expanded in TOKEN_ALIASES.get(token, [token]):
+                if expanded in self._token_index:
+                    matched[expanded] = 1.0
+                elif len(expanded) >= 4:
+                    vocabulary = self._vocabulary_by_initial.get(expanded[0], [])
+                    close = get_close_matches(expanded, vocabulary, n=1, cutoff=self.fuzzy_cutoff)
+                    if close and close[0] not in matched:
+                        matched[close[0]] = 0.85
+        return matched
+
+    def _score_ships(self, matched: Dict[str, float]) -> List[Tuple[float, int, str]]:
+        """Score each candidate by the weighted share of its name covered by the query."""
+        candidates: Set[str] = set()
+        for token in matched:
+            candidates.update(self._token_index[token])
+
+        scored = []
+        for ship_name in candidates:
+            name_tokens = self._name_tokens[ship_name]
+            total = sum(self._idf[t] for t in name_tokens)
+            covered = sum(self._idf[t] * matched[t] for t in name_tokens if t in matched)
+            hits = sum(1 for t in name_tokens if t in matched)
+            scored.append((covered / total if total else 0.0, hits, ship_name))
+
+        # Highest coverage first, then the more specific match, then the shorter name
+        scored.sort(key=lambda s: (-s[0], -s[1], len(self._name_tokens[s[2]]), s[2]))
+        return scored
+
+    def resolve_ship(self, query: str) -> Tuple[Optional[str], float, Tuple[str, ...]]:
+        """Return the best ship match, its confidence and every ship clearly mentioned."""
+        self._ensure_index()
+        matched = self._query_tokens(query)
+        if not matched:
+            return None, 0.0, ()
+
+        scored = self._score_ships(matched)
+        if not scored:
+            return None, 0.0, ()
+
+        best_score, best_hits, best_name = scored[0]
+        confidence = best_score
+        if len(scored) > 1:
+            runner_score, runner_hits, _ = scored[1]
+            if runner_score == best_score and runner_hits == best_hits:
+                # Several equally good matches ("cutlass") - let the LLM disambiguate
+                confidence *= 0.5
+
+        # Other ships fully named in the query on tokens the best match does not use
+        best_tokens = set(self._name_tokens[best_name])
+        mentioned = [best_name] if confidence >= self.confidence_threshold else []
+        used = set(best_tokens)
+        for score, _, ship_name in scored[1:]:
+            if score < self.confidence_threshold:
+                break
+            tokens = set(self._name_tokens[ship_name])
+            if tokens & used:
+                continue
+            mentioned.append(ship_name)
+            used |= tokens
+
+        return best_name, round(confidence, 3), tuple(mentioned)
+
+    def classify_intent(self, query: str, mentioned_ships: Tuple[str, ...], ship_confidence: float) -> Tuple[str, float]:
+        """Classify a query as GENERAL or SPECIFIC using keyword rules."""
+        text = " ".join(tokenize(query))
+        general_cues = sum(1 for pattern in GENERAL_PATTERNS if pattern.search(text))
+
+        if len(mentioned_ships) > 1:
+            return "GENERAL", 0.9
+        if mentioned_ships:
+            if general_cues:
+                # e.g. "is the Cutlass Black the best starter ship" - genuinely ambiguous
+                return "SPECIFIC", 0.6
+            return "SPECIFIC", 0.95
+        if general_cues:
+            return "GENERAL", min(0.7 + 0.1 * general_cues, 0.95)
+        if ship_confidence > 0:
+            # Some ship tokens matched but not decisively ("how much is the cutlass")
+            return "SPECIFIC", 0.8
+        return "GENERAL", 0.5
+
+    def resolve(self, query: str) -> Resolution:
+        """Resolve both the intent and the ship a query is about."""
+        ship_name, ship_confidence, mentioned = self.resolve_ship(query)
+        intent, intent_confidence = self.classify_intent(query, mentioned, ship_confidence)
+        return Resolution(
+            intent=intent,
+            intent_confidence=intent_confidence,
+            ship_name=ship_name,
+            ship_confidence=ship_confidence,
+            mentioned_ships=mentioned,
+        )
+
+    def is_confident(self, confidence: float) -> bool:
+        """Whether a confidence is high enough to skip the LLM."""
+        return confidence >= self.confidence_threshold
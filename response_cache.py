@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from cache_store import LRUCache, SQLiteStore
+from query_resolver import STOPWORDS, is_price_question, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Words folded together so that rephrasings of a question share a cache entry
+QUERY_SYNONYMS = {
+    "cost": "price", "costs": "price", "priced": "price", "prices": "price", "buy": "price",
+    "purchase": "price", "auec": "price",
+    "weapon": "weapons", "guns": "weapons", "gun": "weapons", "armament": "weapons", "loadout": "weapons",
+    "fast": "speed", "quick": "speed", "speeds": "speed", "scm": "speed",
+    "scu": "cargo", "capacity": "cargo", "hold": "cargo",
+    "sold": "location", "where": "location", "locations": "location",
+}
+
+# Question words that never change the answer, once synonyms have been folded
+_IGNORED = (STOPWORDS | {"i"}) - {"price", "where"}
+
+def normalize_query(query: str, ignore_tokens: Iterable[str] = ()) -> str:
+    """Reduce a question to a canonical bag of meaningful words."""
+    ignored = _IGNORED | set(ignore_tokens)
+    words = {"price"} if is_price_question(query) else set()
+    for token in tokenize(query):
+        if token in ignored:
+            continue
+        # Fold simple plurals ("haulers" -> "hauler") before mapping synonyms
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        token = QUERY_SYNONYMS.get(token, token)
+        if token not in ignored:
+            words.add(token)
+    return " ".join(sorted(words))
+
+class ResponseCache:
+    """Bounded LRU cache of generated answers with TTL and optional SQLite backing.
+
+    Keys combine what the question resolved to (a ship, or a filter set), the
+    intent, the normalized question and the version of the data the answer
+    was built from, so a price refresh, or a ship data update touching the
+    ships an answer covers, makes the older answer unreachable.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                 disk_path: Optional[str] = None):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 3600))
+        if disk_path is None:
+            disk_path = os.environ.get("RESPONSE_CACHE_DB")
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = SQLiteStore(disk_path, table="responses") if disk_path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(subject: Any, intent: str, query: str, data_version: str,
+                 ignore_tokens: Iterable[str] = ()) -> str:
+        """Build a stable cache key for a resolved question."""
+        payload = json.dumps(
+            [subject, intent, normalize_query(query, ignore_tokens), data_version],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached {"response", "sources"} for key, or None."""
+        entry = self.memory.get(key)
+        if entry is None and self.disk:
+            stored = self.disk.get(key)
+            if stored is not None and time.time() - stored[1] <= self.ttl_seconds:
+                entry = stored[0]
+                self.memory.set(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, response: str, sources: List[str]) -> None:
+        entry = {"response": response, "sources": sources}
+        self.memory.set(key, entry)
+        if self.disk:
+            self.disk.set(key, entry)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+        }
@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+from cache_store import LRUCache, SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+class ScrapeCache:
+    """Two-tier cache of parsed wiki pages keyed by URL.
+
+    Entries live in an in-memory LRU backed by SQLite under ``cache/``. An
+    entry older than the TTL is stale: it is still returned so the scraper can
+    revalidate it with its ETag/Last-Modified validators, or serve it when the
+    wiki is unreachable.
+    """
+
+    def __init__(self, db_path: str = "cache/scrape_cache.sqlite", max_memory_entries: int = 256,
+                 ttl_hours: Optional[float] = None):
+        if ttl_hours is None:
+            ttl_hours = float(os.environ.get("SCRAPE_CACHE_TTL_HOURS", 12))
+        self.ttl_seconds = ttl_hours * 3600
+        self.memory = LRUCache(max_entries=max_memory_entries)
+        self.disk = SQLiteStore(db_path, table="scraped_pages") if db_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.stale_served = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for url with a "fresh" flag, or None."""
+        entry = self.memory.get(url)
+        if entry is not None:
+            self.memory_hits += 1
+        elif self.disk:
+            stored = self.disk.get(url)
+            if stored is not None:
+                entry = stored[0]
+                self.disk_hits += 1
+                self.memory.set(url, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        return dict(entry, fresh=time.time() - entry["fetched_at"] < self.ttl_seconds)
+
+    def put(self, url: str, content: Dict[str, Any], etag: Optional[str] = None,
+            last_modified: Optional[str] = None, fetched_at: Optional[float] = None) -> None:
+        """Store parsed content along with the response validators, fetched now unless fetched_at says otherwise."""
+        entry = {
+            "content": content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+        }
+        self.memory.set(url, entry)
+        if self.disk:
+            self.disk.set(url, entry)
+
+    def touch(self, url: str) -> None:
+        """Mark a stale entry fresh again after a 304 Not Modified."""
+        entry = self.memory.get(url)
+        if entry is None:
+            return
+        self.revalidations += 1
+        self.put(url, entry["content"], entry.get("etag"), entry.get("last_modified"))
+
+    def invalidate(self, url: str) -> None:
+        self.memory.delete(url)
+        if self.disk:
+            self.disk.delete(url)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+            "revalidations": self.revalidations,
+            "stale_served": self.stale_served,
+        }
@@ -1,107 +1,171 @@
+import asyncio
+import contextvars
 import logging
-from typing import Dict, List, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup, NavigableString
-import requests
+import time
+from typing import Dict, List, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from http_client import HttpClient, conditional_headers, get_http_client
+from metrics import CACHE_LOOKUPS, stage
+from page_parser import PageParser
+from page_store import PageStore
+from passage_index import PassageRetriever
+from scrape_cache import ScrapeCache
+from single_flight import SingleFlight
 
-# Set up basic logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class WebScraper:
-    def __init__(self, max_workers: int = 3):
+    def __init__(self, max_workers: int = 3, cache: Optional[ScrapeCache] = None,
+                 parser: Optional[PageParser] = None, http: Optional[HttpClient] = None,
+                 store: Optional[PageStore] = None):
         self.max_workers = max_workers
+        self.cache = cache
+        # Pages pre-fetched by the bulk crawler, used to fill the scrape cache on a miss
+        self.store = store
+        self.parser = parser or PageParser()
+        # Pooled connections, timeouts, retries and the wiki's circuit breaker
+        self.http = http or get_http_client()
+        # One long-lived pool shared by every request, so prefetches can start without spawning threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper")
+        # Concurrent scrapes of one URL share a single download and parse
+        self.flights = SingleFlight("scrape")
+        # Passage indexes of scraped pages, for trimming them down to what a question needs
+        self.passages = PassageRetriever()
 
     def scrape_url(self, url: str) -> Dict[str, Any]:
         """
         Scrape all relevant data from a given URL. It groups the page’s content
         by sections based on header tags (h2, h3, h4) and extracts table data.
+        Pages come from the cache while fresh (a page missing from the cache is
+        taken from the crawler's page store), and are revalidated with
+        conditional requests once stale. Callers scraping a URL that is already
+        being downloaded wait for that download instead of starting another.
         """
+        cached = self._from_cache(url)
+        if cached and cached["fresh"]:
+            return {"url": url, "content": cached["content"]}
+        return self.flights.do(url, self._download, url, cached)
+
+    def _download(self, url: str, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         try:
             logger.info(f"Scraping URL: {url}")
-            response = requests.get(url)
-            if response.status_code != 200:
-                logger.error(f"Failed to download content: {response.status_code}")
-                return {"url": url, "content": f"Failed to download content: {response.status_code}"}
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            main_content = soup.find('div', {'class': 'mw-parser-output'})
-            if not main_content:
-                logger.error("Main content div not found")
-                return {"url": url, "content": "No content found"}
-
-            # Initialize sections; content before the first header goes into the "intro" section.
-            sections = {}
-            current_section = "intro"
-            sections[current_section] = []
-
-            # Iterate over the direct contents of the main container.
-            # This includes both NavigableString (plain text) and Tag objects.
-            for element in main_content.contents:
-                # Capture any standalone text nodes
-                if isinstance(element, NavigableString):
-                    text = element.strip()
-                    if text:
-                        sections[current_section].append(text)
-                    continue
-
-                # If the element is a header tag, start a new section
-                if element.name in ['h2', 'h3', 'h4']:
-                    header_text = element.get_text(strip=True)
-                    current_section = header_text
-                    if current_section not in sections:
-                        sections[current_section] = []
-                    logger.debug(f"New section: {current_section}")
-                    continue
-
-                # For other tags (p, div, ul, table, etc.), extract text.
-                # Using get_text(separator=' ', strip=True) helps join nested text parts.
-                text = element.get_text(separator=' ', strip=True)
-                if text:
-                    sections[current_section].append(text)
-
-            # Join all text blocks in each section into one string.
-            for section in sections:
-                sections[section] = "\n".join(sections[section])
-                logger.info(f"Section '{section}' captured with {len(sections[section])} characters.")
-
-            # Extract table data: iterate over all tables in the main content.
-            tables = []
-            for table in main_content.find_all('table'):
-                table_rows = []
-                for row in table.find_all('tr'):
-                    # Look for both header and standard cells
-                    cols = row.find_all(['th', 'td'])
-                    if cols:
-                        row_data = [col.get_text(separator=' ', strip=True) for col in cols]
-                        table_rows.append(row_data)
-                if table_rows:
-                    tables.append(table_rows)
-            if tables:
-                logger.info(f"Extracted {len(tables)} tables from the page.")
-
-            content = {"sections": sections, "tables": tables}
-            return {"url": url, "content": content}
+            response = self.http.get(url, headers=conditional_headers(cached))
+            return self._handle_response(url, cached, response.status_code, response.text, response.headers)
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            if cached:
+                return self._serve_stale(url, cached)
+            return {"url": url, "content": f"Error: {str(e)}"}
+
+    async def ascrape_url(self, url: str) -> Dict[str, Any]:
+        """Async counterpart of scrape_url(); parsing runs in a worker thread."""
+        cached = self._from_cache(url)
+        if cached and cached["fresh"]:
+            return {"url": url, "content": cached["content"]}
+        return await self.flights.ado(url, self._adownload, url, cached)
 
+    async def _adownload(self, url: str, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            logger.info(f"Scraping URL: {url}")
+            response = await self.http.aget(url, headers=conditional_headers(cached))
+            return await asyncio.to_thread(
+                self._handle_response, url, cached, response.status_code, response.text, response.headers
+            )
         except Exception as e:
             logger.error(f"Error scraping {url}: {str(e)}")
+            if cached:
+                return self._serve_stale(url, cached)
             return {"url": url, "content": f"Error: {str(e)}"}
 
+    def _from_store(self, url: str) -> Optional[Dict[str, Any]]:
+        """A cache entry made from the crawler's copy of url, which also seeds the scrape cache with it.
+
+        The entry counts as fetched when the crawler last checked the page,
+        so it goes stale on the cache's own schedule and is then revalidated
+        with the crawler's validators.
+        """
+        entry = self.store.get_recent(url) if self.store else None
+        if entry is None:
+            return None
+        logger.debug(f"Page store hit: {url}")
+        if self.cache is None:
+            return dict(entry, fetched_at=entry["checked_at"], fresh=True)
+        self.cache.put(url, entry["content"], entry.get("etag"), entry.get("last_modified"),
+                       fetched_at=entry["checked_at"])
+        return dict(entry, fetched_at=entry["checked_at"],
+                    fresh=time.time() - entry["checked_at"] < self.cache.ttl_seconds)
+
+    def _from_cache(self, url: str) -> Optional[Dict[str, Any]]:
+        """The cache entry for url, fresh or not, falling back to the page store; counts how the lookup went."""
+        cached = self.cache.get(url) if self.cache else None
+        if cached is None:
+            cached = self._from_store(url)
+            result = "miss" if cached is None else "store"
+        elif cached["fresh"]:
+            logger.debug(f"Scrape cache hit: {url}")
+            result = "fresh"
+        else:
+            result = "expired"
+        CACHE_LOOKUPS.inc(cache="page", result=result)
+        return cached
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    def _handle_response(self, url: str, cached: Optional[Dict[str, Any]], status_code: int, html: str,
+                         headers: Any) -> Dict[str, Any]:
+        """Turn a (possibly conditional) response into a result and update the cache."""
+        if status_code == 304 and cached:
+            logger.info(f"Cached content still valid: {url}")
+            self.cache.touch(url)
+            return {"url": url, "content": cached["content"]}
+
+        if status_code != 200:
+            logger.error(f"Failed to download content: {status_code}")
+            if cached:
+                return self._serve_stale(url, cached)
+            return {"url": url, "content": f"Failed to download content: {status_code}"}
+
+        with stage("parse"):
+            content = self.parse_page(html)
+            self.passages.index(url, content)
+        if self.cache and isinstance(content, dict):
+            self.cache.put(url, content, headers.get("ETag"), headers.get("Last-Modified"))
+        return {"url": url, "content": content}
+
+    def _serve_stale(self, url: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Fall back to an expired cache entry when the wiki cannot be reached."""
+        logger.warning(f"Serving stale cached content for {url}")
+        self.cache.stale_served += 1
+        return {"url": url, "content": cached["content"]}
+
+    def parse_page(self, html: str) -> Any:
+        """Parse a wiki page into its sections and tables, or an error message."""
+        return self.parser.parse_page(html)
+
+    def prefetch(self, url: str) -> Future:
+        """Start scraping url in the background; the future resolves to scrape_url()'s result."""
+        # Run in the caller's context so the scrape's timings land in the caller's request trace
+        return self._executor.submit(contextvars.copy_context().run, self.scrape_url, url)
+
     def scrape_multiple_urls(self, urls: List[str]) -> List[Dict[str, Any]]:
         """Scrape multiple URLs concurrently."""
         results = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_url = {executor.submit(self.scrape_url, url): url for url in urls}
-            for future in as_completed(future_to_url):
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    url = future_to_url[future]
-                    logger.error(f"Error processing {url}: {str(e)}")
-                    results.append({"url": url, "content": f"Error: {str(e)}"})
+        future_to_url = {self.prefetch(url): url for url in urls}
+        for future in as_completed(future_to_url):
+            try:
+                result = future.result()
+                results.append(result)
+            except Exception as e:
+                url = future_to_url[future]
+                logger.error(f"Error processing {url}: {str(e)}")
+                results.append({"url": url, "content": f"Error: {str(e)}"})
         return results
 
+    async def ascrape_multiple_urls(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """Scrape multiple URLs concurrently on the event loop."""
+        return list(await asyncio.gather(*(self.ascrape_url(url) for url in urls)))
+
 if __name__ == '__main__':
     scraper = WebScraper()
     test_url = "https://starcitizen.tools/Mustang_Alpha"
@@ -1,16 +1,159 @@
+import hashlib
 import json
 import logging
-from typing import Dict, List, Any
+import os
+import pickle
+import re
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from ship_names import ShipNames
+from ship_record import Ship
 
 logger = logging.getLogger(__name__)
 
+# Query terms that ask for ships with cargo space
+CARGO_TERMS = {"cargo", "transport", "hauling"}
+# Ships under this in-game price are considered cheap
+CHEAP_PRICE_LIMIT = 2000000
+
+# Precompiled data and indexes, rebuilt whenever the source files' content changes
+SNAPSHOT_FILE = "cache/ship_data.pickle"
+# Bump when the snapshot changes shape so older snapshot files are ignored
+SNAPSHOT_FORMAT = 4
+
+class ShipSnapshot(NamedTuple):
+    """One immutable generation of the ship records and their indexes, swapped in as a whole"""
+    version: str
+    ships: Dict[str, Ship]
+    ship_versions: Dict[str, str]
+    name_index: Dict[str, Set[str]]
+    attribute_index: Dict[str, Set[str]]
+    names_lower: Dict[str, str]
+    positions: Dict[str, int]
+    cheap_ships: Set[str]
+    cargo_ships: Set[str]
+    name_keys: List[str]
+    attribute_keys: List[str]
+    names: ShipNames
+
+class ShipDataChange(NamedTuple):
+    """Ship names added, removed and changed by a reload"""
+    version: str
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+
+def _record_version(ship: Ship) -> str:
+    """Stable fingerprint of one ship's record, for caches keyed on the ships they used"""
+    return hashlib.sha1(repr(ship).encode("utf-8")).hexdigest()[:12]
+
+def _index_add(index: Dict[str, Set[str]], tokens: Set[str], ship_name: str) -> None:
+    # New sets rather than in-place adds: the previous snapshot still shares the old ones
+    for token in tokens:
+        index[token] = index.get(token, set()) | {ship_name}
+
+def _index_discard(index: Dict[str, Set[str]], tokens: Set[str], ship_name: str) -> None:
+    for token in tokens:
+        remaining = index[token] - {ship_name}
+        if remaining:
+            index[token] = remaining
+        else:
+            del index[token]
+
 class ShipDataManager:
-    def __init__(self, data_file: str = "attached_assets/Starships.txt", combined_data_file: str = "attached_assets/combined_star_citizen_ships.json"):
+    """Ship records and lookup indexes, reloadable without a restart.
+
+    Everything readers use lives in one ShipSnapshot that is replaced by a
+    single assignment, so lookups never block and never see a half-updated
+    index. reload() re-reads the data files when their content changes,
+    diffs the ships by name, patches only the affected index entries and
+    notifies listeners so dependent indexes and caches can follow. With
+    watch_files, a background thread polls the files' modification times
+    and reloads on change.
+    """
+
+    def __init__(self, data_file: str = "attached_assets/Starships.txt", combined_data_file: str = "attached_assets/combined_star_citizen_ships.json",
+                 snapshot_file: Optional[str] = SNAPSHOT_FILE, watch_files: bool = False):
         self.data_file = data_file
         self.combined_data_file = combined_data_file
-        self.ship_data = self._load_data()
-        self.combined_data = self._load_combined_data()
-        self.merged_data = self._merge_data()
+        self.snapshot_file = snapshot_file
+        self._listeners: List[Callable[[ShipDataChange], None]] = []
+        self._reload_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        version = self._content_hash()
+        self._snapshot = self._load_snapshot(version)
+        if self._snapshot is None:
+            self._snapshot = self._build_snapshot(
+                version, *self._load_ships(self._load_data(), self._load_combined_data())
+            )
+            self._save_snapshot()
+
+        if watch_files:
+            self.start_watcher()
+
+    @property
+    def ships(self) -> Dict[str, Ship]:
+        return self._snapshot.ships
+
+    @property
+    def data_version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def names(self) -> ShipNames:
+        return self._snapshot.names
+
+    def canonical_name(self, name: str) -> Optional[str]:
+        """The ship a name or alias refers to, e.g. "Pirate Gladius" -> "Gladius Pirate"; None if unknown"""
+        if name in self._snapshot.ships:
+            return name
+        return self._snapshot.names.canonical(name)
+
+    def _content_hash(self) -> str:
+        """Identify the data files by their content"""
+        digest = hashlib.sha256()
+        for path in (self.data_file, self.combined_data_file):
+            try:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(b"missing")
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def _load_snapshot(self, version: str) -> Optional[ShipSnapshot]:
+        """Restore the loaded data and indexes from a snapshot of the same content"""
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return None
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                stored = pickle.load(f)
+            if stored.get("format") != SNAPSHOT_FORMAT or stored["snapshot"].version != version:
+                logger.info("Ship data snapshot is out of date, rebuilding")
+                return None
+            logger.info(f"Loaded {len(stored['snapshot'].ships)} ships from snapshot {self.snapshot_file}")
+            return stored["snapshot"]
+        except Exception as e:
+            logger.error(f"Error loading ship data snapshot: {str(e)}")
+            return None
+
+    def _save_snapshot(self) -> None:
+        """Write the loaded data and indexes so the next start can skip parsing"""
+        if not self.snapshot_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_file) or ".", exist_ok=True)
+            # Write beside the snapshot and rename so a concurrent start never reads a partial file
+            tmp_file = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                pickle.dump({"format": SNAPSHOT_FORMAT, "snapshot": self._snapshot}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.snapshot_file)
+        except Exception as e:
+            logger.error(f"Error saving ship data snapshot: {str(e)}")
 
     def _load_data(self) -> Dict[str, Any]:
         """Load ship data from JSON file"""
@@ -37,136 +180,314 @@ class ShipDataManager:
             logger.error(f"Error loading combined ship data: {str(e)}")
             return {}
 
-    def _merge_data(self) -> Dict[str, Any]:
-        """Merge both data sources, prioritizing combined data for certain fields"""
-        merged = {}
-        
-        # First, add all ships from the original data
-        for ship_name, ship_info in self.ship_data.items():
-            merged[ship_name] = {
-                "original_data": ship_info,
-                "combined_data": None
-            }
-        
-        # Then add or update with combined data
-        for ship_name, ship_info in self.combined_data.items():
-            normalized_name = ship_name.strip()
-            if normalized_name in merged:
-                merged[normalized_name]["combined_data"] = ship_info
-            else:
-                merged[normalized_name] = {
-                    "original_data": None,
-                    "combined_data": ship_info
-                }
-        
-        return merged
+    @staticmethod
+    def _load_ships(ship_data: Dict[str, Any], combined_data: Dict[str, Any]) -> Tuple[Dict[str, Ship], ShipNames]:
+        """Normalize both data files into one Ship per name, discarding the raw payloads.
+
+        Combined entries are joined onto the Starships.txt names through
+        ShipNames, so "Pirate Gladius" completes "Gladius Pirate"; entries
+        that match no ship become ships of their own. Returns the ships and
+        the name table, which remembers the combined spellings as aliases.
+        """
+        combined_data = {name.strip(): info for name, info in combined_data.items()}
+        manufacturers = {info.get("manufacturer") for info in combined_data.values()
+                         if isinstance(info.get("manufacturer"), str)}
+        matched, unmatched = ShipNames(ship_data, manufacturers).join(combined_data)
+
+        combined_for: Dict[str, Any] = {}
+        aliases: Dict[str, str] = {}
+        # Exact spellings claim their ship before aliases do
+        for name, canonical in sorted(matched.items(), key=lambda item: item[0] != item[1]):
+            if canonical in combined_for:
+                unmatched.append(name)
+                continue
+            combined_for[canonical] = combined_data[name]
+            if name != canonical:
+                aliases[name] = canonical
+
+        # Ships from the original data first, then those only in the combined data
+        leftover = set(unmatched)
+        names = list(dict.fromkeys(list(ship_data) + [name for name in combined_data if name in leftover]))
+        ships = {
+            name: Ship.from_sources(name, ship_data.get(name), combined_for.get(name, combined_data.get(name)))
+            for name in names
+        }
+        if unmatched:
+            logger.info(f"{len(unmatched)} combined ship entries match no Starships.txt ship: {', '.join(unmatched)}")
+        return ships, ShipNames(ships, {ship.manufacturer for ship in ships.values()}, aliases, unmatched)
+
+    def add_listener(self, callback: Callable[[ShipDataChange], None]) -> None:
+        """Call callback with every ShipDataChange applied by reload()"""
+        self._listeners.append(callback)
+
+    def reload(self, force: bool = False) -> Optional[ShipDataChange]:
+        """Re-read the data files and swap in the changed ships and indexes.
+
+        Returns the change, or None when the files' content is unchanged.
+        Raises ValueError and keeps the current data when a file cannot be
+        parsed, e.g. while it is still being written.
+        """
+        with self._reload_lock:
+            version = self._content_hash()
+            current = self._snapshot
+            if version == current.version and not force:
+                return None
+            ship_data, combined_data = self._load_data(), self._load_combined_data()
+            if not ship_data or not combined_data:
+                raise ValueError("Ship data files are missing or unreadable; keeping the current ships")
+            ships, names = self._load_ships(ship_data, combined_data)
+
+            added = [name for name in ships if name not in current.ships]
+            removed = [name for name in current.ships if name not in ships]
+            changed = [name for name in ships if name in current.ships and ships[name] != current.ships[name]]
+            # Unchanged ships keep their existing record objects
+            for name, ship in ships.items():
+                if name in current.ships and name not in changed:
+                    ships[name] = current.ships[name]
+
+            change = ShipDataChange(version, added, removed, changed)
+            self._snapshot = self._patch_snapshot(current, ships, names, change)
+            self._save_snapshot()
+        logger.info(f"Reloaded ship data {version}: {len(added)} added, {len(removed)} removed, "
+                    f"{len(changed)} changed")
+
+        if added or removed or changed:
+            for listener in self._listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    logger.error(f"Error in ship data reload listener: {str(e)}")
+        return change
+
+    def start_watcher(self, interval_seconds: Optional[float] = None) -> None:
+        """Poll the data files' modification times in a background thread and reload on change"""
+        if interval_seconds is None:
+            interval_seconds = float(os.environ.get("SHIP_DATA_WATCH_SECONDS", 30))
+        if interval_seconds <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval_seconds,), name="ship-data-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._watch_stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _file_mtimes(self) -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for path in (self.data_file, self.combined_data_file):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _watch_loop(self, interval_seconds: float) -> None:
+        mtimes = self._file_mtimes()
+        while not self._watch_stop.wait(interval_seconds):
+            current = self._file_mtimes()
+            if current == mtimes:
+                continue
+            try:
+                self.reload()
+                mtimes = current
+            except Exception as e:
+                # Left unrecorded so the next poll tries again
+                logger.error(f"Error reloading ship data: {str(e)}")
 
     def get_all_ships(self) -> List[str]:
         """Return list of all ship names"""
-        return list(self.merged_data.keys())
+        return list(self.ships)
 
-    def find_relevant_ships(self, query: str) -> Dict[str, Any]:
-        """Find ships relevant to the query"""
-        relevant_ships = {}
-        query_terms = query.lower().split()
-        
-        # First try to find exact ship matches
-        for ship_name, ship_info in self.merged_data.items():
-            # Check for exact ship name matches first
-            ship_terms = ship_name.lower().split()
-            if all(term in ship_name.lower() for term in query_terms if len(term) > 2):
-                relevant_ships[ship_name] = self._combine_ship_data(ship_info)
-                
-        # If no exact matches, try broader matching
-        if not relevant_ships:
-            for ship_name, ship_info in self.merged_data.items():
-                if any(term in ship_name.lower() for term in query_terms if len(term) > 2):
-                    relevant_ships[ship_name] = self._combine_ship_data(ship_info)
-                elif self._check_ship_attributes(ship_info, query_terms):
-                    relevant_ships[ship_name] = self._combine_ship_data(ship_info)
-                
-        return relevant_ships
+    def records_version(self, ship_names: Iterable[str]) -> str:
+        """Fingerprint of the given ships' records, which changes only when one of them does"""
+        ship_versions = self._snapshot.ship_versions
+        digest = hashlib.sha1("|".join(sorted(ship_versions.get(name, "") for name in ship_names)).encode("utf-8"))
+        return digest.hexdigest()[:16]
 
-    def _combine_ship_data(self, ship_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Combine data from both sources into a single ship record"""
-        combined = {}
-        
-        original_data = ship_info.get("original_data", {})
-        extra_data = ship_info.get("combined_data", {})
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """Split text into lowercase alphanumeric tokens"""
+        return re.findall(r"[a-z0-9]+", text.lower())
+
+    @staticmethod
+    def _attribute_values(ship: Ship) -> List[str]:
+        """Collect the searchable manufacturer, role, type and size values of a ship"""
+        return [ship.manufacturer, *ship.roles, ship.type, ship.size]
+
+    def _ship_tokens(self, ship_name: str, ship: Ship) -> Tuple[Set[str], Set[str]]:
+        """The name tokens and attribute tokens a ship is indexed under"""
+        attribute_tokens = {token for value in self._attribute_values(ship) for token in self._tokenize(value)}
+        return set(self._tokenize(ship_name)), attribute_tokens
+
+    @staticmethod
+    def _is_cheap(ship: Ship) -> bool:
+        return ship.price is not None and 0 < ship.price < CHEAP_PRICE_LIMIT
+
+    def _build_snapshot(self, version: str, ships: Dict[str, Ship], names: ShipNames) -> ShipSnapshot:
+        """Precompute the inverted indexes used by the lookups"""
+        name_index: Dict[str, Set[str]] = {}
+        attribute_index: Dict[str, Set[str]] = {}
+        names_lower: Dict[str, str] = {}
+        positions: Dict[str, int] = {}
+        cheap_ships: Set[str] = set()
+        cargo_ships: Set[str] = set()
         
-        if original_data:
-            combined.update(original_data)
+        for position, (ship_name, ship) in enumerate(ships.items()):
+            positions[ship_name] = position
+            names_lower.setdefault(ship_name.lower(), ship_name)
             
-        if extra_data:
-            # Add or update with combined data fields
-            combined["in_game_price"] = extra_data.get("price")
-            combined["manufacturer"] = extra_data.get("manufacturer")
-            combined["size"] = extra_data.get("size")
-            combined["cargo_capacity"] = extra_data.get("cargo_capacity")
-            combined["crew_size"] = extra_data.get("crew_size")
-            combined["role"] = extra_data.get("role")
-            # Add any additional fields from combined data that are useful
+            name_tokens, attribute_tokens = self._ship_tokens(ship_name, ship)
+            for token in name_tokens:
+                name_index.setdefault(token, set()).add(ship_name)
+            for token in attribute_tokens:
+                attribute_index.setdefault(token, set()).add(ship_name)
             
-        return combined
+            if self._is_cheap(ship):
+                cheap_ships.add(ship_name)
+            if ship.cargo:
+                cargo_ships.add(ship_name)
+        
+        # Sorted keys let a query term match every indexed token it is a prefix of
+        snapshot = ShipSnapshot(
+            version=version,
+            ships=ships,
+            ship_versions={ship_name: _record_version(ship) for ship_name, ship in ships.items()},
+            name_index=name_index,
+            attribute_index=attribute_index,
+            names_lower=names_lower,
+            positions=positions,
+            cheap_ships=cheap_ships,
+            cargo_ships=cargo_ships,
+            name_keys=sorted(name_index),
+            attribute_keys=sorted(attribute_index),
+            names=names,
+        )
+        logger.info(f"Indexed {len(ships)} ships on {len(snapshot.name_keys)} name tokens "
+                    f"and {len(snapshot.attribute_keys)} attribute tokens")
+        return snapshot
+
+    def _patch_snapshot(self, current: ShipSnapshot, ships: Dict[str, Ship], names: ShipNames,
+                        change: ShipDataChange) -> ShipSnapshot:
+        """Derive the next snapshot by re-indexing only the ships in change.
+
+        Index entries of untouched tokens are shared with the current snapshot;
+        the order-dependent maps are rebuilt only when ships were added or removed.
+        """
+        name_index = dict(current.name_index)
+        attribute_index = dict(current.attribute_index)
+        ship_versions = dict(current.ship_versions)
+        cheap_ships = set(current.cheap_ships)
+        cargo_ships = set(current.cargo_ships)
+
+        for ship_name in change.removed + change.changed:
+            name_tokens, attribute_tokens = self._ship_tokens(ship_name, current.ships[ship_name])
+            _index_discard(name_index, name_tokens, ship_name)
+            _index_discard(attribute_index, attribute_tokens, ship_name)
+            cheap_ships.discard(ship_name)
+            cargo_ships.discard(ship_name)
+            ship_versions.pop(ship_name, None)
+
+        for ship_name in change.added + change.changed:
+            ship = ships[ship_name]
+            name_tokens, attribute_tokens = self._ship_tokens(ship_name, ship)
+            _index_add(name_index, name_tokens, ship_name)
+            _index_add(attribute_index, attribute_tokens, ship_name)
+            if self._is_cheap(ship):
+                cheap_ships.add(ship_name)
+            if ship.cargo:
+                cargo_ships.add(ship_name)
+            ship_versions[ship_name] = _record_version(ship)
+
+        positions, names_lower = current.positions, current.names_lower
+        if change.added or change.removed:
+            positions = {ship_name: position for position, ship_name in enumerate(ships)}
+            names_lower = {}
+            for ship_name in ships:
+                names_lower.setdefault(ship_name.lower(), ship_name)
+
+        return ShipSnapshot(
+            version=change.version,
+            ships=ships,
+            ship_versions=ship_versions,
+            name_index=name_index,
+            attribute_index=attribute_index,
+            names_lower=names_lower,
+            positions=positions,
+            cheap_ships=cheap_ships,
+            cargo_ships=cargo_ships,
+            name_keys=current.name_keys if name_index.keys() == current.name_index.keys() else sorted(name_index),
+            attribute_keys=(current.attribute_keys if attribute_index.keys() == current.attribute_index.keys()
+                            else sorted(attribute_index)),
+            names=names,
+        )
+
+    @staticmethod
+    def _prefix_lookup(index: Dict[str, Set[str]], keys: List[str], term: str) -> Set[str]:
+        """Return the ships indexed under any token starting with term"""
+        matches = set()
+        position = bisect_left(keys, term)
+        while position < len(keys) and keys[position].startswith(term):
+            matches |= index[keys[position]]
+            position += 1
+        return matches
+
+    @staticmethod
+    def _ordered(snapshot: ShipSnapshot, ship_names: Set[str]) -> List[str]:
+        """Order ship names as they appear in the merged data"""
+        return sorted(ship_names, key=snapshot.positions.__getitem__)
+
+    def _match_all_names(self, snapshot: ShipSnapshot, terms: List[str]) -> Set[str]:
+        """Return the ships whose name matches every term"""
+        return set.intersection(*(
+            self._prefix_lookup(snapshot.name_index, snapshot.name_keys, term) for term in terms
+        ))
 
-    def _check_ship_attributes(self, ship_info: Dict[str, Any], query_terms: List[str]) -> bool:
-        """Check if ship attributes match query terms"""
-        matches = False
+    def find_relevant_ships(self, query: str) -> Dict[str, Ship]:
+        """Find ships relevant to the query.
+
+        The returned records are the shared canonical Ship objects and must not be mutated.
+        """
+        # One snapshot for the whole lookup, so a concurrent reload cannot mix generations
+        snapshot = self._snapshot
+        tokens = self._tokenize(query)
+        query_terms = [term for term in tokens if len(term) > 2] or tokens
+        if not query_terms:
+            return {}
         
-        # Check original data
-        if ship_info.get("original_data"):
-            printouts = ship_info["original_data"].get('printouts', {})
-            
-            # Check manufacturer
-            manufacturer = printouts.get('Manufacturer', [])
-            if manufacturer and any(term in manufacturer[0].get('fulltext', '').lower() for term in query_terms):
-                matches = True
-                
-            # Check roles
-            roles = printouts.get('Role', [])
-            if any(any(term in role.lower() for term in query_terms) for role in roles):
-                matches = True
+        # First try to find ships whose name matches every query token ("Idris-K"),
+        # then every longer query term
+        matches = self._match_all_names(snapshot, tokens) or self._match_all_names(snapshot, query_terms)
         
-        # Check combined data
-        if ship_info.get("combined_data"):
-            combined_data = ship_info["combined_data"]
-            
-            # Check manufacturer
-            if combined_data.get("manufacturer") and any(term in combined_data["manufacturer"].lower() for term in query_terms):
-                matches = True
-                
-            # Check role
-            if combined_data.get("role") and any(term in combined_data["role"].lower() for term in query_terms):
-                matches = True
-                
-            # Check price for "cheap" queries
-            if "cheap" in query_terms and combined_data.get("price"):
-                try:
-                    price = float(combined_data["price"])
-                    if price < 2000000:  # Consider ships under 2M aUEC as cheap
-                        matches = True
-                except (ValueError, TypeError):
-                    pass
-                    
-            # Check cargo capacity for cargo-related queries
-            if any(term in ["cargo", "transport", "hauling"] for term in query_terms) and combined_data.get("cargo_capacity"):
-                matches = True
-                
-        return matches
+        # If no exact matches, try broader matching on any term or attribute
+        if not matches:
+            for term in query_terms:
+                matches |= self._prefix_lookup(snapshot.name_index, snapshot.name_keys, term)
+                matches |= self._prefix_lookup(snapshot.attribute_index, snapshot.attribute_keys, term)
+            if "cheap" in query_terms:
+                matches |= snapshot.cheap_ships
+            if CARGO_TERMS.intersection(query_terms):
+                matches |= snapshot.cargo_ships
+        
+        return {ship_name: snapshot.ships[ship_name] for ship_name in self._ordered(snapshot, matches)}
 
-    def needs_additional_data(self, query: str, ship_data: Dict[str, Any]) -> bool:
+    def needs_additional_data(self, query: str, ship_data: Dict[str, Ship]) -> bool:
         """Determine if web scraping is needed based on query context"""
         query = query.lower()
         
         # Define field mappings for common query topics
         field_mappings = {
-            'cargo': ['Cargo capacity'],
-            'speed': ['SCM speed', 'Quantum speed'],
-            'fuel': ['Hydrogen fuel capacity', 'Quantum fuel capacity'],
-            'price': ['Pledge price', 'In-game price'],
-            'crew': ['Crew'],
-            'role': ['Role'],
-            'manufacturer': ['Manufacturer']
+            'cargo': ['cargo'],
+            'speed': ['scm_speed', 'quantum_speed'],
+            'fuel': ['hydrogen_fuel', 'quantum_fuel'],
+            'price': ['pledge_price', 'price'],
+            'crew': ['max_crew', 'min_crew'],
+            'role': ['roles'],
+            'manufacturer': ['manufacturer']
         }
         
         # Determine which fields are relevant to the query
@@ -177,78 +498,66 @@ class ShipDataManager:
                 
         # If no specific fields are identified, use a minimal set
         if not required_fields:
-            required_fields = ['Manufacturer', 'Role']
+            required_fields = ['manufacturer', 'roles']
             
         # Only check relevant fields for the ships
-        for ship_info in ship_data.values():
-            printouts = ship_info.get('printouts', {})
-            # Only check fields that are relevant to the query
-            missing_relevant_data = any(
-                field in required_fields and 
-                (field not in printouts or not printouts[field])
-                for field in required_fields
-            )
-            if missing_relevant_data:
-                return True
-                
-        return False
+        return any(
+            getattr(ship, field) in (None, "", ())
+            for ship in ship_data.values()
+            for field in required_fields
+        )
 
-    def get_relevant_urls(self, ship_data: Dict[str, Any]) -> List[str]:
+    def get_relevant_urls(self, ship_data: Dict[str, Ship]) -> List[str]:
         """Extract only the most relevant URLs for web scraping"""
-        urls = []
-        for ship_info in ship_data.values():
-            # Only get the main ship details URL, skip pledge store URL
-            if ship_info.get('fullurl'):
-                urls.append(ship_info['fullurl'])
-                
-        return list(set(urls))  # Remove duplicates
+        # Only get the main ship details URL, skip pledge store URL
+        return list({ship.url for ship in ship_data.values() if ship.url})
+
+    def get_vehicle_urls(self) -> List[str]:
+        """Wiki URLs of the ships and vehicles alone, leaving out the suits, helmets and locations in the export"""
+        return self.get_relevant_urls({name: ship for name, ship in self.ships.items() if ship.is_vehicle})
 
-    def get_data_sources(self, ship_data: Dict[str, Any]) -> List[str]:
+    def get_data_sources(self, ship_data: Dict[str, Ship]) -> List[str]:
         """Get list of data sources used - only returns URLs for ships that were found in the query"""
-        sources = []
-        
-        # Get the ship names that were actually found in the query
-        found_ships = list(ship_data.keys())
-        
-        # Only include URLs for ships that were actually found/used
-        for ship_name, ship_info in self.ship_data.items():
-            # Check if this ship was in our query results
-            if ship_name in found_ships:
-                if ship_info.get('fullurl'):
-                    sources.append(ship_info['fullurl'])
-                # Include manufacturer URL only if it's relevant to the query
-                manufacturer = ship_info.get('printouts', {}).get('Manufacturer', [])
-                if manufacturer and manufacturer[0].get('fullurl'):
-                    sources.append(manufacturer[0]['fullurl'])
-                    
-        return list(set(sources))  # Remove any duplicates
+        sources = set()
+        for ship_name in ship_data:
+            ship = self.ships.get(ship_name)
+            if not ship:
+                continue
+            if ship.url:
+                sources.add(ship.url)
+            # Include manufacturer URL only if it's relevant to the query
+            if ship.manufacturer_url:
+                sources.add(ship.manufacturer_url)
+        return list(sources)
 
     def get_ship_url(self, ship_name: str) -> str:
         """Get the specific URL for a ship"""
-        ship_info = self.merged_data.get(ship_name, {})
-        if ship_info.get("original_data"):
-            return ship_info["original_data"].get('fullurl', '')
-        return ''
+        ship = self.ships.get(ship_name)
+        return ship.url if ship else ''
 
     def get_specific_ship_url(self, query: str) -> str:
         """Get URL for a specific ship based on query"""
         # Normalize query
         query = query.lower()
+        snapshot = self._snapshot
         
-        # First try exact match
-        for ship_name, ship_info in self.merged_data.items():
-            if query in ship_name.lower():
-                if ship_info.get("original_data"):
-                    return ship_info["original_data"].get('fullurl', '')
+        # First try exact match, then the names other sources use
+        ship_name = snapshot.names_lower.get(query) or snapshot.names.canonical(query)
+        if ship_name and snapshot.ships[ship_name].url:
+            return snapshot.ships[ship_name].url
+        
+        # Otherwise narrow candidates through the name index before the substring test
+        tokens = self._tokenize(query)
+        if not tokens:
+            return ''
+        for ship_name in self._ordered(snapshot, self._match_all_names(snapshot, tokens)):
+            ship = snapshot.ships[ship_name]
+            if query in ship_name.lower() and ship.url:
+                return ship.url
                 
         return ''
 
     def get_ship_price(self, ship_name: str) -> int:
         """Get the in-game price for a specific ship"""
-        ship_info = self.merged_data.get(ship_name, {})
-        if ship_info.get("combined_data"):
-            try:
-                return int(ship_info["combined_data"].get("price", 0))
-            except (ValueError, TypeError):
-                return 0
-        return 0
+        ship = self.ships.get(ship_name)
+        return int(ship.price) if ship and ship.price is not None else 0
@@ -0,0 +1,152 @@
+"""Pre-serialized /api/ships responses.
+
+Clients poll the ship list far more often than the ship data changes, so
+each variant of the response (the plain name list, or a page of projected
+fields) is serialized once and kept as bytes, together with a strong ETag
+and its gzip and brotli encodings, which are compressed the first time a
+client asks for them. A ShipListing belongs to one ShipSearchEngine, and a
+new one is built whenever the ship data is reloaded or the prices are
+refreshed. Its version names both, and is part of every body, so nothing
+cached here (or by a client, through the ETag) outlives the data it was
+built from.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from cache_store import LRUCache
+from ship_search import NUMERIC_FIELDS, TEXT_FIELDS, ShipSearchEngine
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Fields a client may project with ?fields=
+FIELDS = ("name",) + tuple(TEXT_FIELDS) + tuple(NUMERIC_FIELDS) + ("url",)
+# Bodies smaller than this are sent as they are
+COMPRESS_MIN_BYTES = int(os.environ.get("SHIPS_COMPRESS_MIN_BYTES", 1024))
+CACHE_MAX_AGE = int(os.environ.get("SHIPS_CACHE_MAX_AGE", 30))
+VARIANT_CACHE_SIZE = int(os.environ.get("SHIPS_VARIANT_CACHE_SIZE", 128))
+
+def _supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+class ListingBody:
+    """One serialized response and its compressed encodings."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.tag = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag of the body as sent; every encoding gets its own, as RFC 9110 requires."""
+        return f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header names this body in any encoding."""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate.strip('"').split("-")[0] == self.tag:
+                return True
+        return False
+
+    def choose_encoding(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """The best encoding the client accepts, or None to send the body as it is."""
+        if len(self.body) < COMPRESS_MIN_BYTES or not accept_encoding:
+            return None
+        accepted = {}
+        for item in accept_encoding.lower().split(","):
+            coding, _, params = item.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip()] = quality
+        for encoding in _supported_encodings():
+            if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return None
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """The body in the given encoding, compressed on first use."""
+        if encoding is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    if encoding == "br":
+                        data = brotli.compress(self.body, quality=11)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=9, mtime=0)
+                    self._encoded[encoding] = data
+        return data
+
+class ShipListing:
+    """Serialized variants of the ship list for one version of the ship data."""
+
+    def __init__(self, ship_search: ShipSearchEngine, version: str):
+        self.ship_search = ship_search
+        self.version = version
+        self._variants = LRUCache(max_entries=VARIANT_CACHE_SIZE)
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """Validate a comma-separated ?fields= value; None keeps the plain name list."""
+        if not fields:
+            return None
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in requested if field not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field: {', '.join(unknown)}")
+        return requested or None
+
+    def body(self, fields: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+             offset: int = 0) -> ListingBody:
+        """The serialized response for a projection and page, built once per listing."""
+        key = (tuple(fields) if fields else None, limit, offset)
+        cached = self._variants.get(key)
+        if cached is not None:
+            return cached
+        listing = ListingBody(self._serialize(key[0], limit, offset))
+        self._variants.set(key, listing)
+        return listing
+
+    def _serialize(self, fields: Optional[Tuple[str, ...]], limit: Optional[int], offset: int) -> bytes:
+        total = len(self.ship_search)
+        end = total if limit is None else min(total, offset + limit)
+        rows = range(offset, end)
+        if fields is None:
+            ships = [str(self.ship_search.names[row]) for row in rows]
+        else:
+            ships = []
+            for row in rows:
+                record = self.ship_search.row(row)
+                ships.append({field: record[field] for field in fields})
+        payload = {"success": True, "ships": ships}
+        if limit is not None or offset:
+            payload.update({"total": total, "offset": offset, "limit": limit})
+        payload["version"] = self.version
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+    def stats(self) -> Dict[str, int]:
+        return self._variants.stats()
@@ -0,0 +1,132 @@
+"""Canonical ship names and the spellings other data sources use for them.
+
+Starships.txt, the combined JSON and the wiki's price list all name the
+same ships slightly differently: "Khartu-Al" and "Khartu-al", "Pirate
+Gladius" and "Gladius Pirate", "A2 Hercules" and "A2 Hercules Starlifter",
+"F8C Lightning Executive Edition" and "F8C Lightning Executive", or a typo
+like "Interpid". A ShipNames table is built once per load of the ship data
+and joins other sources' names onto the canonical ones when they are loaded,
+through these rules in order:
+
+1. the same name once case, accents and punctuation are normalized away;
+2. the same words in any order, ignoring a leading manufacturer name, the
+   word "edition" and a trailing year;
+3. an abbreviation whose words all appear in exactly one canonical ship;
+4. a close spelling (difflib) with the same number of words, where every
+   word holding a digit, such as F7C or C8R, matches exactly.
+
+Everything after the join is a dict lookup, and the names that matched
+nothing are kept for a report instead of being dropped silently.
+"""
+import logging
+import re
+from difflib import get_close_matches
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from query_resolver import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Words that mark a re-release rather than a different ship
+VARIANT_WORDS = {"edition"}
+YEAR_PATTERN = re.compile(r"^(19|20|29)\d\d$")
+FUZZY_CUTOFF = 0.85
+
+class ShipNames:
+    """Map any known spelling of a ship's name to its canonical name."""
+
+    def __init__(self, canonical_names: Iterable[str], manufacturers: Iterable[str] = (),
+                 aliases: Optional[Dict[str, str]] = None, unmatched: Iterable[str] = ()):
+        self.canonical_names = list(dict.fromkeys(canonical_names))
+        # Leading words of manufacturer names as word tuples, e.g. ("anvil", "aerospace") and ("anvil",)
+        self._prefixes = set()
+        for manufacturer in set(manufacturers):
+            words = tuple(normalize_text(manufacturer or "").split())
+            self._prefixes.update(words[:length] for length in range(1, len(words) + 1))
+        self._longest_prefix = max((len(prefix) for prefix in self._prefixes), default=0)
+        # Names from other sources that matched nothing, for the report
+        self.unmatched = sorted(unmatched)
+
+        self._exact: Dict[str, str] = {}
+        self._reduced: Dict[str, Optional[str]] = {}
+        self._words: Dict[str, set] = {}
+        for name in self.canonical_names:
+            text = normalize_text(name)
+            self._exact.setdefault(text, name)
+            self._words[name] = set(text.split())
+            key = self._reduce_words(text.split())
+            # A reduced key shared by two ships identifies neither
+            if key in self._reduced and self._reduced[key] != name:
+                self._reduced[key] = None
+            else:
+                self._reduced[key] = name
+        self.aliases = dict(aliases or {})
+        for alias, name in self.aliases.items():
+            self._exact.setdefault(normalize_text(alias), name)
+
+    def _reduce_words(self, words: List[str]) -> str:
+        """Normalized words without manufacturer, edition or year, in sorted order."""
+        for length in range(min(self._longest_prefix, len(words) - 1), 0, -1):
+            if tuple(words[:length]) in self._prefixes:
+                words = words[length:]
+                break
+        return " ".join(sorted(word for word in words if word not in VARIANT_WORDS and not YEAR_PATTERN.match(word)))
+
+    def __len__(self) -> int:
+        return len(self.canonical_names)
+
+    def canonical(self, name: str) -> Optional[str]:
+        """The canonical name for an exact or previously joined spelling, else None."""
+        if not name:
+            return None
+        text = normalize_text(name)
+        canonical = self._exact.get(text)
+        if canonical is None:
+            canonical = self._reduced.get(self._reduce_words(text.split()))
+        return canonical
+
+    def match(self, name: str) -> Optional[str]:
+        """Like canonical(), then try abbreviations and close spellings; slower, so only used when joining."""
+        canonical = self.canonical(name)
+        if canonical is not None:
+            return canonical
+
+        key = normalize_text(name)
+        words = set(self._reduce_words(key.split()).split())
+        if words:
+            containing = [candidate for candidate, candidate_words in self._words.items() if words <= candidate_words]
+            if len(containing) == 1:
+                return containing[0]
+
+        # Only spellings with as many words can pass _same_designations
+        word_count = len(key.split())
+        candidates = [known for known in self._exact if known.count(" ") + 1 == word_count]
+        for close in get_close_matches(key, candidates, n=3, cutoff=FUZZY_CUTOFF):
+            if self._same_designations(key, close):
+                return self._exact[close]
+        return None
+
+    @staticmethod
+    def _same_designations(first: str, second: str) -> bool:
+        """Same word count, and words holding a digit (model designations) are identical."""
+        first_words, second_words = first.split(), second.split()
+        if len(first_words) != len(second_words):
+            return False
+        return all(a == b for a, b in zip(first_words, second_words)
+                   if any(ch.isdigit() for ch in a + b))
+
+    def join(self, names: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """Match another source's names: (name -> canonical name, names that matched nothing)."""
+        matched: Dict[str, str] = {}
+        unmatched: List[str] = []
+        for name in names:
+            canonical = self.match(name)
+            if canonical is None:
+                unmatched.append(name)
+            else:
+                matched[name] = canonical
+        return matched, unmatched
+
+    def report(self) -> Dict[str, object]:
+        """How the join went, for the /api/ships/names report."""
+        return {"canonical": len(self.canonical_names), "aliases": self.aliases, "unmatched": self.unmatched}
@@ -0,0 +1,143 @@
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+# Numeric statistics: Ship attribute -> (Starships.txt printout, combined JSON field)
+NUMERIC_SOURCES = {
+    "price": (None, "aUEC"),
+    "pledge_price": ("Pledge price", None),
+    "cargo": ("Cargo capacity", "cargocapacity"),
+    "vehicle_inventory": ("Vehicle inventory", None),
+    "scm_speed": ("SCM speed", "scm_speed"),
+    "afterburner_speed": (None, "afterburner_speed"),
+    "quantum_speed": ("Quantum speed", None),
+    "hydrogen_fuel": ("Hydrogen fuel capacity", None),
+    "quantum_fuel": ("Quantum fuel capacity", None),
+    "max_crew": (None, "max_crew"),
+    "min_crew": (None, "min_crew"),
+}
+NUMERIC_FIELDS = tuple(NUMERIC_SOURCES)
+# Counts rather than measurements
+INTEGER_FIELDS = {"max_crew", "min_crew"}
+
+def parse_number(value: Any) -> Optional[float]:
+    """Parse a number that may be a "1,234" string or a {"value": ...} printout; None when missing."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("value")
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+
+def _intern(value: Any) -> str:
+    """Share one copy of text that repeats across ships (manufacturers, roles, sizes)."""
+    return sys.intern(value.strip()) if isinstance(value, str) and value.strip() else ""
+
+@dataclass(slots=True)
+class Ship:
+    """One ship, normalized from the wiki export and the combined dataset.
+
+    Repeated text is interned and every statistic is a plain number (None
+    when unknown); nothing else from the raw payloads is kept.
+    """
+    name: str
+    url: str = ""
+    manufacturer: str = ""
+    manufacturer_url: str = ""
+    roles: Tuple[str, ...] = ()
+    type: str = ""
+    size: str = ""
+    production_status: str = ""
+    description: str = ""
+    pledge_store_url: str = ""
+    purchase_locations: Tuple[str, ...] = ()
+    price: Optional[float] = None
+    pledge_price: Optional[float] = None
+    cargo: Optional[float] = None
+    vehicle_inventory: Optional[float] = None
+    scm_speed: Optional[float] = None
+    afterburner_speed: Optional[float] = None
+    quantum_speed: Optional[float] = None
+    hydrogen_fuel: Optional[float] = None
+    quantum_fuel: Optional[float] = None
+    max_crew: Optional[int] = None
+    min_crew: Optional[int] = None
+
+    @property
+    def role(self) -> str:
+        return " / ".join(self.roles)
+
+    @property
+    def has_stats(self) -> bool:
+        """Suits, helmets and locations in the wiki export carry no statistics at all"""
+        return any(getattr(self, field) is not None for field in NUMERIC_FIELDS)
+
+    @property
+    def is_vehicle(self) -> bool:
+        """A ship or vehicle, even one without statistics, rather than a suit, helmet or location"""
+        return self.has_stats or bool(self.type or self.roles or self.size)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The known attributes as a compact dict, for prompts and JSON responses."""
+        record = {}
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if value is None or value == "" or value == ():
+                continue
+            if isinstance(value, tuple):
+                value = list(value)
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            record[name] = value
+        return record
+
+    @classmethod
+    def from_sources(cls, name: str, original: Optional[Dict[str, Any]],
+                     combined: Optional[Dict[str, Any]]) -> "Ship":
+        """Merge one Starships.txt entry and one combined JSON entry, either of which may be missing."""
+        original = original or {}
+        combined = combined or {}
+        printouts = original.get("printouts", {})
+
+        numbers = {}
+        for field, (printout_key, combined_key) in NUMERIC_SOURCES.items():
+            value = parse_number(printouts.get(printout_key)) if printout_key else None
+            if value is None and combined_key:
+                value = parse_number(combined.get(combined_key))
+            if value is not None and field in INTEGER_FIELDS:
+                value = int(value)
+            numbers[field] = value
+
+        manufacturer = _intern(combined.get("manufacturer"))
+        manufacturer_printout = (printouts.get("Manufacturer") or [{}])[0]
+        if not manufacturer:
+            manufacturer = _intern(manufacturer_printout.get("fulltext"))
+
+        roles: List[str] = [role for role in printouts.get("Role", []) if isinstance(role, str)]
+        if isinstance(combined.get("focus"), str):
+            roles.extend(focus for focus in combined["focus"].split("/"))
+        pledge_store_urls = printouts.get("Pledge store URL") or [""]
+
+        return cls(
+            name=name,
+            url=original.get("fullurl", ""),
+            manufacturer=manufacturer,
+            manufacturer_url=manufacturer_printout.get("fullurl", ""),
+            roles=tuple(dict.fromkeys(_intern(role) for role in roles if _intern(role))),
+            type=_intern(combined.get("type")),
+            size=_intern(combined.get("size")),
+            production_status=_intern(combined.get("production_status")),
+            description=(combined.get("description") or "").strip(),
+            pledge_store_url=pledge_store_urls[0] if isinstance(pledge_store_urls[0], str) else "",
+            purchase_locations=tuple(_intern(location) for location in combined.get("purchase_locations") or []
+                                     if _intern(location)),
+            **numbers,
+        )
+
+FIELD_NAMES = tuple(field.name for field in fields(Ship))
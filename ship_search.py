@@ -0,0 +1,243 @@
+import logging
+import re
+import threading
+from typing import Dict, List, Any, Optional, Iterable
+import numpy as np
+from ship_record import NUMERIC_FIELDS, Ship
+
+logger = logging.getLogger(__name__)
+
+# Text columns that can be filtered by case-insensitive substring
+TEXT_FIELDS = ("manufacturer", "role", "type", "size")
+
+# Phrases in a natural-language question mapped to role filters
+ROLE_KEYWORDS = {
+    "cargo": ["freight", "cargo", "transport"],
+    "hauler": ["freight", "cargo", "transport"],
+    "hauling": ["freight", "cargo", "transport"],
+    "freight": ["freight", "cargo"],
+    "fighter": ["fighter"],
+    "bomber": ["bomber"],
+    "mining": ["mining", "prospecting"],
+    "miner": ["mining", "prospecting"],
+    "salvage": ["salvage"],
+    "medical": ["medical"],
+    "exploration": ["exploration", "expedition", "pathfinder"],
+    "explorer": ["exploration", "expedition", "pathfinder"],
+    "racing": ["racing"],
+    "racer": ["racing"],
+    "starter": ["starter"],
+    "touring": ["touring", "luxury"],
+    "passenger": ["passenger", "touring"],
+    "refuel": ["refuel"],
+    "stealth": ["stealth"],
+    "dropship": ["dropship"],
+    "gunship": ["gunship", "gun ship"],
+}
+
+# Superlatives mapped to a sort key ("-" sorts descending)
+SORT_KEYWORDS = [
+    (re.compile(r"\b(cheapest|least expensive|affordable|budget|cheap)\b"), "price"),
+    (re.compile(r"\b(most expensive|priciest)\b"), "-price"),
+    (re.compile(r"\b(fastest|quickest)\b"), "-scm_speed"),
+    (re.compile(r"\b(most|largest|biggest|best) (cargo|hauler|freight)"), "-cargo"),
+    (re.compile(r"\b(largest|biggest) crew\b"), "-max_crew"),
+    (re.compile(r"\b(longest range|most fuel)\b"), "-hydrogen_fuel"),
+]
+
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mil": 1e6, "million": 1e6, "b": 1e9, "billion": 1e9}
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|m|mil|million|b|billion)?"
+
+# A bound followed by a number is only a price with a currency marker, a k/m/million suffix or a price word
+# in the question, and never when a unit follows it ("at most 4 crew", "under 5 minutes", "over 200 m/s")
+_PRICE_BOUND = (r"(\$)?\s*((?>\d[\d,]*(?:\.\d+)?))\s*(k|thousand|m|mil|million|b|billion)?\b"
+                r"(?!\s*(?:/|scu\b|crew\b|seats?\b|minutes?\b|mins?\b|seconds?\b|secs?\b|hours?\b|hrs?\b"
+                r"|meters?\b|metres?\b|km\b|people\b|persons?\b|players?\b|tons?\b))"
+                r"(?:\s*(auec|uec)\b)?")
+_MAX_PRICE = re.compile(r"\b(?:under|less than|below|at most|max(?:imum)?|up to|budget of)\s+" + _PRICE_BOUND)
+_MIN_PRICE = re.compile(r"\b(?:over|more than|above|at least|min(?:imum)?)\s+" + _PRICE_BOUND)
+_PRICE_CUE = re.compile(r"\b(?:price[ds]?|pricing|costs?|costing|budget|spend)\b")
+
+def _scaled(number: str, suffix: Optional[str]) -> float:
+    return float(number.replace(",", "")) * _MULTIPLIERS.get((suffix or "").lower(), 1)
+
+def _price_bound(pattern: re.Pattern, text: str) -> Optional[float]:
+    """The first price the pattern's bound applies to, or None."""
+    cue = _PRICE_CUE.search(text) is not None
+    for match in pattern.finditer(text):
+        dollar, number, suffix, currency = match.groups()
+        if dollar or currency or suffix or cue:
+            return _scaled(number, suffix)
+    return None
+
+class ShipSearchEngine:
+    """Columnar, vectorized filter and sort over normalized ship statistics.
+
+    Every numeric statistic is held in a float64 array (NaN when unknown) and
+    every text attribute as integer codes into a small vocabulary, so a search
+    is a handful of boolean array operations rather than a Python loop.
+    """
+
+    def __init__(self, ships: Dict[str, Ship], prices: Optional[Dict[str, int]] = None):
+        # Columns are built on first use, so constructing the engine costs nothing at startup
+        self._sources = (ships, prices or {})
+        self._build_lock = threading.Lock()
+        self._built = False
+
+    def _ensure_columns(self) -> None:
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._build_columns(*self._sources)
+                    self._sources = None
+                    self._built = True
+
+    def _build_columns(self, ships: Dict[str, Ship], prices: Dict[str, int]) -> None:
+        """Lay the ship records out as one column per statistic."""
+        names = list(ships)
+        records = list(ships.values())
+        prices_lower = {name.lower(): price for name, price in prices.items()}
+
+        # None becomes NaN in a float array
+        numeric = {
+            field: np.array([getattr(ship, field) for ship in records], dtype=float)
+            for field in NUMERIC_FIELDS
+        }
+        for row, name in enumerate(names):
+            if np.isnan(numeric["price"][row]) and name.lower() in prices_lower:
+                numeric["price"][row] = prices_lower[name.lower()]
+
+        text = {field: [getattr(ship, field) for ship in records] for field in TEXT_FIELDS}
+        urls = [ship.url for ship in records]
+
+        self.names = np.array(names, dtype=object)
+        self.urls = urls
+        self.numeric = numeric
+        # Text columns are stored as codes into their distinct values
+        self.text_values: Dict[str, List[str]] = {}
+        self.text_codes: Dict[str, np.ndarray] = {}
+        for field, values in text.items():
+            vocabulary, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+            self.text_values[field] = list(vocabulary)
+            self.text_codes[field] = codes
+        # Rows without any statistic are suits, helmets and locations rather than ships
+        self.has_stats = ~np.all(np.isnan(np.vstack(list(numeric.values()))), axis=0)
+        self._row_of = {name: row for row, name in enumerate(names)}
+        logger.info(f"Built search columns for {len(names)} ships")
+
+    def __len__(self) -> int:
+        self._ensure_columns()
+        return len(self.names)
+
+    def _text_mask(self, field: str, needles: Iterable[str]) -> np.ndarray:
+        """Rows whose text field contains any of the needles."""
+        needles = [needle.lower() for needle in needles if needle]
+        matching = [
+            code for code, value in enumerate(self.text_values[field])
+            if any(needle in value.lower() for needle in needles)
+        ]
+        return np.isin(self.text_codes[field], matching)
+
+    def search(self, filters: Optional[Dict[str, Any]] = None, sort: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0, names: Optional[Iterable[str]] = None,
+               include_incomplete: bool = False) -> Dict[str, Any]:
+        """Filter and sort ships.
+
+        filters maps ``min_<field>``/``max_<field>`` to numbers for numeric
+        fields and text fields to a string or list of alternatives. sort is a
+        numeric field name, prefixed with "-" for descending order. Rows with
+        an unknown sort value always come last.
+        """
+        self._ensure_columns()
+        filters = filters or {}
+        mask = np.ones(len(self.names), dtype=bool) if include_incomplete else self.has_stats.copy()
+
+        for key, value in filters.items():
+            if value is None or value == "" or value == []:
+                continue
+            if key in TEXT_FIELDS:
+                mask &= self._text_mask(key, [value] if isinstance(value, str) else value)
+                continue
+            bound, _, field = key.partition("_")
+            if bound not in ("min", "max") or field not in self.numeric:
+                raise ValueError(f"Unknown filter: {key}")
+            column = self.numeric[field]
+            # NaN compares false, so ships missing the statistic drop out of a bounded search
+            mask &= (column >= float(value)) if bound == "min" else (column <= float(value))
+
+        if names is not None:
+            rows = [self._row_of[name] for name in names if name in self._row_of]
+            name_mask = np.zeros(len(self.names), dtype=bool)
+            name_mask[rows] = True
+            mask &= name_mask
+
+        indices = np.flatnonzero(mask)
+        if sort:
+            descending = sort.startswith("-")
+            field = sort.lstrip("-")
+            if field not in self.numeric:
+                raise ValueError(f"Unknown sort field: {field}")
+            values = self.numeric[field][indices]
+            keys = -values if descending else values
+            # argsort places NaN last in both directions because -NaN is still NaN
+            indices = indices[np.argsort(keys, kind="stable")]
+
+        total = len(indices)
+        if limit is not None:
+            indices = indices[offset:offset + limit]
+        elif offset:
+            indices = indices[offset:]
+
+        return {"total": total, "ships": [self.row(int(index)) for index in indices]}
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Materialize one ship as a plain dict, leaving unknown statistics as None."""
+        self._ensure_columns()
+        record = {"name": self.names[index]}
+        for field in TEXT_FIELDS:
+            value = self.text_values[field][self.text_codes[field][index]]
+            record[field] = value or None
+        for field, column in self.numeric.items():
+            value = column[index]
+            record[field] = None if np.isnan(value) else (int(value) if value.is_integer() else float(value))
+        record["url"] = self.urls[index] or None
+        return record
+
+    @staticmethod
+    def filters_from_query(query: str) -> Dict[str, Any]:
+        """Derive structured filters and a sort order from a natural-language question."""
+        text = query.lower()
+        filters: Dict[str, Any] = {}
+
+        cargo = re.search(r"(?:over|more than|above|at least|min(?:imum)?)\s+" + _NUMBER + r"\s*scu", text)
+        if cargo:
+            filters["min_cargo"] = _scaled(cargo.group(1), cargo.group(2))
+        cargo = re.search(r"(?:under|less than|below|at most|max(?:imum)?)\s+" + _NUMBER + r"\s*scu", text)
+        if cargo:
+            filters["max_cargo"] = _scaled(cargo.group(1), cargo.group(2))
+
+        price = _price_bound(_MAX_PRICE, text)
+        if price is not None:
+            filters["max_price"] = price
+        price = _price_bound(_MIN_PRICE, text)
+        if price is not None:
+            filters["min_price"] = price
+
+        crew = re.search(r"(?:solo|single[- ]seat|one person)", text)
+        if crew:
+            filters["max_min_crew"] = 1
+
+        roles: List[str] = []
+        for keyword, role_needles in ROLE_KEYWORDS.items():
+            if re.search(rf"\b{keyword}s?\b", text):
+                roles.extend(needle for needle in role_needles if needle not in roles)
+        if roles:
+            filters["role"] = roles
+
+        sort = None
+        for pattern, sort_key in SORT_KEYWORDS:
+            if pattern.search(text):
+                sort = sort_key
+                break
+
+        return {"filters": filters, "sort": sort}
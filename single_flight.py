@@ -0,0 +1,88 @@
+"""Coalesce concurrent identical calls into one.
+
+When many requests ask for the same thing at once (the same wiki page, the
+same prompt), only the first caller for a key does the work; everyone who
+arrives while it is in flight waits for that call and gets its result, or
+its exception. Nothing is kept once the call finishes, so this is not a
+cache: a caller arriving afterwards starts a new call.
+
+Sync and async callers share the same in-flight calls, so a page being
+scraped by a Flask worker thread is not fetched again by a coroutine.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import COALESCED_CALLS
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Share one in-flight call per key among concurrent callers."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """The in-flight call for key, and whether the caller must run it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = Future()
+                # A running future cannot be cancelled by a waiter giving up
+                future.set_running_or_notify_cancel()
+                self._calls[key] = future
+                self.leaders += 1
+                leader = True
+        COALESCED_CALLS.inc(call=self.name, result="leader" if leader else "shared")
+        return future, leader
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, function: Callable[..., Any], *args: Any) -> Any:
+        """Return function(*args), or the result of the identical call already in flight."""
+        future, leader = self._join(key)
+        if not leader:
+            logger.debug(f"Sharing in-flight {self.name} call")
+            return future.result()
+        try:
+            result = function(*args)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: Hashable, function: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Async counterpart of do(); function returns a coroutine."""
+        future, leader = self._join(key)
+        if not leader:
+            logger.debug(f"Sharing in-flight {self.name} call")
+            # Shielded so a cancelled waiter leaves the call running for the others
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await function(*args)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
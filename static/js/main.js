@@ -45,39 +45,7 @@ document.addEventListener('DOMContentLoaded', () => {
         errorAlert.classList.add('d-none');
 
         try {
-            const response = await fetch('/api/query', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ query })
-            });
-
-            const data = await response.json();
-
-            if (data.success) {
-                // Parse markdown and render response
-                responseContent.innerHTML = marked.parse(data.response);
-                
-                // Update sources list
-                sourcesList.innerHTML = data.sources
-                    .map(source => `
-                        <li class="mb-2">
-                            <a href="${source}" target="_blank" rel="noopener noreferrer">
-                                <i class="bi bi-box-arrow-up-right me-1"></i>
-                                ${source}
-                            </a>
-                        </li>
-                    `)
-                    .join('');
-
-                responseArea.classList.remove('d-none');
-                
-                // Smooth scroll to response
-                responseArea.scrollIntoView({ behavior: 'smooth', block: 'start' });
-            } else {
-                showError(data.error || 'Failed to process query');
-            }
+            await streamQuery(query);
         } catch (error) {
             showError('An error occurred while processing your request');
             console.error('Error:', error);
@@ -88,6 +56,110 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    async function streamQuery(query) {
+        const response = await fetch('/api/query/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ query })
+        });
+
+        // Validation errors come back as plain JSON before the stream starts
+        if (!response.ok || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            showError(data.error || 'Failed to process query');
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let markdown = '';
+        let renderPending = false;
+
+        responseContent.innerHTML = '';
+        sourcesList.innerHTML = '';
+
+        const render = () => {
+            renderPending = false;
+            responseContent.innerHTML = renderMarkdown(markdown);
+        };
+
+        const handleEvent = (event, data) => {
+            if (event === 'token') {
+                if (!markdown) {
+                    responseArea.classList.remove('d-none');
+                    responseArea.scrollIntoView({ behavior: 'smooth', block: 'start' });
+                }
+                markdown += data.text;
+                // Re-render at most once per frame while tokens are arriving
+                if (!renderPending) {
+                    renderPending = true;
+                    requestAnimationFrame(render);
+                }
+            } else if (event === 'sources') {
+                renderSources(data.sources);
+            } else if (event === 'error') {
+                showError(data.error || 'Failed to process query');
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Server-sent events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let dataLines = [];
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                if (dataLines.length) {
+                    handleEvent(event, JSON.parse(dataLines.join('\n')));
+                }
+            }
+        }
+
+        if (markdown) {
+            render();
+        }
+    }
+
+    function renderMarkdown(text) {
+        // marked.js loads asynchronously; fall back to plain text until it is ready
+        if (typeof marked === 'undefined') {
+            const div = document.createElement('div');
+            div.textContent = text;
+            return div.innerHTML;
+        }
+        return marked.parse(text);
+    }
+
+    function renderSources(sources) {
+        sourcesList.innerHTML = sources
+            .map(source => `
+                <li class="mb-2">
+                    <a href="${source}" target="_blank" rel="noopener noreferrer">
+                        <i class="bi bi-box-arrow-up-right me-1"></i>
+                        ${source}
+                    </a>
+                </li>
+            `)
+            .join('');
+    }
+
     function showError(message) {
         errorMessage.textContent = message;
         errorAlert.classList.remove('d-none');
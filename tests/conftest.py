@@ -0,0 +1,22 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+@pytest.fixture(scope="session")
+def client():
+    """Flask test client for the app, run offline against the benchmark stand-ins for Gemini and the wiki."""
+    import stubs
+    cwd = os.getcwd()
+    workdir = stubs.install_stubs(gemini_latency=0.0, wiki_latency=0.0, cached_pages=False, response_cache=False)
+    try:
+        import app
+        yield app.app.test_client()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,27 @@
+import pytest
+
+def test_limit_is_clamped(client):
+    response = client.get("/api/ships/search?limit=-5")
+    assert response.status_code == 200
+    assert response.json["ships"] == []
+    assert response.json["total"] > 0
+
+    response = client.get("/api/ships/search?limit=10000")
+    assert len(response.json["ships"]) == min(500, response.json["total"])
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "NaN", "Infinity"])
+def test_non_finite_bound_is_rejected(client, value):
+    response = client.get(f"/api/ships/search?max_price={value}")
+    assert response.status_code == 400
+    assert response.json["success"] is False
+    assert "finite" in response.json["error"]
+
+def test_unparseable_bound_is_rejected(client):
+    response = client.get("/api/ships/search?min_cargo=lots")
+    assert response.status_code == 400
+
+def test_price_bound_filters(client):
+    response = client.get("/api/ships/search?max_price=2000000&limit=500")
+    assert response.status_code == 200
+    assert response.json["ships"]
+    assert all(ship["price"] <= 2_000_000 for ship in response.json["ships"])
@@ -0,0 +1,52 @@
+import pytest
+
+from ship_search import ShipSearchEngine
+
+def filters(query):
+    return ShipSearchEngine.filters_from_query(query)["filters"]
+
+@pytest.mark.parametrize("query, expected", [
+    ("ships under 2 million", 2_000_000),
+    ("ships under 2m", 2_000_000),
+    ("fighters under 500k", 500_000),
+    ("ships under 1.5 million auec", 1_500_000),
+    ("ships under $150,000", 150_000),
+    ("ships under 300000 uec", 300_000),
+    ("ships with a budget of 3000000", 3_000_000),
+    ("ships that cost at most 2,000,000", 2_000_000),
+])
+def test_max_price(query, expected):
+    assert filters(query)["max_price"] == expected
+
+@pytest.mark.parametrize("query, expected", [
+    ("ships over 2 million", 2_000_000),
+    ("ships over 2 million auec", 2_000_000),
+    ("ships priced at least 750000", 750_000),
+    ("ships more than $10k", 10_000),
+])
+def test_min_price(query, expected):
+    assert filters(query)["min_price"] == expected
+
+@pytest.mark.parametrize("query", [
+    "ships with at most 4 crew",
+    "ships under 5 minutes quantum",
+    "ships over 200 m/s",
+    "ships with at least 2 seats",
+    "ships under 200",
+])
+def test_numbers_that_are_not_prices(query):
+    found = filters(query)
+    assert "max_price" not in found and "min_price" not in found
+
+def test_cargo_is_not_a_price():
+    assert filters("ships over 100 scu under 2 million") == {"min_cargo": 100, "max_price": 2_000_000}
+    assert filters("ships under 96 scu") == {"max_cargo": 96}
+
+def test_unit_is_skipped_for_a_later_price():
+    assert filters("ships with at most 4 crew under 3 million") == {"max_price": 3_000_000}
+
+def test_role_and_sort():
+    criteria = ShipSearchEngine.filters_from_query("cheapest cargo hauler under 1m")
+    assert criteria["filters"]["max_price"] == 1_000_000
+    assert "cargo" in criteria["filters"]["role"]
+    assert criteria["sort"] == "price"